@@ -1,19 +1,41 @@
 #!/usr/bin/env python3
 """
-Apply fixes to index.html - proper edits
+Apply fixes to landing pages - declarative, idempotent patches
+
+Each page is tokenized once into an index of anchors (ids, classes, tag
+names, comments and text), every patch in PATCHES is resolved against that
+index, and all edits are spliced in a single pass. Inserted content is
+tagged with a "patch:<name>" marker comment, so running the script again
+recognizes what is already there instead of inserting it twice.
+
+Anchors:
+    #id                 element with that id
+    .class              first element with that class
+    tag                 first element with that tag name (tag:last for the last)
+    <!-- text -->       first comment containing text
+    text:words          innermost element whose text (or inline script/style) contains words
+
+Positions: before/after the element (or comment), prepend/append inside it.
+
+Usage:
+    python apply-fixes.py                       # index.html next to this script
+    python apply-fixes.py landers/*.html        # many pages, in parallel
+    python apply-fixes.py --dry-run --only size-selector index.html
 """
 
-def apply_fixes():
-    # Read the file
-    with open('/Users/nelsonchan/Downloads/pink ballet wrap/index.html', 'r') as f:
-        content = f.read()
+import argparse
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
-    # 1. Add size selector after price box
-    price_box_end = '<div style="color:#E8B4B8;font-size:14px;font-weight:600;margin-bottom:20px">1,247 sets sold this week</div>'
+from optimize import VOID_ELEMENTS, tokenize_spans
 
-    size_selector = '''
-        <div style="color:#E8B4B8;font-size:14px;font-weight:600;margin-bottom:20px">1,247 sets sold this week</div>
+BASE_DIR = Path(__file__).parent
+WORKERS = 8
+MARKER = re.compile(r'(?:<!--|/\*)\s*patch:([\w-]+)\s*(?:-->|\*/)')
 
+SIZE_SELECTOR = '''
         <!-- Size Selector -->
         <div style="margin-bottom:24px">
           <label style="display:block;font-size:14px;font-weight:600;color:#333;margin-bottom:12px">Select Size:</label>
@@ -33,14 +55,7 @@ def apply_fixes():
         </div>
     '''
 
-    if price_box_end in content:
-        content = content.replace(price_box_end, size_selector)
-        print("✅ Size selector added")
-
-    # 2. Add product accordion after reviews section
-    reviews_section_end = '<!-- Customer Reviews Section -->'
-
-    accordion_html = '''
+PRODUCT_ACCORDION = '''
     <!-- Product Details Accordion Section -->
     <div class="product-accordion-section fade-in" style="padding:60px 20px;background:#fff">
       <div style="max-width:1200px;margin:0 auto">
@@ -183,54 +198,15 @@ def apply_fixes():
       </div>
     </div>
 
-    <!-- Customer Reviews Section -->
     '''
 
-    if reviews_section_end in content:
-        content = content.replace(reviews_section_end, accordion_html)
-        print("✅ Accordion added")
-
-    # 3. Fix worn-by-favorites images
-    import re
-
-    # Replace testimonials with proper worn-by-favorites images
-    testimonials_pattern = r'./images/testimonials/testimonial-\d+\.jpeg'
-
-    celebrity_images = [
-        '/images/worn-by-favorites/alix-earle-600.jpg',
-        '/images/worn-by-favorites/alex-cooper-600.jpg',
-        '/images/worn-by-favorites/hailey-bieber-600.jpg',
-        '/images/worn-by-favorites/kendall-jenner-600.jpg',
-        '/images/worn-by-favorites/gigi-hadid-600.jpg',
-        '/images/worn-by-favorites/bella-hadid-600.jpg',
-        '/images/worn-by-favorites/kylie-jenner-600.jpg',
-        '/images/worn-by-favorites/charli-damelio-600.jpg',
-        '/images/worn-by-favorites/addison-rae-600.jpg',
-        '/images/worn-by-favorites/emma-chamberlain-600.jpg'
-    ]
-
-    # Replace all testimonial image references
-    content = re.sub(testimonials_pattern, lambda m: celebrity_images[hash(m.group()) % len(celebrity_images)], content)
-    print("✅ Celebrity image paths fixed")
-
-    # 4. Add mobile menu toggle to nav
-    nav_pattern = r'(<nav[^>]*>)'
-    import re
-
-    def add_mobile_menu(match):
-        nav_tag = match.group(1)
-        mobile_btn = '''<button onclick="toggleMobileMenu()" class="mobile-menu-toggle" style="display:none;flex-direction:column;gap:4px;padding:8px;border:none;background:transparent;cursor:pointer" aria-label="Toggle menu">
+MOBILE_MENU_BUTTON = '''<button onclick="toggleMobileMenu()" class="mobile-menu-toggle" style="display:none;flex-direction:column;gap:4px;padding:8px;border:none;background:transparent;cursor:pointer" aria-label="Toggle menu">
           <span style="width:24px;height:2px;background:#E8B4B8;transition:all 0.3s"></span>
           <span style="width:24px;height:2px;background:#E8B4B8;transition:all 0.3s"></span>
           <span style="width:24px;height:2px;background:#E8B4B8;transition:all 0.3s"></span>
         </button>'''
-        return mobile_btn + nav_tag
-
-    content = re.sub(nav_pattern, add_mobile_menu, content)
-    print("✅ Mobile menu toggle added")
 
-    # 5. Add mobile CSS if not present
-    mobile_css = '''
+MOBILE_CSS = '''
 /* Mobile Menu Styles */
 @media (max-width: 768px) {
   .mobile-menu-toggle {
@@ -302,13 +278,7 @@ def apply_fixes():
 }
 '''
 
-    # Add mobile CSS before closing style tag
-    if '/* Mobile Menu Styles */' not in content:
-        content = content.replace('</style>', mobile_css + '\n</style>')
-        print("✅ Mobile CSS added")
-
-    # 6. Add JavaScript functions if not present
-    js_functions = '''
+PAGE_FUNCTIONS = '''
     // Accordion functionality
     function toggleAccordion(tabName) {
       const item = document.querySelector(`[data-tab="${tabName}"]`);
@@ -383,21 +353,208 @@ def apply_fixes():
     });
     '''
 
-    # Add JS before closing script tag
-    if 'toggleAccordion' not in content:
-        # Find the last script tag
-        last_script = content.rfind('<script>')
-        if last_script != -1:
-            insert_pos = content.find('>', last_script) + 1
-            content = content[:insert_pos] + js_functions + content[insert_pos:]
-            print("✅ JavaScript functions added")
-
-    # Save the updated file
-    with open('/Users/nelsonchan/Downloads/pink ballet wrap/index.html', 'w') as f:
-        f.write(content)
+CELEBRITY_IMAGES = [
+        '/images/worn-by-favorites/alix-earle-600.jpg',
+        '/images/worn-by-favorites/alex-cooper-600.jpg',
+        '/images/worn-by-favorites/hailey-bieber-600.jpg',
+        '/images/worn-by-favorites/kendall-jenner-600.jpg',
+        '/images/worn-by-favorites/gigi-hadid-600.jpg',
+        '/images/worn-by-favorites/bella-hadid-600.jpg',
+        '/images/worn-by-favorites/kylie-jenner-600.jpg',
+        '/images/worn-by-favorites/charli-damelio-600.jpg',
+        '/images/worn-by-favorites/addison-rae-600.jpg',
+        '/images/worn-by-favorites/emma-chamberlain-600.jpg'
+    ]
 
-    print("\n✅ All fixes applied successfully!")
-    return True
+# Applied in order; 'applied' names an anchor that means the fix is already in the page
+# (pages patched before markers existed), 'marker' picks the comment syntax of the content
+PATCHES = [
+    {'name': 'size-selector', 'anchor': 'text:1,247 sets sold this week', 'position': 'after',
+     'content': SIZE_SELECTOR, 'applied': '#size-selector'},
+    {'name': 'product-accordion', 'anchor': '<!-- Customer Reviews Section -->', 'position': 'before',
+     'content': PRODUCT_ACCORDION, 'applied': '.product-accordion-section'},
+    {'name': 'celebrity-images', 'select': 'img', 'attribute': 'src',
+     'pattern': r'\./images/testimonials/testimonial-\d+\.jpeg', 'values': CELEBRITY_IMAGES},
+    {'name': 'mobile-menu', 'anchor': 'nav', 'position': 'before',
+     'content': MOBILE_MENU_BUTTON, 'applied': '.mobile-menu-toggle'},
+    {'name': 'mobile-css', 'anchor': 'style', 'position': 'append', 'marker': 'css',
+     'content': MOBILE_CSS, 'applied': 'text:/* Mobile Menu Styles */'},
+    {'name': 'page-functions', 'anchor': 'script:last', 'position': 'prepend', 'marker': 'js',
+     'content': PAGE_FUNCTIONS, 'applied': 'text:function toggleAccordion'},
+]
+
+class Node:
+    """An element's spans: [start, open_end) is the start tag, [close_start, end) the end tag"""
+
+    def __init__(self, name, attrs, start, open_end, parent):
+        self.name = name
+        self.attrs = {key.lower(): (value or '').strip('"\'') for key, value in attrs}
+        self.start = start
+        self.open_end = open_end
+        self.close_start = self.end = open_end
+        self.parent = parent
+
+class AnchorIndex:
+    """Every anchor in a document, built from one tokenizer pass"""
+
+    def __init__(self, html):
+        self.ids, self.classes, self.tags = {}, {}, {}
+        self.comments, self.texts, self.markers = [], [], set()
+        stack = []
+        for kind, value, start, end in tokenize_spans(html):
+            if kind == 'start':
+                name, attrs, self_closing = value
+                node = Node(name, attrs, start, end, stack[-1] if stack else None)
+                self.tags.setdefault(name, []).append(node)
+                if 'id' in node.attrs:
+                    self.ids.setdefault(node.attrs['id'], node)
+                for cls in node.attrs.get('class', '').split():
+                    self.classes.setdefault(cls, node)
+                if not self_closing and name not in VOID_ELEMENTS:
+                    stack.append(node)
+            elif kind == 'end':
+                if any(node.name == value for node in stack):
+                    while stack:
+                        node = stack.pop()
+                        if node.name == value:
+                            node.close_start, node.end = start, end
+                            break
+                        node.close_start = node.end = start     # closed implicitly
+            elif kind == 'comment':
+                self.comments.append((value, start, end))
+                self.markers.update(MARKER.findall(value))
+            elif kind in ('text', 'raw') and value.strip():
+                self.texts.append((stack[-1] if stack else None, value))
+                if kind == 'raw':
+                    self.markers.update(MARKER.findall(value))
+        for node in stack:
+            node.close_start = node.end = len(html)
+
+    def find(self, anchor):
+        """(start, open_end, close_start, end) for an anchor, or None"""
+        if anchor.startswith('<!--'):
+            text = anchor[4:-3].strip() if anchor.endswith('-->') else anchor[4:].strip()
+            for comment, start, end in self.comments:
+                if text in comment:
+                    return start, start, end, end
+            return None
+        if anchor.startswith('text:'):
+            words = anchor[5:]
+            node = next((node for node, text in self.texts if words in text), None)
+        elif anchor.startswith('#'):
+            node = self.ids.get(anchor[1:])
+        elif anchor.startswith('.'):
+            node = self.classes.get(anchor[1:])
+        else:
+            name, _, which = anchor.partition(':')
+            # inline content only: a <script src> or <style> in SVG can't take patched code
+            nodes = [node for node in self.tags.get(name, []) if 'src' not in node.attrs]
+            node = (nodes[-1] if which == 'last' else nodes[0]) if nodes else None
+        if node is None:
+            return None
+        return node.start, node.open_end, node.close_start, node.end
+
+def marked(patch):
+    """Patch content prefixed with its marker comment"""
+    syntax = patch.get('marker', 'html')
+    marker = f"/* patch:{patch['name']} */" if syntax in ('css', 'js') else f"<!-- patch:{patch['name']} -->"
+    return f"\n{marker}{patch['content']}"
+
+def attribute_edits(html, index, patch):
+    """Edits rewriting one attribute on every matching element, cycling through patch['values']"""
+    pattern = re.compile(patch['pattern'])
+    edits = []
+    for node in index.tags.get(patch['select'], []):
+        value = node.attrs.get(patch['attribute'], '')
+        if pattern.search(value):
+            new = pattern.sub(patch['values'][len(edits) % len(patch['values'])], value)
+            tag = html[node.start:node.open_end].replace(value, new, 1)
+            edits.append((node.start, node.open_end, tag))
+    return edits
+
+def plan(html, patches):
+    """(edits, report) for one document; edits are (start, end, replacement)"""
+    index = AnchorIndex(html)
+    edits, report = [], []
+    for patch in patches:
+        name = patch['name']
+        if 'attribute' in patch:
+            found = attribute_edits(html, index, patch)
+            edits += found
+            report.append((name, 'applied' if found else 'nothing to change'))
+            continue
+        if name in index.markers or (patch.get('applied') and index.find(patch['applied'])):
+            report.append((name, 'already applied'))
+            continue
+        spans = index.find(patch['anchor'])
+        if spans is None:
+            report.append((name, f"anchor not found: {patch['anchor']}"))
+            continue
+        start, open_end, close_start, end = spans
+        offset = {'before': start, 'prepend': open_end, 'append': close_start, 'after': end}[patch['position']]
+        edits.append((offset, offset, marked(patch)))
+        report.append((name, 'applied'))
+    return edits, report
+
+def splice(html, edits):
+    """Apply non-overlapping edits in one pass; insertions at one offset keep patch order"""
+    pieces, pos = [], 0
+    for start, end, text in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+        pieces.append(html[pos:start])
+        pieces.append(text)
+        pos = max(pos, end)
+    pieces.append(html[pos:])
+    return ''.join(pieces)
+
+def apply_fixes(path, patches=PATCHES, dry_run=False):
+    """Patch one file in place; returns (path, report)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    edits, report = plan(content, patches)
+    if edits and not dry_run:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(splice(content, edits))
+    return path, report
+
+def apply_job(job):
+    return apply_fixes(*job)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply landing page fixes idempotently")
+    parser.add_argument('files', nargs='*', help="HTML files to patch (default: index.html)")
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help=f"apply only these patches ({', '.join(patch['name'] for patch in PATCHES)})")
+    parser.add_argument('--dry-run', action='store_true', help="report what would change without writing")
+    parser.add_argument('--workers', type=int, default=WORKERS, help=f"parallel files (default: {WORKERS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = args.files or [BASE_DIR / 'index.html']
+    patches = PATCHES
+    if args.only:
+        unknown = set(args.only) - {patch['name'] for patch in PATCHES}
+        if unknown:
+            sys.exit(f"Unknown patch: {', '.join(sorted(unknown))}")
+        patches = [patch for patch in PATCHES if patch['name'] in args.only]
+
+    jobs = [(path, patches, args.dry_run) for path in files]
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(apply_job, jobs))
+    else:
+        results = [apply_job(job) for job in jobs]
+
+    changed = 0
+    for path, report in results:
+        print(f"\n{path}:")
+        for name, status in report:
+            icon = '✅' if status == 'applied' else '⏭️ ' if status in ('already applied', 'nothing to change') else '⚠️ '
+            print(f"  {icon} {name}: {status}")
+        changed += any(status == 'applied' for _, status in report)
+
+    verb = 'would change' if args.dry_run else 'changed'
+    print(f"\n✅ {len(results)} file(s) checked, {changed} {verb}")
 
 if __name__ == "__main__":
-    apply_fixes()
\ No newline at end of file
+    main()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Page-weight budget gate for the Pink Pilates Set landing pages
+
+Measures what a first visit to each optimized page costs at mobile and desktop
+widths and compares it with the checked-in budgets.json:
+
+- total: everything the page fetches (document, stylesheets, scripts, preloads
+  and prefetches, every image including lazy ones, CSS backgrounds)
+- critical: what the first render waits on (the document, blocking
+  stylesheets and scripts, preloads, and eager images above the fold)
+
+Images count the candidate a browser would actually fetch: the first <picture>
+<source> whose type and media match, then the srcset entry that covers the
+sizes slot at the viewport's device pixel ratio. Script-driven data-src and
+data-srcset count as if already promoted. Text resources count their gzip
+size, everything else its file size.
+
+budgets.json also caps single resources by kind and every variant listed in
+the image manifest, so a heavy new image fails before any page links it. Any
+breach exits 1 with a diff of the worst offenders against their budgets.
+
+Usage:
+    python check_budgets.py                              # index-optimized.html (else index.html)
+    python check_budgets.py dist/*.html --report budget-report.json
+"""
+
+import argparse
+import gzip
+import json
+import re
+import sys
+from pathlib import Path
+
+from optimize import (CSS_URL, FOLD_SELECTOR, PRECOMPRESS_EXTENSIONS, ancestors, build_dom, fold_index,
+                      load_image_manifest, local_asset, split_top_level)
+
+BASE_DIR = Path(__file__).parent
+BUDGET_FILE = BASE_DIR / 'budgets.json'
+DEFAULT_PAGES = ['index-optimized.html', 'index.html']       # the first that exists
+WORST_OFFENDERS = 10
+OFFENDER_RESOURCES = 3          # largest resources listed under each page breach
+
+# Viewport widths match verify-fixes.py; dpr is what srcset selection is scaled by
+VIEWPORTS = {
+    'mobile': {'width': 375, 'dpr': 2},
+    'desktop': {'width': 1920, 'dpr': 1},
+}
+SUPPORTED_TYPES = {'', 'image/avif', 'image/webp', 'image/jpeg', 'image/png', 'image/gif', 'image/svg+xml'}
+FONT_EXTENSIONS = {'.woff2', '.woff', '.ttf', '.otf'}
+IMAGE_FORMATS = ('webp', 'jpeg', 'avif')
+FONT_SIZE = 16                  # px per em in sizes and media queries
+
+LENGTH = re.compile(r'([+-]?)\s*(\d*\.?\d+)(px|vw|r?em)')
+MEDIA_WIDTH = re.compile(r'\(\s*(min|max)-width\s*:\s*(\d*\.?\d+)(px|r?em)\s*\)')
+SIZES_ENTRY = re.compile(r'^(?P<media>.*\))\s+(?P<length>calc\(.*\)|[^\s()]+)$', re.S)
+SRCSET_URL = re.compile(r'[\s,]*(\S+)')
+
+def css_length(value, width):
+    """A sizes length (px, vw, em, or a calc() sum of them) in CSS px, or None"""
+    terms = LENGTH.findall(value)
+    if not terms:
+        return None
+    total = 0.0
+    for sign, number, unit in terms:
+        px = float(number) * (width / 100 if unit == 'vw' else FONT_SIZE if unit.endswith('em') else 1)
+        total += -px if sign == '-' else px
+    return total
+
+def media_matches(query, width):
+    """Whether a media query list holds at a viewport width; only width features are evaluated"""
+    if not query or not query.strip():
+        return True
+    for part in query.lower().split(','):
+        part = part.strip()
+        if part.startswith('not ') or part.startswith('print') or part.startswith('only print'):
+            continue
+        matched = True
+        for bound, number, unit in MEDIA_WIDTH.findall(part):
+            limit = float(number) * (FONT_SIZE if unit.endswith('em') else 1)
+            matched &= width >= limit if bound == 'min' else width <= limit
+        if matched:
+            return True
+    return False
+
+def slot_width(sizes, width):
+    """Width in CSS px the sizes attribute gives an image at a viewport width; 100vw without one"""
+    for entry in split_top_level(sizes or ''):
+        entry = entry.strip()
+        if not entry:
+            continue
+        match = SIZES_ENTRY.match(entry)
+        if match is None:
+            return css_length(entry, width) or width
+        if media_matches(match['media'], width):
+            return css_length(match['length'], width) or width
+    return width
+
+def srcset_candidates(value):
+    """(url, descriptor) pairs, parsed as browsers do: a URL runs to whitespace, so it may contain commas"""
+    candidates, pos = [], 0
+    while True:
+        match = SRCSET_URL.match(value, pos)
+        if match is None:
+            return candidates
+        url, pos = match[1], match.end()
+        if url.endswith(','):
+            candidates.append((url.rstrip(','), ''))
+            continue
+        end = value.find(',', pos)
+        end = len(value) if end < 0 else end
+        candidates.append((url, value[pos:end].strip()))
+        pos = end + 1
+
+def choose_candidate(srcset, sizes, src, viewport):
+    """URL a browser fetches: the smallest candidate dense enough for the viewport's DPR, else the densest"""
+    candidates = srcset_candidates(srcset or '')
+    slot = slot_width(sizes, viewport['width'])
+    options = []
+    for url, descriptor in candidates:
+        if descriptor.endswith('w'):
+            density = float(descriptor[:-1]) / slot
+        elif descriptor.endswith('x'):
+            density = float(descriptor[:-1])
+        else:
+            density = 1.0
+        options.append((density, url))
+    # src is the 1x candidate unless srcset uses width descriptors or has its own 1x
+    if src and not any(descriptor.endswith('w') for _, descriptor in candidates) \
+            and not any(density == 1.0 for density, _ in options):
+        options.append((1.0, src))
+    if not options:
+        return None
+    enough = [option for option in options if option[0] >= viewport['dpr']]
+    return min(enough)[1] if enough else max(options)[1]
+
+def lazy_attribute(element, name):
+    """data-<name> if script lazy loading will promote it, else <name>"""
+    return element.attrs.get(f'data-{name}') or element.attrs.get(name)
+
+def image_request(img, viewport):
+    """URL an <img>, with its <picture> sources, fetches at a viewport"""
+    parent = img.parent
+    if parent is not None and parent.name == 'picture':
+        for source in parent.children:
+            if source.name != 'source' or source.index > img.index:
+                continue
+            if source.attrs.get('type', '').lower() not in SUPPORTED_TYPES:
+                continue
+            if not media_matches(source.attrs.get('media'), viewport['width']):
+                continue
+            srcset = lazy_attribute(source, 'srcset')
+            if srcset:
+                return choose_candidate(srcset, source.attrs.get('sizes'), None, viewport)
+    return choose_candidate(lazy_attribute(img, 'srcset'), img.attrs.get('sizes'), lazy_attribute(img, 'src'),
+                            viewport)
+
+def asset_kind(path, hint=None):
+    """'image', 'script', 'stylesheet', 'font' or 'other' for a file, preferring a preload's as="" hint"""
+    if hint in ('image', 'script', 'font'):
+        return hint
+    if hint == 'style':
+        return 'stylesheet'
+    suffix = path.suffix.lower()
+    if suffix in FONT_EXTENSIONS:
+        return 'font'
+    if suffix in ('.js', '.mjs'):
+        return 'script'
+    if suffix == '.css':
+        return 'stylesheet'
+    if suffix in ('.webp', '.avif', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.ico'):
+        return 'image'
+    return 'other'
+
+_transfer_sizes = {}
+
+def transfer_size(path):
+    """Bytes on the wire: gzip size for text, file size otherwise"""
+    if path not in _transfer_sizes:
+        data = path.read_bytes()
+        if path.suffix.lower() in PRECOMPRESS_EXTENSIONS:
+            _transfer_sizes[path] = len(gzip.compress(data, compresslevel=9))
+        else:
+            _transfer_sizes[path] = len(data)
+    return _transfer_sizes[path]
+
+def page_resources(page, viewport, base_dir=BASE_DIR, fold=FOLD_SELECTOR):
+    """{path: (kind, critical)} for everything a page fetches at a viewport, itself included"""
+    page = Path(page).resolve()
+    with open(page, 'r', encoding='utf-8') as f:
+        html = f.read()
+    elements, styles = build_dom(html)
+    above_fold = fold_index(elements, fold)
+    resources = {page: ('document', True)}
+
+    def add(url, critical, kind=None):
+        path = local_asset(url.strip(), page.parent) or local_asset(url.strip(), base_dir)
+        if path is None or path == page:
+            return
+        known_kind, known_critical = resources.get(path, (None, False))
+        resources[path] = (known_kind or asset_kind(path, kind), known_critical or critical)
+
+    for element in elements:
+        if {'noscript', 'template'} & set(ancestors(element)):
+            continue
+        attrs = element.attrs
+        if element.name == 'img':
+            url = image_request(element, viewport)
+            if url:
+                add(url, not element.hidden and element.index <= above_fold and attrs.get('loading') != 'lazy',
+                    'image')
+        elif element.name == 'link' and attrs.get('href'):
+            rel = set(attrs.get('rel', '').lower().split())
+            if 'stylesheet' in rel:
+                add(attrs['href'], media_matches(attrs.get('media'), viewport['width']), 'style')
+            elif rel & {'preload', 'modulepreload', 'prefetch'}:
+                url = attrs['href']
+                if attrs.get('imagesrcset'):
+                    url = choose_candidate(attrs['imagesrcset'], attrs.get('imagesizes'), url, viewport)
+                add(url, 'prefetch' not in rel, attrs.get('as') or ('script' if 'modulepreload' in rel else None))
+        elif element.name == 'script' and attrs.get('src'):
+            blocking = not ({'async', 'defer'} & set(attrs)) and attrs.get('type') != 'module'
+            add(attrs['src'], blocking, 'script')
+        elif element.name == 'video' and attrs.get('poster'):
+            add(attrs['poster'], False, 'image')
+        for match in CSS_URL.finditer(attrs.get('style', '')):
+            add(match.group(2), False)
+    for style in styles:
+        for match in CSS_URL.finditer(style['content']):
+            add(match.group(2), False)
+    return resources
+
+def relative(path, base_dir=BASE_DIR):
+    try:
+        return Path(path).resolve().relative_to(Path(base_dir).resolve()).as_posix()
+    except ValueError:
+        return str(path)
+
+def measure_page(page, viewport, base_dir=BASE_DIR, fold=FOLD_SELECTOR):
+    """{'total', 'critical', 'resources': [...]} for a page at a viewport, resources largest first"""
+    resources = [{'path': relative(path, base_dir), 'kind': kind, 'bytes': transfer_size(path), 'critical': critical}
+                 for path, (kind, critical) in page_resources(page, viewport, base_dir, fold).items()]
+    resources.sort(key=lambda resource: (-resource['bytes'], resource['path']))
+    return {
+        'total': sum(resource['bytes'] for resource in resources),
+        'critical': sum(resource['bytes'] for resource in resources if resource['critical']),
+        'resources': resources,
+    }
+
+def manifest_variants(categories, base_dir=BASE_DIR):
+    """(path, bytes, 'category/source') for every variant file in the image manifest"""
+    seen = set()
+    for category, entries in categories.items():
+        for name, entry in entries.items():
+            if entry.get('duplicate_of'):
+                continue
+            for fmt in IMAGE_FORMATS:
+                for file in (entry.get(fmt) or {}).values():
+                    path = Path(base_dir) / 'images' / category / file
+                    if path not in seen and path.is_file():
+                        seen.add(path)
+                        yield relative(path, base_dir), path.stat().st_size, f"{category}/{name}"
+
+def load_budgets(path=BUDGET_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def page_budget(budgets, page):
+    """A page's {viewport: {metric: bytes}}: its own entry by file name, else 'default'"""
+    pages = budgets.get('pages', {})
+    return pages.get(Path(page).name, pages.get('default', {}))
+
+def breach(scope, limit, actual, details=()):
+    return {'scope': scope, 'budget': limit, 'actual': actual, 'over': actual - limit, 'details': list(details)}
+
+def check(pages, budgets, viewports=tuple(VIEWPORTS), base_dir=BASE_DIR, fold=FOLD_SELECTOR):
+    """(measurements, breaches) for every page and viewport plus the manifest"""
+    measurements, breaches = {}, []
+    resource_limits = budgets.get('resources', {})
+    for page in pages:
+        name = relative(page, base_dir)
+        measurements[name] = {}
+        limits = page_budget(budgets, page)
+        for viewport in viewports:
+            measured = measure_page(page, VIEWPORTS[viewport], base_dir, fold)
+            measurements[name][viewport] = measured
+            for metric in ('total', 'critical'):
+                limit = limits.get(viewport, {}).get(metric)
+                if limit is not None and measured[metric] > limit:
+                    counted = [r for r in measured['resources'] if metric == 'total' or r['critical']]
+                    breaches.append(breach(f"{name} {viewport} {metric}", limit, measured[metric],
+                                           [(r['bytes'], r['kind'], r['path'])
+                                            for r in counted[:OFFENDER_RESOURCES]]))
+            for resource in measured['resources']:
+                limit = resource_limits.get(resource['kind'])
+                if limit is not None and resource['bytes'] > limit:
+                    breaches.append(breach(f"{resource['path']} ({resource['kind']})", limit, resource['bytes'],
+                                           [(resource['bytes'], 'page', f"{name} {viewport}")]))
+
+    variant_limit = budgets.get('manifest', {}).get('variant')
+    if variant_limit is not None:
+        for path, size, source in manifest_variants(load_image_manifest(base_dir), base_dir):
+            if size > variant_limit:
+                breaches.append(breach(f"{path} (manifest variant)", variant_limit, size,
+                                       [(size, 'source', source)]))
+
+    # a resource over its cap on several pages or viewports is one offender
+    unique = {}
+    for found in breaches:
+        unique.setdefault((found['scope'], found['actual']), found)
+    breaches = sorted(unique.values(), key=lambda found: (-found['over'], found['scope']))
+    return measurements, breaches
+
+def report(measurements, budgets, breaches, limit=WORST_OFFENDERS):
+    """Print per-page totals against their budgets, then a diff of the worst offenders"""
+    for name, viewports in measurements.items():
+        limits = page_budget(budgets, name)
+        print(f"\n{name}:")
+        for viewport, measured in viewports.items():
+            cells = []
+            for metric in ('total', 'critical'):
+                budget = limits.get(viewport, {}).get(metric)
+                ok = budget is None or measured[metric] <= budget
+                cells.append(f"{'✅' if ok else '❌'} {metric} {measured[metric]:>10,}"
+                             + (f" / {budget:,}" if budget is not None else ''))
+            print(f"  {viewport:<8} {'   '.join(cells)}")
+
+    if not breaches:
+        print("\n✅ All page-weight budgets met")
+        return
+    print(f"\n❌ {len(breaches)} budget(s) exceeded; worst offenders:\n")
+    print("--- budget")
+    print("+++ actual")
+    for found in breaches[:limit]:
+        print(f"@@ {found['scope']} @@")
+        print(f"-{found['budget']:>12,} bytes")
+        print(f"+{found['actual']:>12,} bytes  (+{found['over']:,}, +{found['over'] / found['budget']:.0%})")
+        for size, kind, label in found['details']:
+            print(f" {size:>12,}  {kind:<10} {label}")
+    if len(breaches) > limit:
+        print(f"\n... and {len(breaches) - limit} more (see --report)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when pages or images exceed their page-weight budgets")
+    parser.add_argument('pages', nargs='*', help="optimized pages to check (default: index-optimized.html)")
+    parser.add_argument('--budgets', default=BUDGET_FILE, help="budget file (default: budgets.json)")
+    parser.add_argument('--viewport', choices=list(VIEWPORTS), action='append',
+                        help="only check this viewport (repeatable; default: all)")
+    parser.add_argument('--fold', default=FOLD_SELECTOR, metavar='SELECTOR',
+                        help=f"last element above the fold (default: {FOLD_SELECTOR})")
+    parser.add_argument('--report', metavar='PATH', help="also write measurements and breaches as JSON")
+    parser.add_argument('--top', type=int, default=WORST_OFFENDERS,
+                        help=f"offenders to show (default: {WORST_OFFENDERS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    pages = args.pages or [next((BASE_DIR / name for name in DEFAULT_PAGES if (BASE_DIR / name).exists()),
+                                BASE_DIR / DEFAULT_PAGES[-1])]
+    try:
+        budgets = load_budgets(args.budgets)
+    except (OSError, ValueError) as e:
+        sys.exit(f"❌ Could not read budgets from {args.budgets}: {e}")
+
+    measurements, breaches = check(pages, budgets, args.viewport or tuple(VIEWPORTS), BASE_DIR, args.fold)
+    report(measurements, budgets, breaches, args.top)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'viewports': VIEWPORTS, 'measurements': measurements, 'breaches': breaches}, f, indent=2)
+        print(f"\n✓ Report: {args.report}")
+    sys.exit(1 if breaches else 0)
+
+if __name__ == "__main__":
+    main()
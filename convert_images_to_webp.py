@@ -1,21 +1,99 @@
 #!/usr/bin/env python3
 """
 Image Conversion Script for Pink Pilates Set Landing Page
-Converts all images to WebP format and creates responsive sizes with LQIP
+Converts all images to WebP and AVIF and creates responsive sizes with LQIP
+
+Each source is decoded once; every responsive size is produced by a cascade of
+downscales (1200 -> 800 -> 600 -> 400 -> LQIP) from that single buffer and all
+WebP/JPEG variants are encoded in-process with Pillow.
 """
 
+import argparse
+import copy
+import hashlib
+import importlib.util
+import io
 import os
-import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
 from pathlib import Path
-from PIL import Image, ImageFilter
+from PIL import Image, ImageFilter, features
 import json
+import math
+import re
+
+import image_manifest
+from image_manifest import relative_path, write_manifest
+from image_metrics import METRICS_PATH, BuildMetrics, StageRecorder, profiled, report
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process limits, the decode budget still applies
+    resource = None
 
 # Configuration
 IMAGE_SIZES = [400, 600, 800, 1200]
 WEBP_QUALITY = 85
 LQIP_SIZE = 20
+MAX_WORKERS = os.cpu_count() or 1
 BASE_DIR = Path(__file__).parent
+BUILD_CACHE_PATH = BASE_DIR / 'images' / '.build-cache.json'
+
+# JPEG fallback encoder profiles (Pillow/libjpeg-turbo, identical on macOS and Linux).
+# optimize=True builds optimized Huffman tables; subsampling is chroma subsampling
+JPEG_PROFILES = {
+    'photo': {'quality': 85, 'progressive': True, 'optimize': True, 'subsampling': '4:2:0'},
+    'detail': {'quality': 88, 'progressive': True, 'optimize': True, 'subsampling': '4:4:4'},
+    'baseline': {'quality': 85, 'progressive': False, 'optimize': True, 'subsampling': '4:2:0'},
+}
+DEFAULT_JPEG_PROFILE = 'photo'
+
+# Order-bump cards are flat graphics with text, which 4:2:0 smears
+CATEGORY_JPEG_PROFILES = {
+    'order-bump': 'detail',
+}
+
+# AVIF tier: fixed quality unless a target SSIM is given, in which case each image
+# gets the lowest quality in [AVIF_MIN_QUALITY, AVIF_MAX_QUALITY] that still meets it
+AVIF_ENABLED = True
+AVIF_QUALITY = 60
+AVIF_SPEED = 6
+AVIF_MIN_QUALITY = 30
+AVIF_MAX_QUALITY = 90
+AVIF_TARGET_SSIM = None
+AVIF_SEARCH_WIDTH = 800
+
+# Responsive breakpoints: 'fixed' renders IMAGE_SIZES (the names index.html links to);
+# 'budget' plans widths per image so neighbouring variants differ by ~BREAKPOINT_BYTE_STEP
+BREAKPOINT_STRATEGY = 'fixed'
+BREAKPOINT_BYTE_STEP = 20 * 1024
+BREAKPOINT_MIN_WIDTH = 320
+BREAKPOINT_MAX_WIDTH = 1200
+BREAKPOINT_MAX_COUNT = 8
+BREAKPOINT_SAMPLES = 5
+
+# Inline placeholders: BlurHash + dominant color + aspect ratio stored in the manifest
+# so pages can paint a placeholder with zero extra requests (needs numpy)
+PLACEHOLDERS_ENABLED = True
+PLACEHOLDER_SAMPLE_WIDTH = 32
+BLURHASH_COMPONENTS = (4, 3)
+BLURHASH_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+# Near-duplicate detection: 64-bit difference hashes compared by Hamming distance.
+# 'report' lists duplicate groups; 'collapse' encodes only the canonical (first) image
+DEDUP_MODE = 'off'
+DEDUP_MAX_DISTANCE = 6
+
+# Sharded manifest (images/manifest/): 'json' or 'msgpack' shards
+MANIFEST_ENCODING = 'json'
+
+# Low-memory mode: with a per-worker cap, JPEGs are decoded at a reduced DCT scale
+# that fits DECODE_BUDGET_SHARE of the cap and resampling runs in horizontal strips
+MEMORY_LIMIT_MB = None
+DECODE_BUDGET_SHARE = 0.2
+RESIZE_STRIP_HEIGHT = 128
 
 # Image directories
 DIRECTORIES = {
@@ -25,198 +103,1004 @@ DIRECTORIES = {
     'order-bump': BASE_DIR / 'images' / 'order-bump'
 }
 
-def run_command(cmd):
-    """Run a command and return output"""
+def decode_budget(memory_limit_mb):
+    """Bytes a decoded bitmap may use under a per-worker memory cap"""
+    if not memory_limit_mb:
+        return None
+    return int(memory_limit_mb * 1024 * 1024 * DECODE_BUDGET_SHARE)
+
+def draft_scale(width, height, needed_width, budget):
+    """Pick the JPEG DCT scale (1, 1/2, 1/4, 1/8) to decode at.
+
+    Prefers the smallest decode still at least needed_width wide, then shrinks
+    further until the RGB bitmap fits the budget.
+    """
+    scale = 1
+    while scale < 8 and math.ceil(width / (scale * 2)) >= needed_width:
+        scale *= 2
+    while scale < 8 and math.ceil(width / scale) * math.ceil(height / scale) * 3 > budget:
+        scale *= 2
+    return scale
+
+def load_source(input_path, needed_width=None, memory_limit_mb=None):
+    """Decode a source image once into an RGB or RGBA buffer.
+
+    Returns (buffer, source dimensions). Under a memory cap, JPEGs use draft mode
+    so the decoder never materialises more pixels than needed_width and the cap allow.
+    """
+    with Image.open(input_path) as img:
+        source_size = img.size
+        budget = decode_budget(memory_limit_mb)
+        if budget and img.format == 'JPEG':
+            scale = draft_scale(img.width, img.height, needed_width or img.width, budget)
+            if scale > 1:
+                img.draft('RGB', (img.width // scale, img.height // scale))
+        img.load()
+        if img.mode in ('RGB', 'RGBA'):
+            return img.copy(), source_size
+        has_alpha = img.mode in ('LA', 'PA') or 'transparency' in img.info
+        return img.convert('RGBA' if has_alpha else 'RGB'), source_size
+
+def resize_in_strips(img, size, strip_height=RESIZE_STRIP_HEIGHT):
+    """LANCZOS resize one horizontal strip at a time.
+
+    Each strip is resampled from a box of the source; Pillow reads the filter
+    support from outside the box, so strips join without seams while the
+    intermediate buffer stays a strip tall instead of the full source height.
+    """
+    out = Image.new(img.mode, size)
+    scale_y = img.height / size[1]
+    for y0 in range(0, size[1], strip_height):
+        y1 = min(y0 + strip_height, size[1])
+        box = (0, y0 * scale_y, img.width, y1 * scale_y)
+        out.paste(img.resize((size[0], y1 - y0), Image.Resampling.LANCZOS, box=box), (0, y0))
+    return out
+
+def resize_to_width(img, width, strips=False):
+    """Resize keeping aspect ratio; never upscales"""
+    if width >= img.width:
+        return img
+    height = max(1, round(img.height * width / img.width))
+    if strips:
+        return resize_in_strips(img, (width, height))
+    return img.resize((width, height), Image.Resampling.LANCZOS)
+
+def resize_cascade(img, sizes, strips=False, metrics=None):
+    """Downscale largest-first, each step resampled from the previous one; returns {size: image}"""
+    resized = {}
+    current = img
+    for size in sorted(sizes, reverse=True):
+        with metrics.stage('resize', size=size) if metrics else nullcontext():
+            current = resize_to_width(current, size, strips)
+        resized[size] = current
+    return resized
+
+def data_segment_bytes():
+    """Current private data size of this process (Linux), or 0 where unknown"""
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True)
-        return result.stdout.strip(), result.stderr.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error running command: {cmd}")
-        print(f"Error: {e.stderr}")
-        return None, e.stderr
-
-def create_webp_with_cwebp(input_path, output_path, width=None, quality=WEBP_QUALITY):
-    """Convert image to WebP using cwebp for better compression"""
-    cmd = f'cwebp -q {quality}'
-    if width:
-        cmd += f' -resize {width} 0'
-    cmd += f' "{input_path}" -o "{output_path}"'
-
-    stdout, stderr = run_command(cmd)
-    if stderr:
-        print(f"Warning: {stderr}")
-    return os.path.exists(output_path)
-
-def create_responsive_jpeg(input_path, output_path, width=None, quality=85):
-    """Create responsive JPEG using macOS sips"""
-    cmd = f'sips -Z {width if width else 1200} "{input_path}" -s format jpeg -s formatOptions {quality} --out "{output_path}"'
-    stdout, stderr = run_command(cmd)
-    if stderr and "Error" not in stderr:
-        print(f"Warning: {stderr}")
-    return os.path.exists(output_path)
-
-def create_lqip(input_path, output_path):
-    """Create low quality image placeholder"""
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmData:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def limit_worker_memory(memory_limit_mb):
+    """Pool initializer: cap a worker's heap so an oversized image fails alone instead of OOM-killing the box.
+
+    The cap is measured on top of the interpreter's own footprint at start-up.
+    """
+    if not memory_limit_mb or resource is None:
+        return
+    limit = data_segment_bytes() + int(memory_limit_mb * 1024 * 1024)
     try:
-        with Image.open(input_path) as img:
-            # Convert to RGB if necessary
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
+        _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+    except (ValueError, OSError) as e:
+        print(f"Warning: could not set worker memory limit: {e}")
 
-            # Resize to very small
-            img_resized = img.resize((LQIP_SIZE, LQIP_SIZE), Image.Resampling.LANCZOS)
+def encode_webp(img, output_path, quality=WEBP_QUALITY):
+    """Encode a decoded buffer to WebP"""
+    img.save(output_path, 'WEBP', quality=quality, method=4)
+    return True
 
-            # Apply heavy blur for smooth placeholder
-            img_blurred = img_resized.filter(ImageFilter.GaussianBlur(radius=2))
+def webp_bytes(img, quality=WEBP_QUALITY):
+    """Encode a decoded buffer to WebP in memory"""
+    buffer = io.BytesIO()
+    encode_webp(img, buffer, quality)
+    return buffer.getvalue()
 
-            # Save as low quality JPEG
-            img_blurred.save(output_path, 'JPEG', quality=30, optimize=True)
-            return True
-    except Exception as e:
-        print(f"Error creating LQIP for {input_path}: {e}")
-        return False
+def jpeg_profile_for(category):
+    """Name of the JPEG profile used for a category's fallbacks"""
+    return CATEGORY_JPEG_PROFILES.get(category, DEFAULT_JPEG_PROFILE)
 
-def get_image_size_info(input_path):
-    """Get original image dimensions"""
-    try:
-        with Image.open(input_path) as img:
-            return img.width, img.height
-    except Exception as e:
-        print(f"Error getting image size for {input_path}: {e}")
-        return None, None
+def encoder_settings(category=None):
+    """Encoder choices for a category, resolved in the parent and handed to each render job"""
+    return {
+        'jpeg_profile': jpeg_profile_for(category),
+        'avif': AVIF_ENABLED and features.check('avif'),
+        'avif_quality': AVIF_QUALITY,
+        'avif_target_ssim': AVIF_TARGET_SSIM,
+        'breakpoints': BREAKPOINT_STRATEGY,
+        'byte_step': BREAKPOINT_BYTE_STEP,
+        'memory_limit_mb': MEMORY_LIMIT_MB,
+        'placeholders': PLACEHOLDERS_ENABLED,
+    }
+
+def encode_jpeg(img, output_path, profile=DEFAULT_JPEG_PROFILE):
+    """Encode a decoded buffer to a JPEG fallback using a JPEG_PROFILES entry"""
+    settings = JPEG_PROFILES[profile]
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img.save(output_path, 'JPEG', **settings)
+    return True
+
+def jpeg_bytes(img, profile=DEFAULT_JPEG_PROFILE):
+    """Encode a decoded buffer to a JPEG fallback in memory"""
+    buffer = io.BytesIO()
+    encode_jpeg(img, buffer, profile)
+    return buffer.getvalue()
+
+def avif_bytes(img, quality):
+    """Encode a decoded buffer to AVIF in memory"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'AVIF', quality=quality, speed=AVIF_SPEED)
+    return buffer.getvalue()
+
+def ssim(reference, candidate):
+    """Mean SSIM of the luma planes over 8x8 windows (needs numpy)"""
+    import numpy as np
+
+    def luma(img):
+        return np.asarray(img.convert('L'), dtype=np.float64)
+
+    def window_means(plane, block=8):
+        h, w = (plane.shape[0] // block) * block, (plane.shape[1] // block) * block
+        return plane[:h, :w].reshape(h // block, block, w // block, block).mean(axis=(1, 3))
+
+    x, y = luma(reference), luma(candidate)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_x, mu_y = window_means(x), window_means(y)
+    var_x = window_means(x * x) - mu_x ** 2
+    var_y = window_means(y * y) - mu_y ** 2
+    cov = window_means(x * y) - mu_x * mu_y
+    score = ((2 * mu_x * mu_y + c1) * (2 * cov + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (var_x + var_y + c2))
+    return float(score.mean())
+
+def search_avif_quality(img, target_ssim):
+    """Binary-search the lowest AVIF quality whose decode still scores target_ssim"""
+    lo, hi = AVIF_MIN_QUALITY, AVIF_MAX_QUALITY
+    best = hi
+    while lo <= hi:
+        quality = (lo + hi) // 2
+        with Image.open(io.BytesIO(avif_bytes(img, quality))) as decoded:
+            score = ssim(img, decoded)
+        if score >= target_ssim:
+            best, hi = quality, quality - 1
+        else:
+            lo = quality + 1
+    return best
+
+def webp_size(img, quality=WEBP_QUALITY):
+    """Encoded WebP byte size of a buffer, without writing it"""
+    buffer = io.BytesIO()
+    img.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.tell()
+
+def plan_breakpoints(img, byte_step=BREAKPOINT_BYTE_STEP, strips=False):
+    """Pick srcset widths so neighbouring variants differ by about byte_step encoded bytes.
+
+    WebP sizes are measured at a few sample widths and interpolated in between.
+    Widths never exceed the source, so nothing is upscaled.
+    """
+    max_width = min(img.width, BREAKPOINT_MAX_WIDTH)
+    min_width = min(BREAKPOINT_MIN_WIDTH, max_width)
+    if max_width - min_width < 10:
+        return [max_width]
 
-def process_image(input_path, output_dir, name_without_ext):
-    """Process a single image: create WebP versions, responsive JPEGs, and LQIP"""
-    results = {
-        'original': str(input_path),
+    samples = sorted({round(min_width + (max_width - min_width) * i / (BREAKPOINT_SAMPLES - 1))
+                      for i in range(BREAKPOINT_SAMPLES)})
+    resized = resize_cascade(img, samples, strips)
+    measured = [(width, webp_size(resized[width])) for width in samples]
+
+    def width_for(target_bytes):
+        for (w0, b0), (w1, b1) in zip(measured, measured[1:]):
+            if b0 <= target_bytes <= b1 and b1 > b0:
+                return w0 + (w1 - w0) * (target_bytes - b0) / (b1 - b0)
+        return None
+
+    widths = [max_width]
+    target = measured[-1][1] - byte_step
+    while target > measured[0][1] and len(widths) < BREAKPOINT_MAX_COUNT - 1:
+        width = width_for(target)
+        if width is None:
+            break
+        width = int(round(width / 10) * 10)
+        if min_width < width < widths[-1]:
+            widths.append(width)
+        target -= byte_step
+    widths.append(min_width)
+    return sorted(set(widths))
+
+def base83(value, length):
+    """BlurHash base-83 digits of an integer"""
+    return ''.join(BLURHASH_ALPHABET[(value // 83 ** (length - 1 - i)) % 83] for i in range(length))
+
+def blurhash(img, components=BLURHASH_COMPONENTS):
+    """BlurHash of a small RGB buffer, computed as a matrix product over all pixels at once"""
+    import numpy as np
+
+    pixels = np.asarray(img.convert('RGB'), dtype=np.float64) / 255
+    linear = np.where(pixels <= 0.04045, pixels / 12.92, ((pixels + 0.055) / 1.055) ** 2.4)
+    height, width = linear.shape[:2]
+    comp_x, comp_y = components
+
+    basis_x = np.cos(np.pi * np.outer(np.arange(comp_x), np.arange(width)) / width)
+    basis_y = np.cos(np.pi * np.outer(np.arange(comp_y), np.arange(height)) / height)
+    factors = np.einsum('jy,ix,yxc->jic', basis_y, basis_x, linear) / (width * height)
+    factors[1:, :] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+
+    def to_srgb(value):
+        value = min(max(value, 0.0), 1.0)
+        srgb = value * 12.92 if value <= 0.0031308 else 1.055 * value ** (1 / 2.4) - 0.055
+        return int(srgb * 255 + 0.5)
+
+    dc, ac = factors[0], factors[1:]
+    encoded = base83((comp_x - 1) + (comp_y - 1) * 9, 1)
+    max_ac = float(np.abs(ac).max()) if len(ac) else 0.0
+    quantised_max = int(max(0, min(82, math.floor(max_ac * 166 - 0.5)))) if len(ac) else 0
+    encoded += base83(quantised_max, 1)
+    encoded += base83((to_srgb(dc[0]) << 16) + (to_srgb(dc[1]) << 8) + to_srgb(dc[2]), 4)
+
+    if len(ac):
+        max_value = (quantised_max + 1) / 166
+        quantised = np.floor(np.clip(np.sign(ac) * np.sqrt(np.abs(ac / max_value)) * 9 + 9.5, 0, 18)).astype(int)
+        for r, g, b in quantised:
+            encoded += base83(int(r) * 19 * 19 + int(g) * 19 + int(b), 2)
+    return encoded
+
+def dominant_color(img, colors=5):
+    """Hex color of the most common entry in a small adaptive palette"""
+    quantized = img.convert('RGB').quantize(colors=colors)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def placeholder(img, source_size):
+    """Inline placeholder data for the manifest, from an already-downscaled buffer"""
+    sample = resize_to_width(img, PLACEHOLDER_SAMPLE_WIDTH)
+    width, height = source_size
+    # Portrait images get more vertical detail
+    components = BLURHASH_COMPONENTS if width >= height else BLURHASH_COMPONENTS[::-1]
+    return {
+        'blurhash': blurhash(sample, components),
+        'color': dominant_color(sample),
+        'aspect_ratio': round(width / height, 4),
+    }
+
+def create_lqip(img, output_path):
+    """Create low quality image placeholder from an already-downscaled buffer"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Resize to very small
+    img_resized = img.resize((LQIP_SIZE, LQIP_SIZE), Image.Resampling.LANCZOS)
+
+    # Apply heavy blur for smooth placeholder
+    img_blurred = img_resized.filter(ImageFilter.GaussianBlur(radius=2))
+
+    # Save as low quality JPEG
+    img_blurred.save(output_path, 'JPEG', quality=30, optimize=True)
+    return True
+
+def write_variant(metrics, fmt, size, img, output_path, encode):
+    """Encode img with encode(img) -> bytes and write it, timing both; returns the file name"""
+    with metrics.stage('encode', fmt, size):
+        data = encode(img)
+    with metrics.stage('write', fmt, size):
+        output_path.write_bytes(data)
+    metrics.output(fmt, size, img.size, len(data))
+    return output_path.name
+
+def empty_results(original):
+    return {
+        'original': original,
         'webp': {},
         'jpeg': {},
+        'avif': {},
         'lqip': None,
-        'dimensions': get_image_size_info(input_path)
+        'dimensions': (None, None)
     }
 
+def render_image(input_path, output_dir, name_without_ext, original_webp=True, settings=None):
+    """Decode one image and encode all of its variants; runs in a worker process
+
+    results['metrics'] carries the render's StageRecorder data back to the parent,
+    which takes it out before the results reach the cache or the manifest.
+    """
+    settings = settings or encoder_settings()
+    metrics = StageRecorder(input_path.stat().st_size)
+
+    # Without the original-size WebP nothing wider than the largest variant is needed
+    needed_width = None if original_webp else max(IMAGE_SIZES + [BREAKPOINT_MAX_WIDTH])
+    try:
+        with metrics.stage('decode'):
+            img, source_size = load_source(input_path, needed_width, settings['memory_limit_mb'])
+    except Exception as e:
+        results = empty_results(cache_key(input_path))
+        results['error'] = f"decode failed: {e!r}"
+        results['metrics'] = metrics.as_dict()
+        return results
+    return render_variants(img, source_size, output_dir, name_without_ext, cache_key(input_path),
+                           original_webp, settings, metrics)
+
+def render_variants(img, source_size, output_dir, name_without_ext, original, original_webp=True, settings=None,
+                    metrics=None):
+    """Encode every variant of an already-decoded RGB/RGBA buffer; returns the manifest entry
+
+    Used by render_image after decoding a source, and by generators that draw
+    their images in memory and so never need a lossy intermediate file.
+    """
+    settings = settings or encoder_settings()
+    metrics = metrics or StageRecorder()
+    results = empty_results(original)
+    results['dimensions'] = source_size
+    metrics.source_size = list(source_size)
+    strips = bool(settings['memory_limit_mb'])
+
     # Create output directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    try:
+        if settings['breakpoints'] == 'budget':
+            with metrics.stage('plan'):
+                sizes = plan_breakpoints(img, settings['byte_step'], strips)
+            results['widths'] = sizes
+        else:
+            sizes = IMAGE_SIZES
+            # Every fixed size is written so hand-written links resolve, but only
+            # widths the source actually covers are srcset candidates
+            results['widths'] = [size for size in sizes if size <= source_size[0]] or [min(sizes)]
+        resized = resize_cascade(img, sizes, strips, metrics)
+
+        # Create WebP versions
+        for size in sizes:
+            results['webp'][size] = write_variant(metrics, 'webp', size, resized[size],
+                                                  output_dir / f"{name_without_ext}-{size}.webp", webp_bytes)
+
+        # Also create original size WebP
+        if original_webp:
+            results['webp']['original'] = write_variant(metrics, 'webp', 'original', img,
+                                                        output_dir / f"{name_without_ext}.webp", webp_bytes)
+
+        # Create responsive JPEG versions (fallback)
+        profile = settings['jpeg_profile']
+        for size in sizes:
+            results['jpeg'][size] = write_variant(metrics, 'jpeg', size, resized[size],
+                                                  output_dir / f"{name_without_ext}-{size}.jpg",
+                                                  lambda img: jpeg_bytes(img, profile))
+
+        # Create AVIF versions, optionally at a per-image searched quality
+        if settings['avif']:
+            quality = settings['avif_quality']
+            if settings['avif_target_ssim']:
+                reference = resized[min(sizes, key=lambda size: abs(size - AVIF_SEARCH_WIDTH))]
+                with metrics.stage('search', 'avif'):
+                    quality = search_avif_quality(reference, settings['avif_target_ssim'])
+            results['avif_quality'] = quality
+            for size in sizes:
+                results['avif'][size] = write_variant(metrics, 'avif', size, resized[size],
+                                                      output_dir / f"{name_without_ext}-{size}.avif",
+                                                      lambda img: avif_bytes(img, quality))
+
+        # Create LQIP from the smallest step of the cascade
+        lqip_path = output_dir / f"{name_without_ext}-lqip.jpg"
+        with metrics.stage('lqip'):
+            created = create_lqip(resized[min(sizes)], lqip_path)
+        if created:
+            results['lqip'] = lqip_path.name
+            metrics.output('lqip', LQIP_SIZE, (LQIP_SIZE, LQIP_SIZE), lqip_path.stat().st_size)
+
+        # Inline placeholder from the same smallest step
+        if settings['placeholders']:
+            with metrics.stage('placeholder'):
+                results['placeholder'] = placeholder(resized[min(sizes)], source_size)
+    except Exception as e:
+        results['error'] = f"encode failed: {e!r}"
+
+    results['metrics'] = metrics.as_dict()
+    return results
+
+def report_image(input_path, results, record=None):
+    """Print the variants written for one image, with their sizes and the render time if recorded"""
+    sizes = {(fmt, size): nbytes for fmt, size, _, nbytes, _ in (record or {}).get('outputs', [])}
+
+    def written(fmt, size):
+        return f" ({sizes[fmt, size]:,} bytes)" if (fmt, size) in sizes else ''
+
     print(f"\nProcessing: {input_path.name}")
+    for size, name in results['webp'].items():
+        print(f"  ✓ WebP {size}{'px' if size != 'original' else ''}: {name}{written('webp', size)}")
+    for size, name in results['jpeg'].items():
+        print(f"  ✓ JPEG {size}px: {name}{written('jpeg', size)}")
+    for size, name in results.get('avif', {}).items():
+        print(f"  ✓ AVIF {size}px (q{results['avif_quality']}): {name}{written('avif', size)}")
+    if results['lqip']:
+        print(f"  ✓ LQIP: {results['lqip']}")
+    if 'placeholder' in results:
+        print(f"  ✓ Placeholder: {results['placeholder']['blurhash']} {results['placeholder']['color']}")
+    if record:
+        stages = {}
+        for name, _, _, seconds in record['stages']:
+            stages[name] = stages.get(name, 0) + seconds
+        print(f"  ⏱ {record['seconds'] * 1000:.0f} ms: "
+              + ', '.join(f"{name} {seconds * 1000:.0f}" for name, seconds in stages.items()))
+    if 'error' in results:
+        print(f"  ✗ Error: {results.pop('error')}")
+    return results
+
+def process_image(input_path, output_dir, name_without_ext, settings=None):
+    """Process a single image: create WebP, AVIF and responsive JPEG versions, and LQIP"""
+    results = render_image(input_path, output_dir, name_without_ext, settings=settings)
+    return report_image(input_path, results, results.pop('metrics', None))
+
+def settings_fingerprint(settings=None):
+    """Hash of every encoder setting that affects the generated variants"""
+    settings = settings or encoder_settings()
+    fingerprint = {
+        'image_sizes': IMAGE_SIZES,
+        'webp_quality': WEBP_QUALITY,
+        'jpeg': JPEG_PROFILES[settings['jpeg_profile']],
+        'avif': [settings['avif'], settings['avif_quality'], settings['avif_target_ssim'],
+                 AVIF_SPEED, AVIF_MIN_QUALITY, AVIF_MAX_QUALITY, AVIF_SEARCH_WIDTH],
+        'breakpoints': [settings['breakpoints'], settings['byte_step'], BREAKPOINT_MIN_WIDTH,
+                        BREAKPOINT_MAX_WIDTH, BREAKPOINT_MAX_COUNT, BREAKPOINT_SAMPLES],
+        'memory': [settings['memory_limit_mb'], DECODE_BUDGET_SHARE],
+        'placeholder': [settings['placeholders'], PLACEHOLDER_SAMPLE_WIDTH, BLURHASH_COMPONENTS],
+        'lqip_size': LQIP_SIZE,
+    }
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:16]
+
+def hash_file(path):
+    """SHA-256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(path):
+    """Cache entries are keyed by the source path relative to the project"""
+    return relative_path(path, BASE_DIR)
+
+def load_build_cache(path=BUILD_CACHE_PATH):
+    """Load the incremental build cache, starting fresh if it is missing or unreadable"""
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {'entries': {}}
+    cache.setdefault('entries', {})
+    return cache
 
-    # Create WebP versions
-    for size in IMAGE_SIZES:
-        webp_path = output_dir / f"{name_without_ext}-{size}.webp"
-        if create_webp_with_cwebp(input_path, webp_path, width=size):
-            results['webp'][size] = f"{name_without_ext}-{size}.webp"
-            print(f"  ✓ WebP {size}px: {webp_path.name}")
-
-    # Also create original size WebP
-    webp_original = output_dir / f"{name_without_ext}.webp"
-    if create_webp_with_cwebp(input_path, webp_original):
-        results['webp']['original'] = f"{name_without_ext}.webp"
-        print(f"  ✓ WebP original: {webp_original.name}")
-
-    # Create responsive JPEG versions (fallback)
-    for size in IMAGE_SIZES:
-        jpeg_path = output_dir / f"{name_without_ext}-{size}.jpg"
-        if create_responsive_jpeg(input_path, jpeg_path, width=size):
-            results['jpeg'][size] = f"{name_without_ext}-{size}.jpg"
-            print(f"  ✓ JPEG {size}px: {jpeg_path.name}")
-
-    # Create LQIP
-    lqip_path = output_dir / f"{name_without_ext}-lqip.jpg"
-    if create_lqip(input_path, lqip_path):
-        results['lqip'] = f"{name_without_ext}-lqip.jpg"
-        print(f"  ✓ LQIP: {lqip_path.name}")
+def save_build_cache(cache, path=BUILD_CACHE_PATH):
+    """Persist the incremental build cache"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(cache, f, indent=2)
 
+def output_files(results):
+    """Every file name a manifest entry points at"""
+    names = [name for kind in ('webp', 'jpeg', 'avif') for name in results.get(kind, {}).values()]
+    if results['lqip']:
+        names.append(results['lqip'])
+    return names
+
+def restore_sizes(results):
+    """JSON turns size keys into strings; bring back the int keys fresh results use"""
+    for kind in ('webp', 'jpeg', 'avif'):
+        if kind not in results:
+            continue
+        results[kind] = {int(k) if str(k).isdigit() else k: v for k, v in results[kind].items()}
+    results['dimensions'] = tuple(results['dimensions'])
     return results
 
-def process_directory(directory_path, output_base_dir, category):
-    """Process all images in a directory"""
-    if not directory_path.exists():
-        print(f"Directory not found: {directory_path}")
-        return {}
+def cached_results(cache, input_path, output_dir, digest, settings=None):
+    """Return the cached manifest entry if the source and settings are unchanged and outputs exist"""
+    if cache is None:
+        return None
+    entry = cache['entries'].get(cache_key(input_path))
+    if not entry or entry['hash'] != digest or entry['settings'] != settings_fingerprint(settings):
+        return None
+    if Path(entry['output_dir']).resolve() != output_dir.resolve():
+        return None
+    if not all((output_dir / name).exists() for name in output_files(entry['results'])):
+        return None
+    results = restore_sizes(json.loads(json.dumps(entry['results'])))
+    results['original'] = cache_key(input_path)
+    return results
 
-    results = {}
-    output_dir = output_base_dir / category
+def store_results(cache, input_path, output_dir, digest, results, settings=None):
+    """Record a successful render in the cache"""
+    if cache is None or 'error' in results:
+        return
+    cache['entries'][cache_key(input_path)] = {
+        'hash': digest,
+        'settings': settings_fingerprint(settings),
+        'output_dir': str(output_dir),
+        'results': json.loads(json.dumps(results)),
+    }
+
+def source_path(key):
+    """Inverse of cache_key"""
+    return Path(key) if Path(key).is_absolute() else BASE_DIR / key
 
+def drop_cached_outputs(cache, key):
+    """Remove a cache entry and delete the outputs it recorded; returns files deleted"""
+    entry = cache['entries'].pop(key, None)
+    if entry is None:
+        return 0
+    removed = 0
+    # Never delete a file that is itself a tracked source
+    live_sources = {source_path(k).resolve() for k in cache['entries']}
+    live_sources.add(source_path(key).resolve())
+    output_dir = Path(entry['output_dir'])
+    for name in output_files(entry['results']):
+        output_path = output_dir / name
+        if output_path.exists() and output_path.resolve() not in live_sources:
+            output_path.unlink()
+            removed += 1
+    return removed
+
+def prune_build_cache(cache):
+    """Delete outputs of sources that no longer exist and drop their entries"""
+    removed = 0
+    for key in [k for k in cache['entries'] if not source_path(k).exists()]:
+        removed += drop_cached_outputs(cache, key)
+        print(f"  ✗ Pruned outputs of deleted source: {key}")
+    return removed
+
+def perceptual_hash(input_path):
+    """64-bit difference hash (dHash) of a source, decoded at reduced size"""
+    with Image.open(input_path) as img:
+        img.draft('L', (64, 64))  # JPEG only; other formats decode normally
+        small = img.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()     # one byte per pixel in mode L
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance for near-duplicate lookups"""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        node = [value, item, {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            if distance not in current[2]:
+                current[2][distance] = node
+                return
+            current = current[2][distance]
+
+    def nearest(self, value, max_distance):
+        """Closest (distance, item) within max_distance, or None"""
+        best = None
+        stack = [self.root] if self.root else []
+        while stack:
+            current = stack.pop()
+            distance = hamming(value, current[0])
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, current[1])
+            # Triangle inequality: only children within max_distance of this node can match
+            for child_distance, child in current[2].items():
+                if abs(child_distance - distance) <= max_distance:
+                    stack.append(child)
+        return best
+
+def cached_perceptual_hash(cache, image_path):
+    """perceptual_hash, memoised in the build cache by path, size and mtime"""
+    if cache is None:
+        return perceptual_hash(image_path)
+    stat = image_path.stat()
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    hashes = cache.setdefault('phashes', {})
+    key = cache_key(image_path)
+    if key in hashes and hashes[key][:2] == stamp:
+        return hashes[key][2]
+    value = perceptual_hash(image_path)
+    hashes[key] = stamp + [value]
+    return value
+
+def find_duplicates(directories, cache=None, max_distance=DEDUP_MAX_DISTANCE):
+    """Map each near-duplicate source path to its canonical (category, path).
+
+    Sources are visited in category then name order; the first image of each
+    group is canonical, so the choice is stable between builds.
+    """
+    tree = BKTree()
+    duplicates = {}
+    for category, directory_path in directories.items():
+        if not directory_path.exists():
+            continue
+        for image_path, _ in find_source_images(directory_path):
+            try:
+                value = cached_perceptual_hash(cache, image_path)
+            except Exception as e:
+                print(f"  ✗ Could not hash {image_path.name}: {e}")
+                continue
+            match = tree.nearest(value, max_distance)
+            if match is None:
+                tree.add(value, (category, image_path))
+            else:
+                duplicates[image_path] = match[1]
+    return duplicates
+
+def report_duplicates(duplicates):
+    """Print duplicate groups under their canonical image"""
+    groups = {}
+    for duplicate, canonical in duplicates.items():
+        groups.setdefault(canonical, []).append(duplicate)
+    print(f"\n=== Near-duplicates: {len(duplicates)} image(s) in {len(groups)} group(s) ===")
+    for (category, canonical), members in groups.items():
+        print(f"  {category}/{canonical.name}")
+        for member in members:
+            print(f"    ≈ {member.parent.name}/{member.name}")
+
+# Generated variants look like "<source stem>-<width>" or "<source stem>-lqip"
+VARIANT_STEM = re.compile(r'^(?P<base>.+)-(?:\d+|lqip)$')
+
+def find_source_images(directory_path):
+    """Return (path, name_without_ext) for unprocessed source images, sorted by name"""
     # Supported image formats
     extensions = ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.JPEG', '*.PNG']
 
-    image_files = []
+    image_files = set()
     for ext in extensions:
-        image_files.extend(directory_path.glob(ext))
+        image_files.update(directory_path.glob(ext))
+    stems = {path.stem for path in image_files}
 
-    if not image_files:
-        print(f"No images found in {directory_path}")
-        return results
-
-    print(f"\n=== Processing {category.upper()} images ===")
-
-    for image_path in image_files:
-        # Skip already processed files (like -lqip, -size)
-        if any(skip in image_path.name for skip in ['-lqip-', '-400.', '-600.', '-800.', '-1200.']):
+    sources = []
+    for image_path in sorted(image_files):
+        # Skip already processed files: a -<width> or -lqip variant of a sibling source
+        match = VARIANT_STEM.match(image_path.stem)
+        if match and ({match['base'], match['base'] + '-original'} & stems):
             continue
 
         name_without_ext = image_path.stem
         if name_without_ext.endswith('-original'):
             name_without_ext = name_without_ext[:-9]  # Remove '-original' suffix
+        sources.append((image_path, name_without_ext))
+    return sources
+
+def plan_image(cache, image_path, output_dir, settings=None):
+    """Hash a source and return (digest, cached results or None)"""
+    if cache is None:
+        return None, None
+    digest = hash_file(image_path)
+    return digest, cached_results(cache, image_path, output_dir, digest, settings)
+
+def queue_directory(directory_path, output_dir, executor=None, cache=None, settings=None, skip=()):
+    """Hash every source and queue renders for the ones the cache can't answer.
 
-        result = process_image(image_path, output_dir, name_without_ext)
-        results[image_path.name] = result
+    Sources in skip (collapsed duplicates) are not rendered and lose any old outputs.
+    """
+    queued = []
+    for image_path, name_without_ext in find_source_images(directory_path):
+        if image_path in skip:
+            if cache is not None:
+                drop_cached_outputs(cache, cache_key(image_path))
+            queued.append((image_path, None, None, 'duplicate'))
+            continue
+        digest, cached = plan_image(cache, image_path, output_dir, settings)
+        if cached is not None:
+            queued.append((image_path, digest, cached, 'cached'))
+        elif executor is None:
+            results = render_image(image_path, output_dir, name_without_ext, settings=settings)
+            queued.append((image_path, digest, results, 'rendered'))
+        else:
+            future = executor.submit(render_image, image_path, output_dir, name_without_ext,
+                                     settings=settings)
+            queued.append((image_path, digest, future, 'rendered'))
+    return queued
 
+def collect_directory(queued, output_dir, cache=None, settings=None, metrics=None, category=None):
+    """Wait for queued renders in order, recording fresh results in the cache and their stages in metrics"""
+    results = {}
+    for image_path, digest, outcome, status in queued:
+        if status == 'duplicate':
+            # Filled in from the canonical image by resolve_duplicates
+            results[image_path.name] = None
+            continue
+        if status == 'cached':
+            print(f"\nUnchanged: {image_path.name} (cached)")
+            results[image_path.name] = outcome
+            if metrics is not None:
+                metrics.cached += 1
+            continue
+        image_results = outcome if isinstance(outcome, dict) else outcome.result()
+        record = image_results.pop('metrics', None)
+        if metrics is not None and record is not None:
+            metrics.add(category, image_path.name, record)
+        store_results(cache, image_path, output_dir, digest, image_results, settings)
+        results[image_path.name] = report_image(image_path, image_results, record)
     return results
 
-def generate_manifest(all_results):
-    """Generate a manifest file with all image information"""
-    manifest = {
-        'generated_at': str(Path(__file__).stat().st_mtime),
+def resolve_duplicates(all_results, collapsed, directories):
+    """Point each collapsed duplicate's manifest entry at its canonical image's variants"""
+    category_of = {directory_path: category for category, directory_path in directories.items()}
+    for duplicate, (category, canonical) in collapsed.items():
+        results = all_results.get(category_of.get(duplicate.parent), {})
+        if results.get(duplicate.name, False) is not None:
+            continue
+        canonical_entry = all_results.get(category, {}).get(canonical.name)
+        if canonical_entry is None:
+            del results[duplicate.name]
+            continue
+        entry = copy.deepcopy(canonical_entry)
+        entry['original'] = cache_key(duplicate)
+        entry['duplicate_of'] = {'category': category, 'name': canonical.name}
+        results[duplicate.name] = entry
+        print(f"  ≈ {duplicate.name} → {category}/{canonical.name}")
+
+def process_directory(directory_path, output_base_dir, category, executor=None, cache=None, skip=(),
+                      metrics=None):
+    """Process all images in a directory, one executor job per image if given"""
+    if not directory_path.exists():
+        print(f"Directory not found: {directory_path}")
+        return {}
+
+    output_dir = output_base_dir / category
+    settings = encoder_settings(category)
+    queued = queue_directory(directory_path, output_dir, executor, cache, settings, skip)
+    if not queued:
+        print(f"No images found in {directory_path}")
+        return {}
+
+    print(f"\n=== Processing {category.upper()} images (JPEG: {settings['jpeg_profile']}) ===")
+    return collect_directory(queued, output_dir, cache, settings, metrics, category)
+
+def convert_all(directories, output_base_dir, workers=MAX_WORKERS, cache=None, dedup=DEDUP_MODE,
+                metrics=None):
+    """Convert every category on a shared process pool; results keep a stable order"""
+    collapsed = {}
+    if dedup != 'off':
+        duplicates = find_duplicates(directories, cache, DEDUP_MAX_DISTANCE)
+        report_duplicates(duplicates)
+        if dedup == 'collapse':
+            collapsed = duplicates
+
+    all_results = {}
+    if workers <= 1:
+        for category, directory_path in directories.items():
+            results = process_directory(directory_path, output_base_dir, category,
+                                        cache=cache, skip=collapsed, metrics=metrics)
+            if results:
+                all_results[category] = results
+        resolve_duplicates(all_results, collapsed, directories)
+        return all_results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=limit_worker_memory,
+                             initargs=(MEMORY_LIMIT_MB,)) as executor:
+        # Queue every category before collecting so the pool never idles between directories
+        queued = {}
+        for category, directory_path in directories.items():
+            if not directory_path.exists():
+                print(f"Directory not found: {directory_path}")
+                continue
+            output_dir = output_base_dir / category
+            settings = encoder_settings(category)
+            images = queue_directory(directory_path, output_dir, executor, cache, settings, collapsed)
+            queued[category] = (output_dir, settings, images)
+
+        for category, (output_dir, settings, images) in queued.items():
+            if not images:
+                print(f"No images found in {directories[category]}")
+                continue
+            print(f"\n=== Processing {category.upper()} images (JPEG: {settings['jpeg_profile']}) ===")
+            all_results[category] = collect_directory(images, output_dir, cache, settings, metrics, category)
+
+    resolve_duplicates(all_results, collapsed, directories)
+    return all_results
+
+def manifest_settings():
+    """Encoder settings recorded at the top of the manifest"""
+    return {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
         'image_sizes': IMAGE_SIZES,
         'webp_quality': WEBP_QUALITY,
-        'categories': {}
+        'avif_quality': AVIF_QUALITY,
+        'avif_target_ssim': AVIF_TARGET_SSIM,
+        'breakpoints': BREAKPOINT_STRATEGY,
+        'breakpoint_byte_step': BREAKPOINT_BYTE_STEP,
     }
 
-    for category, results in all_results.items():
-        manifest['categories'][category] = {}
-        for original_name, data in results.items():
-            manifest['categories'][category][original_name] = data
+def metrics_settings(workers):
+    """Encoder and run settings recorded in the build metrics, so builds compare like with like"""
+    import PIL
+    settings = manifest_settings()
+    del settings['generated_at']
+    settings.update({
+        'jpeg_profiles': JPEG_PROFILES,
+        'category_jpeg_profiles': CATEGORY_JPEG_PROFILES,
+        'avif': AVIF_ENABLED,
+        'avif_speed': AVIF_SPEED,
+        'placeholders': PLACEHOLDERS_ENABLED,
+        'memory_limit_mb': MEMORY_LIMIT_MB,
+        'workers': workers,
+        'pillow': PIL.__version__,
+    })
+    return settings
+
+def generate_manifest(all_results, encoding=MANIFEST_ENCODING, legacy=True):
+    """Generate the sharded manifest and, for the JS tooling, the single-file images/manifest.json"""
+    settings = manifest_settings()
+    index_path = write_manifest(all_results, settings, encoding=encoding)
+    print(f"\n✓ Generated manifest: {index_path} ({len(all_results)} {encoding} shard(s))")
+
+    if legacy:
+        manifest = dict(settings, categories={})
+        for category, results in all_results.items():
+            manifest['categories'][category] = {}
+            for original_name, data in results.items():
+                manifest['categories'][category][original_name] = data
+
+        manifest_path = BASE_DIR / 'images' / 'manifest.json'
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f"✓ Generated manifest: {manifest_path}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert images to WebP with responsive sizes and LQIP")
+    parser.add_argument('-j', '--workers', type=int, default=MAX_WORKERS,
+                        help=f"worker processes for conversion (default: {MAX_WORKERS}, 1 = serial)")
+    parser.add_argument('--force', action='store_true',
+                        help="ignore the build cache and re-encode every image")
+    parser.add_argument('--jpeg-profile', action='append', default=[], metavar='CATEGORY=PROFILE',
+                        help=f"JPEG fallback profile for a category ({', '.join(JPEG_PROFILES)}); repeatable")
+    parser.add_argument('--no-avif', action='store_true', help="skip the AVIF tier")
+    parser.add_argument('--avif-target-ssim', type=float, default=AVIF_TARGET_SSIM, metavar='SSIM',
+                        help="search each image's AVIF quality for this SSIM (e.g. 0.95) instead of "
+                             f"the fixed quality {AVIF_QUALITY}")
+    parser.add_argument('--breakpoints', choices=['fixed', 'budget'], default=BREAKPOINT_STRATEGY,
+                        help="'fixed' renders IMAGE_SIZES; 'budget' plans widths per image by encoded bytes")
+    parser.add_argument('--byte-step', type=int, default=BREAKPOINT_BYTE_STEP // 1024, metavar='KB',
+                        help=f"bytes between budget breakpoints (default: {BREAKPOINT_BYTE_STEP // 1024} KB)")
+    parser.add_argument('--memory-limit', type=int, default=MEMORY_LIMIT_MB, metavar='MB',
+                        help="per-worker memory cap; enables reduced JPEG decoding and strip resampling")
+    parser.add_argument('--dedup', choices=['off', 'report', 'collapse'], default=DEDUP_MODE,
+                        help="find near-duplicate images by perceptual hash; 'collapse' encodes one per group")
+    parser.add_argument('--dedup-distance', type=int, default=DEDUP_MAX_DISTANCE, metavar='BITS',
+                        help=f"max Hamming distance of 64-bit hashes to count as duplicates "
+                             f"(default: {DEDUP_MAX_DISTANCE})")
+    parser.add_argument('--manifest-encoding', choices=['json', 'msgpack'], default=MANIFEST_ENCODING,
+                        help="encoding of the images/manifest/ shards (msgpack needs: pip install msgpack)")
+    parser.add_argument('--no-legacy-manifest', action='store_true',
+                        help="only write the sharded manifest, not images/manifest.json")
+    parser.add_argument('--metrics', default=METRICS_PATH, metavar='PATH',
+                        help="where to write per-stage timings and byte counts "
+                             "(default: images/.build-metrics.json)")
+    parser.add_argument('--no-metrics', action='store_true', help="don't write build metrics")
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'],
+                        help="profile the conversion (runs serially; output in images/.profile/)")
+    return parser.parse_args(argv)
+
+def apply_jpeg_profile_overrides(overrides):
+    """Apply CATEGORY=PROFILE overrides from the command line"""
+    for override in overrides:
+        category, _, profile = override.partition('=')
+        if profile not in JPEG_PROFILES:
+            print(f"❌ Unknown JPEG profile '{profile}' (choose from: {', '.join(JPEG_PROFILES)})")
+            sys.exit(1)
+        CATEGORY_JPEG_PROFILES[category] = profile
 
-    manifest_path = BASE_DIR / 'images' / 'manifest.json'
-    with open(manifest_path, 'w') as f:
-        json.dump(manifest, f, indent=2)
+def has_module(name):
+    """Whether an optional dependency is installed, without importing it"""
+    return importlib.util.find_spec(name) is not None
 
-    print(f"\n✓ Generated manifest: {manifest_path}")
+def main(argv=None):
+    global AVIF_ENABLED, AVIF_TARGET_SSIM, BREAKPOINT_STRATEGY, BREAKPOINT_BYTE_STEP, MEMORY_LIMIT_MB
+    global PLACEHOLDERS_ENABLED, DEDUP_MAX_DISTANCE
+    args = parse_args(argv)
 
-def main():
     print("=== Pink Pilates Set Image Conversion ===")
-    print("Converting images to WebP and creating responsive sizes...\n")
+    print("Converting images to WebP/AVIF and creating responsive sizes...\n")
 
-    # Check if cwebp is available
-    try:
-        subprocess.run(['cwebp', '-version'], capture_output=True, check=True)
-        print("✓ cwebp is available")
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("❌ cwebp not found. Please install WebP tools:")
-        print("  brew install webp")
+    # Check if Pillow was built with WebP support
+    import PIL
+    print(f"✓ PIL {PIL.__version__} is available")
+    if not features.check('webp'):
+        print("❌ Pillow was built without WebP support. Please reinstall Pillow:")
+        print("  pip install --force-reinstall Pillow")
         sys.exit(1)
 
-    # Check if PIL is available
-    try:
-        import PIL
-        print(f"✓ PIL {PIL.__version__} is available")
-    except ImportError:
-        print("❌ PIL not found. Please install Pillow:")
-        print("  pip install Pillow")
+    if args.profile:
+        if args.profile == 'pyinstrument' and not has_module('pyinstrument'):
+            print("❌ pyinstrument not found; it is needed for --profile pyinstrument:")
+            print("  pip install pyinstrument")
+            sys.exit(1)
+        # The profilers only see this process, so render here rather than in a pool
+        args.workers = 1
+        print(f"✓ Profiling with {args.profile} (serial; add --force to profile cached images too)")
+    print(f"✓ Using {args.workers} worker process(es)")
+
+    if args.manifest_encoding == 'msgpack' and image_manifest.msgpack is None:
+        print("❌ msgpack not found; it is needed for --manifest-encoding msgpack:")
+        print("  pip install msgpack")
         sys.exit(1)
 
-    all_results = {}
+    # Inline placeholders and the AVIF quality search are computed with numpy
+    numpy_available = has_module('numpy')
+    if not numpy_available:
+        print("⚠️  numpy not found; skipping BlurHash placeholders (pip install numpy)")
+        PLACEHOLDERS_ENABLED = False
+    apply_jpeg_profile_overrides(args.jpeg_profile)
+
+    # AVIF tier and optional per-image quality search
+    AVIF_ENABLED = not args.no_avif
+    if AVIF_ENABLED and not features.check('avif'):
+        print("⚠️  Pillow was built without AVIF support; skipping the AVIF tier")
+        AVIF_ENABLED = False
+    if AVIF_ENABLED and args.avif_target_ssim:
+        if not numpy_available:
+            print("❌ numpy not found; it is needed for --avif-target-ssim:")
+            print("  pip install numpy")
+            sys.exit(1)
+        AVIF_TARGET_SSIM = args.avif_target_ssim
+        print(f"✓ AVIF quality search targeting SSIM {AVIF_TARGET_SSIM}")
+
+    BREAKPOINT_STRATEGY = args.breakpoints
+    BREAKPOINT_BYTE_STEP = args.byte_step * 1024
+    if BREAKPOINT_STRATEGY == 'budget':
+        print(f"✓ Planning breakpoints every ~{args.byte_step} KB of WebP")
+
+    MEMORY_LIMIT_MB = args.memory_limit
+    if MEMORY_LIMIT_MB:
+        print(f"✓ Low-memory mode: {MEMORY_LIMIT_MB} MB per worker")
+
+    # Skip sources whose bytes and encoder settings match the last build
+    cache = {'entries': {}} if args.force else load_build_cache()
+    removed = prune_build_cache(cache)
+    if removed:
+        print(f"✓ Removed {removed} stale output file(s)")
 
     # Process each directory
-    for category, directory_path in DIRECTORIES.items():
-        results = process_directory(directory_path, BASE_DIR / 'images', category)
-        if results:
-            all_results[category] = results
+    DEDUP_MAX_DISTANCE = args.dedup_distance
+    metrics = BuildMetrics(metrics_settings(args.workers))
+    with profiled(args.profile):
+        all_results = convert_all(DIRECTORIES, BASE_DIR / 'images', workers=args.workers, cache=cache,
+                                  dedup=args.dedup, metrics=metrics)
+    save_build_cache(cache)
+
+    if not args.no_metrics and metrics.images:
+        summary, previous = metrics.write(args.metrics)
+        report(summary, previous)
+        print(f"✓ Build metrics: {args.metrics}")
+    elif not args.no_metrics:
+        print(f"\n✓ Nothing rendered; {args.metrics} still describes the last render")
 
     # Generate manifest
     if all_results:
-        generate_manifest(all_results)
+        generate_manifest(all_results, encoding=args.manifest_encoding,
+                          legacy=not args.no_legacy_manifest)
 
         print(f"\n=== Conversion Complete ===")
         print(f"Total directories processed: {len(all_results)}")
@@ -224,7 +1108,7 @@ def main():
         total_images = sum(len(results) for results in all_results.values())
         print(f"Total images processed: {total_images}")
 
-        print(f"\nWebP and responsive images created in:")
+        print(f"\nWebP, AVIF and responsive images created in:")
         for category in all_results.keys():
             print(f"  - images/{category}/")
 
@@ -234,4 +1118,4 @@ def main():
         print("No images were processed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -56,17 +56,31 @@ function generatePictureElement(imageName, category, config = {}) {
         return null;
     }
 
+    // Collapsed near-duplicates reuse the canonical image's files
+    if (imageData.duplicate_of) {
+        category = imageData.duplicate_of.category;
+        imageName = imageData.duplicate_of.name;
+    }
+
     const { webp, jpeg, lqip } = imageData;
     const baseName = path.parse(imageName).name;
 
+    // Prefer the widths the pipeline planned for this image (never upscaled),
+    // capped at the largest size this use case needs
+    const maxSize = Math.max(...imageConfig.sizes);
+    const plannedWidths = (imageData.widths || []).filter(size => size <= maxSize);
+    const widths = plannedWidths.length ? plannedWidths : imageConfig.sizes;
+
     // Generate srcset strings
-    const webpSrcset = imageConfig.sizes
+    const webpSrcset = widths
         .map(size => `./images/${category}/${baseName}-${size}.webp ${size}w`)
         .join(', ');
 
-    const jpegSrcset = imageConfig.sizes
+    const jpegSrcset = widths
         .map(size => `./images/${category}/${baseName}-${size}.jpg ${size}w`)
         .join(', ');
+    const fallbackWidth = widths.reduce((best, size) =>
+        Math.abs(size - 800) < Math.abs(best - 800) ? size : best);
 
     // Generate sizes attribute based on viewport
     const sizes = generateSizesAttribute(config.type);
@@ -74,6 +88,12 @@ function generatePictureElement(imageName, category, config = {}) {
     // Generate LQIP data URI or path
     const lqipSrc = lqip ? `./images/${category}/${lqip}` : '';
 
+    // Inline placeholder from the manifest: paints before any image request
+    const placeholder = imageData.placeholder;
+    const placeholderStyle = placeholder
+        ? `aspect-ratio:${placeholder.aspect_ratio};background-color:${placeholder.color}`
+        : '';
+
     return `
 <picture data-lazy="${config.type || 'gallery'}" class="responsive-image">
     <!-- WebP sources -->
@@ -87,7 +107,7 @@ function generatePictureElement(imageName, category, config = {}) {
     <img
         src="data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 ${imageConfig.aspectRatio.split('/')[0]} ${imageConfig.aspectRatio.split('/')[1]}'%3E%3C/svg%3E"
         data-srcset="${jpegSrcset}"
-        data-src="./images/${category}/${baseName}-800.jpg"
+        data-src="./images/${category}/${baseName}-${fallbackWidth}.jpg"
         sizes="${sizes}"
         alt="${config.alt || ''}"
         loading="${imageConfig.loading}"
@@ -97,6 +117,8 @@ function generatePictureElement(imageName, category, config = {}) {
         height="${imageConfig.dimensions?.height || 600}"
         data-aspect-ratio="${imageConfig.aspectRatio}"
         data-lqip="${lqipSrc}"
+        data-blurhash="${placeholder?.blurhash || ''}"
+        style="${placeholderStyle}"
         class="${config.className || ''}"
     />
 </picture>`.trim();
@@ -248,15 +270,18 @@ function updateHTMLFile() {
     );
 
     // Replace order bump images
+    // Card masters are PNGs rendered by render_cards.py; older manifests still list the JPEG masters
     const orderBumpImages = [
-        { name: 'adhesive-bra-cups.jpg', alt: 'Adhesive Bra Cups' },
-        { name: 'seamless-thong.jpg', alt: 'Seamless Thong' },
-        { name: 'pilates-socks.jpg', alt: 'Non-Slip Pilates Socks' }
+        { base: 'adhesive-bra-cups', alt: 'Adhesive Bra Cups' },
+        { base: 'seamless-thong', alt: 'Seamless Thong' },
+        { base: 'pilates-socks', alt: 'Non-Slip Pilates Socks' }
     ];
+    const orderBumpMasters = Object.keys(manifest.categories['order-bump'] || {});
 
-    orderBumpImages.forEach(({ name, alt }) => {
+    orderBumpImages.forEach(({ base, alt }) => {
+        const name = orderBumpMasters.find(master => path.parse(master).name === base) || `${base}.png`;
         const regex = new RegExp(
-            `<img[^>]*src="images/order-bump/${name}"[^>]*alt="${alt}"[^>]*>`,
+            `<img[^>]*src="images/order-bump/${base}\\.(?:png|jpe?g)"[^>]*alt="${alt}"[^>]*>`,
             'g'
         );
 
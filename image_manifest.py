@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Compact, sharded image manifest for the Pink Pilates Set image pipeline
+
+images/manifest/index.json lists the encoder settings and one shard per
+category (images/manifest/<category>.json, or .msgpack when msgpack is
+installed and requested). Shards store paths relative to the project, intern
+repeated size lists in a shared table and drop file names that follow the
+"<stem>-<size>.<ext>" pattern, so an entry is a handful of short fields.
+
+Readers load only the shards they ask for:
+
+    from image_manifest import ImageManifest
+    product = ImageManifest().category('product')
+
+and writers patch a single shard plus the index instead of the whole manifest.
+"""
+
+import hashlib
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+BASE_DIR = Path(__file__).parent
+MANIFEST_DIR = BASE_DIR / 'images' / 'manifest'
+INDEX_NAME = 'index.json'
+MANIFEST_VERSION = 1
+
+# Manifest key -> file extension of its variants
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg', 'avif': 'avif'}
+
+# Size value standing in for the full-resolution ("original") variant in size tables
+ORIGINAL = 0
+
+def relative_path(path, base=BASE_DIR):
+    """Project-relative POSIX path, or the absolute one if it lies outside the project"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(Path(base).resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+def variant_stem(name, entry):
+    """Stem the entry's variant file names were built from"""
+    lqip = entry.get('lqip')
+    if lqip and lqip.endswith('-lqip.jpg'):
+        return lqip[:-len('-lqip.jpg')]
+    stem = Path(name).stem
+    return stem[:-len('-original')] if stem.endswith('-original') else stem
+
+def variant_name(stem, fmt, size):
+    ext = FORMAT_EXTENSIONS[fmt]
+    return f"{stem}.{ext}" if size == ORIGINAL else f"{stem}-{size}.{ext}"
+
+def size_key(size):
+    """Manifest size key -> size table value"""
+    return ORIGINAL if size == 'original' else int(size)
+
+def manifest_key(size):
+    """Size table value -> manifest size key"""
+    return 'original' if size == ORIGINAL else size
+
+def normalize_entry(entry):
+    """Legacy/fresh entry -> the canonical form expand_entry returns"""
+    entry = json.loads(json.dumps(entry))
+    for fmt in FORMAT_EXTENSIONS:
+        if fmt in entry:
+            entry[fmt] = {manifest_key(size_key(k)): v for k, v in entry[fmt].items()}
+    if entry.get('dimensions') is not None:
+        entry['dimensions'] = list(entry['dimensions'])
+    if entry.get('original'):
+        entry['original'] = relative_path(entry['original']) if Path(entry['original']).is_absolute() \
+            else entry['original']
+    return entry
+
+class SizeTable:
+    """Interns size lists so each distinct list is stored once per shard"""
+
+    def __init__(self, rows=None):
+        self.rows = [list(row) for row in rows or []]
+        self.index = {tuple(row): i for i, row in enumerate(self.rows)}
+
+    def add(self, sizes):
+        key = tuple(sizes)
+        if key not in self.index:
+            self.index[key] = len(self.rows)
+            self.rows.append(list(key))
+        return self.index[key]
+
+    def get(self, i):
+        return self.rows[i]
+
+def compact_entry(name, entry, sizes):
+    """Shrink one manifest entry; falls back to storing it verbatim if it can't round-trip"""
+    entry = normalize_entry(entry)
+    stem = variant_stem(name, entry)
+    compact = {'src': entry.get('original'), 'dim': entry.get('dimensions')}
+    if stem != Path(name).stem:
+        compact['stem'] = stem
+    variants = {}
+    for fmt in FORMAT_EXTENSIONS:
+        if fmt in entry:
+            variants[fmt] = sizes.add(size_key(size) for size in entry[fmt])
+    compact['v'] = variants
+    if entry.get('lqip'):
+        compact['lqip'] = 1
+    if 'widths' in entry:
+        compact['w'] = sizes.add(entry['widths'])
+    for key, short in (('placeholder', 'ph'), ('avif_quality', 'aq'), ('duplicate_of', 'dup')):
+        if key in entry:
+            compact[short] = entry[key]
+
+    if expand_entry(name, compact, sizes) != entry:
+        return {'raw': entry}
+    return compact
+
+def expand_entry(name, compact, sizes):
+    """Rebuild the full manifest entry from its compact form"""
+    if 'raw' in compact:
+        return compact['raw']
+    stem = compact.get('stem', Path(name).stem)
+    entry = {'original': compact['src']}
+    for fmt, row in compact['v'].items():
+        entry[fmt] = {manifest_key(size): variant_name(stem, fmt, size) for size in sizes.get(row)}
+    entry['lqip'] = f"{stem}-lqip.jpg" if compact.get('lqip') else None
+    entry['dimensions'] = compact['dim']
+    if 'w' in compact:
+        entry['widths'] = sizes.get(compact['w'])
+    for key, short in (('placeholder', 'ph'), ('avif_quality', 'aq'), ('duplicate_of', 'dup')):
+        if short in compact:
+            entry[key] = compact[short]
+    return entry
+
+def encode_shard(shard, encoding):
+    if encoding == 'msgpack':
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed (pip install msgpack)")
+        return msgpack.packb(shard, use_bin_type=True)
+    return json.dumps(shard, separators=(',', ':')).encode()
+
+def decode_shard(data, encoding):
+    if encoding == 'msgpack':
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed (pip install msgpack)")
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return json.loads(data)
+
+def shard_file(category, encoding):
+    return f"{category}.{'msgpack' if encoding == 'msgpack' else 'json'}"
+
+def load_index(root=MANIFEST_DIR):
+    """Index of the sharded manifest, or an empty one"""
+    try:
+        with open(Path(root) / INDEX_NAME, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'settings': {}, 'shards': {}}
+
+def save_index(index, root=MANIFEST_DIR):
+    index['version'] = MANIFEST_VERSION
+    index['updated_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    with open(Path(root) / INDEX_NAME, 'w') as f:
+        json.dump(index, f, indent=2)
+
+def write_shard(category, results, settings=None, root=MANIFEST_DIR, encoding='json', index=None):
+    """Write one category's shard and patch its line in the index; returns the shard path"""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    sizes = SizeTable()
+    images = {name: compact_entry(name, entry, sizes) for name, entry in results.items()}
+    data = encode_shard({'sizes': sizes.rows, 'images': images}, encoding)
+
+    shard_path = root / shard_file(category, encoding)
+    shard_path.write_bytes(data)
+
+    save = index is None
+    index = load_index(root) if index is None else index
+    previous = index['shards'].get(category)
+    if previous and previous['file'] != shard_path.name:
+        (root / previous['file']).unlink(missing_ok=True)
+    index['shards'][category] = {
+        'file': shard_path.name,
+        'encoding': encoding,
+        'count': len(images),
+        'bytes': len(data),
+        'sha256': hashlib.sha256(data).hexdigest(),
+    }
+    if settings is not None:
+        index['settings'] = settings
+    if save:
+        save_index(index, root)
+    return shard_path
+
+def write_manifest(all_results, settings, root=MANIFEST_DIR, encoding='json'):
+    """Write every category's shard and a fresh index; shards of vanished categories are removed"""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    old_index = load_index(root)
+    index = {'version': MANIFEST_VERSION, 'settings': settings, 'shards': {}}
+    for category, results in all_results.items():
+        write_shard(category, results, root=root, encoding=encoding, index=index)
+    for category, shard in old_index.get('shards', {}).items():
+        if category not in index['shards'] or index['shards'][category]['file'] != shard['file']:
+            (root / shard['file']).unlink(missing_ok=True)
+    save_index(index, root)
+    return root / INDEX_NAME
+
+class ImageManifest:
+    """Lazy reader: only the index is read up front, shards load on first access"""
+
+    def __init__(self, root=MANIFEST_DIR):
+        self.root = Path(root)
+        self.index = load_index(self.root)
+        self._categories = {}
+
+    @property
+    def settings(self):
+        return self.index.get('settings', {})
+
+    def categories(self):
+        return list(self.index['shards'])
+
+    def category(self, category):
+        """{image name: full manifest entry} for one category"""
+        if category not in self._categories:
+            shard = self.index['shards'].get(category)
+            if shard is None:
+                raise KeyError(f"No manifest shard for category '{category}'")
+            data = (self.root / shard['file']).read_bytes()
+            decoded = decode_shard(data, shard.get('encoding', 'json'))
+            sizes = SizeTable(decoded['sizes'])
+            self._categories[category] = {
+                name: expand_entry(name, compact, sizes) for name, compact in decoded['images'].items()
+            }
+        return self._categories[category]
+
+    def get(self, category, name, default=None):
+        return self.category(category).get(name, default)
+
+    def to_legacy(self):
+        """Whole manifest in the single-file images/manifest.json layout"""
+        legacy = dict(self.settings)
+        legacy['categories'] = {category: self.category(category) for category in self.categories()}
+        return legacy
+
+def load_category(category, root=MANIFEST_DIR):
+    """Convenience wrapper: entries of one category"""
+    return ImageManifest(root).category(category)
+
+def main(argv=None):
+    """Convert the legacy images/manifest.json into the sharded layout and report sizes"""
+    argv = sys.argv[1:] if argv is None else argv
+    encoding = 'msgpack' if '--msgpack' in argv else 'json'
+    legacy_path = BASE_DIR / 'images' / 'manifest.json'
+    with open(legacy_path, 'r') as f:
+        legacy = json.load(f)
+
+    categories = legacy.pop('categories', {})
+    write_manifest(categories, legacy, encoding=encoding)
+    index = load_index()
+    total = sum(shard['bytes'] for shard in index['shards'].values())
+    print(f"Legacy manifest: {legacy_path.stat().st_size:,} bytes")
+    print(f"Sharded manifest: {total:,} bytes in {len(index['shards'])} shard(s) ({encoding})")
+    for category, shard in index['shards'].items():
+        print(f"  - {shard['file']}: {shard['count']} images, {shard['bytes']:,} bytes")
+
+if __name__ == "__main__":
+    main()
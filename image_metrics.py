@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and byte accounting for the Pink Pilates Set image pipeline
+
+Each render records how long decode, resize, encode and write took for every
+variant, plus the source's bytes and every output's bytes and dimensions:
+
+    metrics = StageRecorder(source_bytes)
+    with metrics.stage('encode', 'webp', 400):
+        data = webp_bytes(img)
+    metrics.output('webp', 400, img.size, len(data))
+
+Recorders travel back from the worker processes inside the render results;
+BuildMetrics collects them into per-stage latency histograms and per-format
+byte totals, writes them as JSON (images/.build-metrics.json by default) and
+compares a build against the previous one to flag regressions.
+
+profiled() wraps a build in cProfile or pyinstrument.
+
+Usage:
+    python image_metrics.py                          # summarise the last build
+    python image_metrics.py NEW.json --against OLD.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+METRICS_PATH = BASE_DIR / 'images' / '.build-metrics.json'
+PROFILE_DIR = BASE_DIR / 'images' / '.profile'
+
+# Upper bounds (ms) of the latency histogram buckets; slower samples land in '+inf'
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+REGRESSION_THRESHOLD = 0.10     # a stage's p50 or a format's bytes per file growing by more is flagged
+STAGE_ORDER = ('decode', 'resize', 'plan', 'search', 'encode', 'write', 'lqip', 'placeholder')
+
+class StageRecorder:
+    """Stage timings and output sizes of one image's render; plain lists, so it pickles back from workers"""
+
+    def __init__(self, source_bytes=0):
+        self.source_bytes = source_bytes
+        self.source_size = None
+        self.stages = []        # (stage, format, width, seconds)
+        self.outputs = []       # (format, width, [width, height], bytes)
+
+    @contextmanager
+    def stage(self, name, fmt=None, size=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, fmt, size, time.perf_counter() - start))
+
+    def output(self, fmt, size, dimensions, nbytes):
+        self.outputs.append((fmt, size, list(dimensions), nbytes))
+
+    def as_dict(self):
+        return {
+            'source_bytes': self.source_bytes,
+            'source_size': self.source_size,
+            'seconds': round(sum(seconds for *_, seconds in self.stages), 6),
+            'stages': [[name, fmt, size, round(seconds, 6)] for name, fmt, size, seconds in self.stages],
+            'outputs': [[fmt, size, dimensions, nbytes, bits_per_pixel(nbytes, dimensions)]
+                        for fmt, size, dimensions, nbytes in self.outputs],
+        }
+
+def bits_per_pixel(nbytes, dimensions):
+    width, height = dimensions
+    return round(nbytes * 8 / (width * height), 4) if width and height else None
+
+def histogram(samples_ms):
+    """Counts per HISTOGRAM_BUCKETS_MS upper bound (non-cumulative), '+inf' for the rest"""
+    counts = {str(bound): 0 for bound in HISTOGRAM_BUCKETS_MS}
+    counts['+inf'] = 0
+    for sample in samples_ms:
+        bound = next((bound for bound in HISTOGRAM_BUCKETS_MS if sample <= bound), None)
+        counts['+inf' if bound is None else str(bound)] += 1
+    return counts
+
+def percentile(samples, q):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[q - 1]
+
+def stage_summary(samples):
+    """Latency distribution of one stage, in ms"""
+    samples_ms = [seconds * 1000 for seconds in samples]
+    return {
+        'count': len(samples_ms),
+        'total_ms': round(sum(samples_ms), 3),
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'max_ms': round(max(samples_ms), 3),
+        'histogram_ms': histogram(samples_ms),
+    }
+
+class BuildMetrics:
+    """Recorders of one build, keyed '<category>/<source name>'"""
+
+    def __init__(self, settings=None):
+        self.settings = settings or {}
+        self.images = {}
+        self.cached = 0
+        self.started = time.perf_counter()
+
+    def add(self, category, name, record):
+        self.images[f"{category}/{name}"] = record
+
+    def summary(self):
+        stages, formats = {}, {}
+        for record in self.images.values():
+            for name, fmt, _, seconds in record['stages']:
+                stages.setdefault(name, []).append(seconds)
+                if fmt:
+                    stages.setdefault(f"{name}:{fmt}", []).append(seconds)
+            for fmt in {fmt for fmt, *_ in record['outputs']}:
+                totals = formats.setdefault(fmt, {'files': 0, 'bytes': 0, 'source_bytes': 0})
+                totals['source_bytes'] += record['source_bytes']
+            for fmt, _, _, nbytes, _ in record['outputs']:
+                formats[fmt]['files'] += 1
+                formats[fmt]['bytes'] += nbytes
+        for totals in formats.values():
+            totals['bytes_per_file'] = round(totals['bytes'] / totals['files'])
+            # every variant of a format against the sources they came from
+            totals['ratio'] = round(totals['bytes'] / totals['source_bytes'], 4) if totals['source_bytes'] else None
+        order = {stage: i for i, stage in enumerate(STAGE_ORDER)}
+        return {
+            'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'wall_seconds': round(time.perf_counter() - self.started, 3),
+            'settings': self.settings,
+            'rendered': len(self.images),
+            'cached': self.cached,
+            'bytes_in': sum(record['source_bytes'] for record in self.images.values()),
+            'bytes_out': sum(totals['bytes'] for totals in formats.values()),
+            'stages': {name: stage_summary(stages[name])
+                       for name in sorted(stages, key=lambda name: (order.get(name.split(':')[0], 99), name))},
+            'formats': dict(sorted(formats.items())),
+            'images': self.images,
+        }
+
+    def write(self, path=METRICS_PATH):
+        """Write the summary as JSON, returning (summary, the previous build's summary or None)"""
+        path = Path(path)
+        previous = load_metrics(path)
+        summary = self.summary()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary, previous
+
+def load_metrics(path=METRICS_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def regressions(current, previous, threshold=REGRESSION_THRESHOLD):
+    """Stages whose p50 and formats whose bytes per file grew by more than threshold"""
+    found = []
+    for name, stage in current['stages'].items():
+        before = previous.get('stages', {}).get(name)
+        if ':' in name or not before or not before['p50_ms']:
+            continue
+        change = stage['p50_ms'] / before['p50_ms'] - 1
+        if change > threshold:
+            found.append(f"{name} p50 {before['p50_ms']:.1f} → {stage['p50_ms']:.1f} ms ({change:+.0%})")
+    for fmt, totals in current['formats'].items():
+        before = previous.get('formats', {}).get(fmt)
+        if not before or not before['bytes_per_file']:
+            continue
+        change = totals['bytes_per_file'] / before['bytes_per_file'] - 1
+        if change > threshold:
+            found.append(f"{fmt} {before['bytes_per_file']:,} → {totals['bytes_per_file']:,} bytes/file "
+                         f"({change:+.0%})")
+    return found
+
+def report(summary, previous=None):
+    """Print the stage and byte tables, and regressions against previous"""
+    print(f"\n=== Build metrics: {summary['rendered']} rendered, {summary['cached']} cached, "
+          f"{summary['wall_seconds']:.1f}s wall ===")
+    if not summary['rendered']:
+        return
+    for name, stage in summary['stages'].items():
+        if ':' not in name:
+            print(f"  {name:<12} {stage['count']:>5}× p50 {stage['p50_ms']:>8.1f} ms  p95 {stage['p95_ms']:>8.1f} ms  "
+                  f"total {stage['total_ms'] / 1000:>7.2f} s")
+    for fmt, totals in summary['formats'].items():
+        ratio = f"{totals['ratio']:.1%} of sources" if totals['ratio'] is not None else ''
+        print(f"  {fmt:<12} {totals['files']:>5} files {totals['bytes']:>12,} bytes  {ratio}")
+    print(f"  {'total':<12} {summary['bytes_in']:,} bytes in → {summary['bytes_out']:,} bytes out")
+    if previous and previous.get('rendered'):
+        found = regressions(summary, previous)
+        for line in found:
+            print(f"  ⚠️  Regression since {previous['generated_at']}: {line}")
+        if not found:
+            print(f"  ✓ No regressions over {REGRESSION_THRESHOLD:.0%} since {previous['generated_at']}")
+
+@contextmanager
+def profiled(tool=None, output_dir=PROFILE_DIR):
+    """Profile the enclosed block with 'cprofile' or 'pyinstrument' (None: no-op); output goes to output_dir"""
+    if tool is None:
+        yield
+        return
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if tool == 'cprofile':
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            output = output_dir / 'convert.prof'
+            profiler.dump_stats(output)
+            print(f"\n=== cProfile (top 15 by cumulative time; full profile: {output}) ===")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    elif tool == 'pyinstrument':
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            output = output_dir / 'convert.html'
+            output.write_text(profiler.output_html(), encoding='utf-8')
+            print(f"\n=== pyinstrument (full report: {output}) ===")
+            print(profiler.output_text(unicode=True, color=False))
+    else:
+        raise ValueError(f"Unknown profiler: {tool}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise image build metrics and compare two builds")
+    parser.add_argument('metrics', nargs='?', default=METRICS_PATH,
+                        help="metrics file (default: images/.build-metrics.json)")
+    parser.add_argument('--against', metavar='PREVIOUS', help="metrics file of an earlier build to compare with")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f"relative growth counted as a regression (default: {REGRESSION_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    summary = load_metrics(args.metrics)
+    if summary is None:
+        sys.exit(f"❌ No metrics at {args.metrics}; run convert_images_to_webp.py first")
+    previous = load_metrics(args.against) if args.against else None
+    if args.against and previous is None:
+        sys.exit(f"❌ No metrics at {args.against}")
+    report(summary)
+    if previous:
+        found = regressions(summary, previous, args.threshold)
+        for line in found:
+            print(f"  ⚠️  Regression: {line}")
+        sys.exit(1 if found else 0)
+
+if __name__ == "__main__":
+    main()
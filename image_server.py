@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+On-the-fly image variants over HTTP for the Pink Pilates Set image pipeline
+
+Serves /images/<category>/<name>?w=600&fmt=webp by decoding the category's
+source image, resizing and encoding it with the same functions (and encoder
+settings) convert_images_to_webp.py uses for the pre-rendered variants.
+Without fmt (or with fmt=auto) the format is negotiated from the Accept
+header: AVIF, then WebP, then the JPEG fallback.
+
+Encoded variants are kept in a disk cache capped in bytes and evicted least
+recently used first. Each variant's ETag is derived from the source bytes,
+width, format and encoder settings, so a revalidation is answered with a 304
+without touching the cache at all.
+
+Runs locally as a stand-in for an image CDN in tests:
+
+    from image_server import start_server
+    server, url = start_server()        # url + '/images/product/product-01?w=400'
+
+or as a lazy origin behind a CDN in production:
+
+    python image_server.py --host 0.0.0.0 --port 8080 --cache-size 2048
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from PIL import Image, features
+
+import convert_images_to_webp as images
+
+BASE_DIR = Path(__file__).parent
+CACHE_DIR = BASE_DIR / 'images' / '.variant-cache'
+CACHE_SIZE_MB = 512
+MAX_WIDTH = 2400
+WIDTH_STEP = 50                  # requested widths are rounded up to a multiple, bounding the variant count
+CACHE_MAX_AGE = 86400            # seconds; URLs aren't revisioned, so CDNs revalidate with the ETag
+
+# fmt parameter -> (MIME type, cache file extension)
+FORMATS = {
+    'avif': ('image/avif', 'avif'),
+    'webp': ('image/webp', 'webp'),
+    'jpeg': ('image/jpeg', 'jpg'),
+}
+NEGOTIATION_ORDER = ('avif', 'webp')     # preferred when Accept lists them; jpeg is the fallback
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def available_formats(avif=images.AVIF_ENABLED):
+    """Formats this Pillow build can encode"""
+    return [fmt for fmt in FORMATS if fmt != 'avif' or (avif and features.check('avif'))]
+
+def accepted_types(header):
+    """MIME types an Accept header allows (q > 0)"""
+    accepted = set()
+    for part in (header or '').split(','):
+        media, *params = [piece.strip() for piece in part.split(';')]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media and q > 0:
+            accepted.add(media.lower())
+    return accepted
+
+def negotiate_format(accept, formats):
+    """Best format the client accepts among formats; JPEG when it names none of the modern ones"""
+    accepted = accepted_types(accept)
+    for fmt in NEGOTIATION_ORDER:
+        if fmt in formats and FORMATS[fmt][0] in accepted:
+            return fmt
+    return 'jpeg'
+
+def variant_width(value):
+    """Requested width rounded up to WIDTH_STEP and clamped to MAX_WIDTH; None keeps the source width"""
+    if value is None:
+        return None
+    if not re.fullmatch(r'\d+', value) or int(value) == 0:
+        raise HTTPError(400, f"Invalid width: {value}")
+    return min(MAX_WIDTH, -(-int(value) // WIDTH_STEP) * WIDTH_STEP)
+
+class SourceIndex:
+    """Source images per category, found as convert_images_to_webp.py finds them
+
+    Names resolve with or without an extension. Source digests and dimensions are
+    memoised per (size, mtime), so a request only rereads a source that changed on disk.
+    """
+
+    def __init__(self, directories=images.DIRECTORIES):
+        self.directories = directories
+        self.lock = threading.Lock()
+        self.digests = {}
+        self.sizes = {}
+
+    def find(self, category, name):
+        directory = self.directories.get(category)
+        if directory is None:
+            raise HTTPError(404, f"Unknown category: {category}")
+        stem = Path(name).stem if Path(name).suffix.lower() in ('.jpg', '.jpeg', '.png', '.webp', '.avif') else name
+        for path, name_without_ext in images.find_source_images(directory):
+            if name_without_ext == stem:
+                return path
+        raise HTTPError(404, f"No source image for {category}/{name}")
+
+    def digest(self, path):
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if key in self.digests:
+                return self.digests[key]
+        digest = images.hash_file(path)
+        with self.lock:
+            self.digests[key] = digest
+        return digest
+
+    def dimensions(self, path):
+        """(width, height) from the source's header, without decoding it"""
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if key in self.sizes:
+                return self.sizes[key]
+        with Image.open(path) as img:
+            size = img.size
+        with self.lock:
+            self.sizes[key] = size
+        return size
+
+class VariantCache:
+    """Encoded variants on disk, capped at max_bytes and evicted least recently used first
+
+    Recency survives restarts through file mtimes, which a hit refreshes.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_SIZE_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()        # file name -> size, oldest first
+        self.total = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = [path for path in self.directory.iterdir() if path.is_file() and not path.name.startswith('.')]
+        for path in sorted(files, key=lambda path: path.stat().st_mtime):
+            self.entries[path.name] = path.stat().st_size
+            self.total += path.stat().st_size
+        self.evict()
+
+    def get(self, name):
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        path = self.directory / name
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            self.discard(name)
+            return None
+        return data
+
+    def put(self, name, data):
+        if len(data) > self.max_bytes:
+            return
+        temp = self.directory / f".{name}.{threading.get_ident()}.tmp"
+        temp.write_bytes(data)
+        os.replace(temp, self.directory / name)
+        with self.lock:
+            self.total += len(data) - self.entries.pop(name, 0)
+            self.entries[name] = len(data)
+        self.evict()
+
+    def discard(self, name):
+        with self.lock:
+            self.total -= self.entries.pop(name, 0)
+
+    def evict(self):
+        while True:
+            with self.lock:
+                if self.total <= self.max_bytes or not self.entries:
+                    return
+                name, size = self.entries.popitem(last=False)
+                self.total -= size
+            try:
+                (self.directory / name).unlink()
+            except OSError:
+                pass
+
+def encode_variant(img, fmt, settings):
+    """Encode a decoded buffer with the pipeline's encoder for fmt; returns the bytes"""
+    if fmt == 'avif':
+        return images.avif_bytes(img, settings['avif_quality'])
+    if fmt == 'webp':
+        return images.webp_bytes(img)
+    return images.jpeg_bytes(img, settings['jpeg_profile'])
+
+class VariantServer(ThreadingHTTPServer):
+    """HTTP server holding the source index, variant cache and in-flight renders"""
+    daemon_threads = True
+
+    def __init__(self, address, cache, sources=None, avif=images.AVIF_ENABLED, max_age=CACHE_MAX_AGE,
+                 quiet=False):
+        super().__init__(address, VariantHandler)
+        self.cache = cache
+        self.sources = sources or SourceIndex()
+        self.formats = available_formats(avif)
+        self.max_age = max_age
+        self.quiet = quiet
+        self.render_locks = {}
+        self.render_lock = threading.Lock()
+        self.avif_qualities = {}        # (source digest, settings fingerprint) -> searched quality
+
+    def handle_error(self, request, client_address):
+        pass        # clients routinely abort requests mid-transfer
+
+    def lock_for(self, name):
+        """One lock per variant, so concurrent misses for the same variant encode it once"""
+        with self.render_lock:
+            return self.render_locks.setdefault(name, threading.Lock())
+
+    def release(self, name, lock):
+        """Forget a variant's lock once its entry is cached; called while holding it
+
+        Threads still waiting on the lock find the cached entry when they get it.
+        A failed render keeps its lock, so waiters retry one at a time.
+        """
+        with self.render_lock:
+            if self.render_locks.get(name) is lock:
+                del self.render_locks[name]
+
+    def resolve(self, path, query, accept):
+        """(source path, width, format, encoder settings, ETag, negotiated) for a request"""
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if len(parts) != 3 or parts[0] != 'images' or '..' in parts:
+            raise HTTPError(404, "Expected /images/<category>/<name>")
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        source = self.sources.find(parts[1], parts[2])
+        width = variant_width(params.get('w'))
+        if width is not None and width >= self.sources.dimensions(source)[0]:
+            width = None        # never upscaled, so the same bytes as the source width
+        fmt = params.get('fmt', 'auto').lower()
+        negotiated = fmt == 'auto'
+        if negotiated:
+            fmt = negotiate_format(accept, self.formats)
+        elif fmt not in self.formats:
+            raise HTTPError(400, f"Unsupported format: {fmt} (choose from: {', '.join(self.formats)})")
+        settings = images.encoder_settings(parts[1])
+        key = '|'.join([self.sources.digest(source), str(width), fmt, images.settings_fingerprint(settings)])
+        etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return source, width, fmt, settings, etag, negotiated
+
+    def avif_quality(self, source, settings):
+        """AVIF quality the pre-rendered variants of source use
+
+        With SSIM search on, that's the quality the last build recorded for this source and
+        these settings, or, failing that, a search at AVIF_SEARCH_WIDTH as the build runs it.
+        """
+        if not settings['avif_target_ssim']:
+            return settings['avif_quality']
+        digest, fingerprint = self.sources.digest(source), images.settings_fingerprint(settings)
+        with self.render_lock:
+            if (digest, fingerprint) in self.avif_qualities:
+                return self.avif_qualities[digest, fingerprint]
+        entry = images.load_build_cache()['entries'].get(images.cache_key(source))
+        if entry and entry['hash'] == digest and entry['settings'] == fingerprint \
+                and 'avif_quality' in entry['results']:
+            quality = entry['results']['avif_quality']
+        else:
+            img, _ = images.load_source(source, images.AVIF_SEARCH_WIDTH, images.MEMORY_LIMIT_MB)
+            reference = images.resize_to_width(img, images.AVIF_SEARCH_WIDTH, strips=bool(images.MEMORY_LIMIT_MB))
+            quality = images.search_avif_quality(reference, settings['avif_target_ssim'])
+        with self.render_lock:
+            self.avif_qualities[digest, fingerprint] = quality
+        return quality
+
+    def variant(self, source, width, fmt, settings, etag):
+        """(bytes, cache hit) for a variant, rendering it on a miss"""
+        name = f"{etag}.{FORMATS[fmt][1]}"
+        data = self.cache.get(name)
+        if data is not None:
+            return data, True
+        lock = self.lock_for(name)
+        with lock:
+            data = self.cache.get(name)
+            if data is not None:
+                self.release(name, lock)
+                return data, True
+            if fmt == 'avif':
+                settings = dict(settings, avif_quality=self.avif_quality(source, settings))
+            img, _ = images.load_source(source, width, images.MEMORY_LIMIT_MB)
+            if width:
+                img = images.resize_to_width(img, width, strips=bool(images.MEMORY_LIMIT_MB))
+            data = encode_variant(img, fmt, settings)
+            self.cache.put(name, data)
+            self.release(name, lock)
+        return data, False
+
+class VariantHandler(BaseHTTPRequestHandler):
+    server_version = 'PinkPilatesImages/1.0'
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def respond(self, body):
+        url = urlsplit(self.path)
+        try:
+            source, width, fmt, settings, etag, negotiated = self.server.resolve(
+                url.path, url.query, self.headers.get('Accept'))
+            headers = {
+                'ETag': f'"{etag}"',
+                'Cache-Control': f"public, max-age={self.server.max_age}",
+            }
+            if negotiated:
+                headers['Vary'] = 'Accept'
+            if etag in [tag.strip().removeprefix('W/').strip('"')
+                        for tag in self.headers.get('If-None-Match', '').split(',')]:
+                self.send(304, headers)
+                return
+            data, hit = self.server.variant(source, width, fmt, settings, etag)
+        except HTTPError as e:
+            self.send(e.status, {'Content-Type': 'text/plain; charset=utf-8'}, f"{e}\n".encode(), body)
+            return
+        except Image.DecompressionBombError as e:
+            self.send(413, {'Content-Type': 'text/plain; charset=utf-8'},
+                      f"Source too large to render {url.path}: {e}\n".encode(), body)
+            return
+        except (OSError, ValueError) as e:
+            self.send(500, {'Content-Type': 'text/plain; charset=utf-8'},
+                      f"Could not render {url.path}: {e}\n".encode(), body)
+            return
+        headers.update({'Content-Type': FORMATS[fmt][0], 'X-Cache': 'HIT' if hit else 'MISS'})
+        self.send(200, headers, data, body)
+
+    def send(self, status, headers, data=b'', body=True):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if body and status != 304:
+            self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+def start_server(host='127.0.0.1', port=0, cache_dir=CACHE_DIR, cache_size_mb=CACHE_SIZE_MB,
+                 avif=images.AVIF_ENABLED):
+    """Serve variants in a background thread, for tests; returns (server, base URL)"""
+    cache = VariantCache(cache_dir, cache_size_mb * 1024 * 1024)
+    server = VariantServer((host, port), cache, avif=avif, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve resized WebP/AVIF/JPEG image variants on demand")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="port to listen on (default: 8080)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="variant cache directory "
+                                                               "(default: images/.variant-cache)")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE_MB, metavar='MB',
+                        help=f"variant cache cap (default: {CACHE_SIZE_MB} MB)")
+    parser.add_argument('--max-age', type=int, default=CACHE_MAX_AGE, metavar='SECONDS',
+                        help=f"Cache-Control max-age (default: {CACHE_MAX_AGE})")
+    parser.add_argument('--memory-limit', type=int, default=images.MEMORY_LIMIT_MB, metavar='MB',
+                        help="decode budget per image; enables reduced JPEG decoding and strip resampling")
+    parser.add_argument('--no-avif', action='store_true', help="never serve AVIF")
+    parser.add_argument('--avif-target-ssim', type=float, default=images.AVIF_TARGET_SSIM, metavar='SSIM',
+                        help="match a build run with the same convert_images_to_webp.py option")
+    parser.add_argument('--quiet', action='store_true', help="don't log requests")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    images.MEMORY_LIMIT_MB = args.memory_limit
+    images.AVIF_TARGET_SSIM = args.avif_target_ssim
+    cache = VariantCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    server = VariantServer((args.host, args.port), cache, avif=not args.no_avif, max_age=args.max_age,
+                           quiet=args.quiet)
+    print(f"✓ Serving image variants on http://{args.host}:{server.server_address[1]}/images/<category>/<name>"
+          f"?w=<width>&fmt=<{'|'.join(server.formats)}|auto>")
+    print(f"✓ Variant cache: {cache.directory} ({cache.total / 1024 / 1024:.1f} of {args.cache_size} MB used)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
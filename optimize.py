@@ -1,66 +1,1804 @@
 #!/usr/bin/env python3
+import argparse
+import base64
+import gzip
+import hashlib
+import os
+import posixpath
 import re
 import json
+import mimetypes
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote, unquote
 
-def optimize_html(input_file, output_file):
+from image_manifest import INDEX_NAME, ImageManifest
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BASE_DIR = Path(__file__).parent
+
+# Landing page variants minified by --all
+HTML_VARIANTS = [
+    'index.html',
+    'ultra-fast.html',
+    'maximum-performance.html',
+    'lightning-fast.html',
+    'perfect-optimized.html',
+    'ultimate-optimized.html',
+    'optimized-full-content.html',
+]
+
+# Elements whose contents the tokenizer passes through without looking for tags
+RAW_TEXT_ELEMENTS = {'script', 'style', 'textarea', 'title'}
+
+# Elements whose text keeps its whitespace
+PREFORMATTED_ELEMENTS = {'pre', 'textarea'}
+
+# Whitespace next to these is rendered, so it collapses to one space instead of disappearing
+INLINE_ELEMENTS = {
+    'a', 'abbr', 'b', 'bdi', 'bdo', 'button', 'cite', 'code', 'data', 'del', 'dfn', 'em', 'i',
+    'img', 'input', 'ins', 'kbd', 'label', 'mark', 'picture', 'q', 's', 'samp', 'select', 'small',
+    'span', 'strong', 'sub', 'sup', 'svg', 'time', 'u', 'var', 'wbr',
+}
+
+# <script type> values that hold JavaScript; anything else (ld+json, templates) is left as is
+JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module', 'text/ecmascript'}
+
+TAG_OPEN = re.compile(r'<(/?)([a-zA-Z][^\s/>]*)')
+ATTRIBUTE = re.compile(r'''\s*([^\s"'>/=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?''')
+TAG_CLOSE = re.compile(r'\s*(/?)>')
+WHITESPACE = re.compile(r'\s+')
+
+def tokenize_spans(html):
+    """Single left-to-right pass over an HTML document
+
+    Yields (kind, value, start, end) tuples: ('text', str), ('comment', str), ('markup', str)
+    for doctypes and other <! > declarations, ('start', (name, attrs, self_closing)) with
+    attrs as [(name, raw value or None)], ('end', name) and ('raw', str) for the contents of
+    RAW_TEXT_ELEMENTS; start/end is the token's slice of the document. Every position is
+    consumed once, so the scan is linear.
+    """
+    lower = html.lower()
+    pos, n = 0, len(html)
+    while pos < n:
+        lt = html.find('<', pos)
+        if lt == -1:
+            yield 'text', html[pos:], pos, n
+            return
+        if lt > pos:
+            yield 'text', html[pos:lt], pos, lt
+            pos = lt
+
+        if html.startswith('<!--', pos):
+            end = html.find('-->', pos + 4)
+            end = n if end == -1 else end + 3
+            yield 'comment', html[pos:end], pos, end
+            pos = end
+            continue
+        if html.startswith('<!', pos) or html.startswith('<?', pos):
+            end = html.find('>', pos)
+            end = n if end == -1 else end + 1
+            yield 'markup', html[pos:end], pos, end
+            pos = end
+            continue
+
+        match = TAG_OPEN.match(html, pos)
+        if not match:
+            yield 'text', '<', pos, pos + 1
+            pos += 1
+            continue
+        closing, name = match.group(1), match.group(2).lower()
+        cursor = match.end()
+        attrs = []
+        while True:
+            close = TAG_CLOSE.match(html, cursor)
+            if close:
+                break
+            attr = ATTRIBUTE.match(html, cursor)
+            if not attr or attr.end() == cursor:
+                # Stray characters such as a lone "/" inside the tag
+                cursor += 1
+                if cursor >= n:
+                    break
+                continue
+            attrs.append((attr.group(1), attr.group(2)))
+            cursor = attr.end()
+        if not close:
+            yield 'text', html[pos:], pos, n
+            return
+        start, pos = pos, close.end()
+
+        if closing:
+            yield 'end', name, start, pos
+            continue
+        yield 'start', (name, attrs, bool(close.group(1))), start, pos
+
+        if name in RAW_TEXT_ELEMENTS:
+            end = lower.find(f'</{name}', pos)
+            end = n if end == -1 else end
+            if end > pos:
+                yield 'raw', html[pos:end], pos, end
+            pos = end
+
+def tokenize(html):
+    """tokenize_spans without the offsets: (kind, value) tuples"""
+    for kind, value, _, _ in tokenize_spans(html):
+        yield kind, value
+
+def attribute_value(attrs, name):
+    """Unquoted value of an attribute, '' if it has none, None if it is absent"""
+    for key, value in attrs:
+        if key.lower() == name:
+            return (value or '').strip('"\'')
+    return None
+
+def render_tag(name, attrs, self_closing):
+    parts = [name]
+    for key, value in attrs:
+        parts.append(key if value is None else f'{key}={value}')
+    return f"<{' '.join(parts)}{'/' if self_closing else ''}>"
+
+CSS_TOKEN = re.compile(r'''/\*.*?\*/|"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|\s+|[^\s"'/]+|/''', re.DOTALL)
+
+def minify_css(css):
+    """Drop comments and insignificant whitespace, leaving strings untouched"""
+    out = []
+    for match in CSS_TOKEN.finditer(css):
+        token = match.group()
+        if token.startswith('/*'):
+            continue
+        if token[0].isspace():
+            if out and out[-1] != ' ':
+                out.append(' ')
+            continue
+        out.append(token)
+    css = ''.join(out).strip()
+    # Whitespace around block/declaration punctuation never matters outside strings
+    pieces = re.split(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', css)
+    for i in range(0, len(pieces), 2):
+        piece = re.sub(r'\s*([{};,>])\s*', r'\1', pieces[i])
+        piece = re.sub(r':\s+', ':', piece)
+        pieces[i] = piece.replace(';}', '}')
+    return ''.join(pieces)
+
+JS_KEYWORDS_BEFORE_EXPRESSION = {
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do',
+    'else', 'yield', 'await',
+}
+JS_NUMBER = re.compile(r'0[xXbBoO][\da-fA-F_]+n?|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?n?')
+JS_NAME = re.compile(r'[\w$\u0080-\uffff]+')
+
+def js_tokens(js):
+    """Split JavaScript into (kind, text) tokens in one pass
+
+    Kinds are 'space' (whitespace, possibly with newlines), 'comment', 'string' (quoted
+    strings, template literal chunks and regex literals, always emitted verbatim), 'name',
+    'number' and 'punct'. A "/" starts a regex only where an expression may begin.
+    """
+    pos, n = 0, len(js)
+    braces = []             # 'brace' or 'template' for each open "{" / "${"
+    regex_allowed = True
+    member = False          # last significant token was ".", so a keyword is a property name
+
+    def template_chunk(start):
+        """Scan a template literal from just after "`" or "}"; returns (end, opened_substitution)"""
+        i = start
+        while i < n:
+            c = js[i]
+            if c == '\\':
+                i += 2
+            elif c == '`':
+                return i + 1, False
+            elif c == '$' and js.startswith('${', i):
+                return i + 2, True
+            else:
+                i += 1
+        return n, False
+
+    while pos < n:
+        c = js[pos]
+        if c.isspace():
+            end = pos + 1
+            while end < n and js[end].isspace():
+                end += 1
+            yield 'space', js[pos:end]
+            pos = end
+        elif js.startswith('//', pos) or js.startswith('<!--', pos):
+            end = js.find('\n', pos)
+            end = n if end == -1 else end
+            yield 'comment', js[pos:end]
+            pos = end
+        elif js.startswith('/*', pos):
+            end = js.find('*/', pos + 2)
+            end = n if end == -1 else end + 2
+            yield 'comment', js[pos:end]
+            pos = end
+        elif c in '"\'':
+            i = pos + 1
+            while i < n and js[i] != c and js[i] != '\n':
+                i += 2 if js[i] == '\\' else 1
+            end = min(i + 1, n)
+            yield 'string', js[pos:end]
+            pos, regex_allowed = end, False
+        elif c == '`' or (c == '}' and braces and braces[-1] == 'template'):
+            if c == '}':
+                braces.pop()
+            end, opened = template_chunk(pos + 1)
+            if opened:
+                braces.append('template')
+            yield 'string', js[pos:end]
+            pos, regex_allowed = end, opened
+        elif c == '/' and regex_allowed:
+            i, in_class = pos + 1, False
+            while i < n and js[i] != '\n':
+                if js[i] == '\\':
+                    i += 2
+                    continue
+                if js[i] == '[':
+                    in_class = True
+                elif js[i] == ']':
+                    in_class = False
+                elif js[i] == '/' and not in_class:
+                    break
+                i += 1
+            i += 1
+            while i < n and (js[i].isalnum() or js[i] in '_$'):
+                i += 1
+            yield 'string', js[pos:i]
+            pos, regex_allowed = i, False
+        elif c.isdigit() or (c == '.' and pos + 1 < n and js[pos + 1].isdigit()):
+            end = JS_NUMBER.match(js, pos).end()
+            yield 'number', js[pos:end]
+            pos, regex_allowed = end, False
+        else:
+            name = JS_NAME.match(js, pos)
+            if name:
+                word = name.group()
+                yield 'name', word
+                pos, regex_allowed = name.end(), word in JS_KEYWORDS_BEFORE_EXPRESSION and not member
+                member = False
+                continue
+            if c == '{':
+                braces.append('brace')
+            elif c == '}' and braces:
+                braces.pop()
+            yield 'punct', c
+            pos += 1
+            regex_allowed = c not in ')]'
+            member = c == '.'
+
+def js_needs_space(prev, token):
+    """Whether dropping the whitespace between two JS tokens would change their meaning"""
+    (prev_kind, prev_text), (_, text) = prev, token
+    a, b = prev_text[-1], text[0]
+    if (a.isalnum() or a in '_$' or a > '\x7f') and (b.isalnum() or b in '_$' or b > '\x7f'):
+        return True
+    if a == b and a in '+-':
+        return True
+    if a == '/' and b in '/*':
+        return True
+    if prev_kind == 'number' and b == '.' and not re.search(r'[.eExXn]', prev_text):
+        return True
+    return False
+
+JS_RESERVED = {
+    'await', 'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default', 'delete',
+    'do', 'else', 'enum', 'export', 'extends', 'false', 'finally', 'for', 'function', 'if', 'implements',
+    'import', 'in', 'instanceof', 'interface', 'let', 'new', 'null', 'of', 'package', 'private',
+    'protected', 'public', 'return', 'static', 'super', 'switch', 'this', 'throw', 'true', 'try',
+    'typeof', 'var', 'void', 'while', 'with', 'yield', 'async', 'get', 'set', 'arguments', 'eval',
+    'undefined', 'NaN', 'Infinity',
+}
+
+# Constructs the scope analysis doesn't model; a script using any of them is minified unmangled
+JS_MANGLE_BLOCKERS = {'eval', 'with', 'class', 'import', 'export'}
+
+# Tokens after which "{" opens a block rather than an object literal
+JS_BLOCK_PRECEDERS = {';', '{', '}', ')', 'else', 'try', 'finally', 'do'}
+
+JS_NAME_START = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_$'
+JS_NAME_PART = JS_NAME_START + '0123456789'
+
+class JSScope:
+    """A function or block scope found while mangling"""
+
+    def __init__(self, parent, function):
+        self.parent = parent
+        self.function = function        # var and function declarations land here
+        self.declared = set()
+        self.uses = {}                  # declared name -> occurrences, for shortest-name-first
+        self.outer_refs = set()         # (declaring scope or None, name) used from inside
+        self.children = []
+        self.renames = {}
+        if parent is not None:
+            parent.children.append(self)
+
+    def var_scope(self):
+        scope = self
+        while not scope.function:
+            scope = scope.parent
+        return scope
+
+    def resolve(self, name):
+        scope = self
+        while scope is not None and name not in scope.declared:
+            scope = scope.parent
+        return scope
+
+    def encloses(self, other):
+        while other is not None and other is not self:
+            other = other.parent
+        return other is self
+
+def js_significant_tokens(js):
+    """[kind, text, gap] for every token that isn't whitespace or a comment
+
+    gap is the whitespace the token followed: '' / ' ' / '\\n' (a line break or // comment).
+    """
+    tokens, gap = [], ''
+    for kind, text in js_tokens(js):
+        if kind in ('space', 'comment'):
+            if '\n' in text or (kind == 'comment' and text.startswith('//')):
+                gap = '\n'
+            elif not gap:
+                gap = ' '
+            continue
+        tokens.append([kind, text, gap])
+        gap = ''
+    return tokens
+
+def opens_bracket(token):
+    return token[0] == 'punct' and token[1] in '([{' or token[0] == 'string' and token[1].endswith('${')
+
+def closes_bracket(token):
+    return token[0] == 'punct' and token[1] in ')]}' or token[0] == 'string' and token[1].startswith('}')
+
+def match_brackets(tokens):
+    """Opening bracket index -> closing index (and ")"/"]"/"}" -> opening); None if unbalanced"""
+    match, stack = {}, []
+    for i, token in enumerate(tokens):
+        if closes_bracket(token):
+            if not stack:
+                return None
+            match[stack[-1]] = i
+            if token[0] == 'punct':
+                match[i] = stack[-1]
+            stack.pop()
+        if opens_bracket(token):
+            stack.append(i)
+    return None if stack else match
+
+def arrow_functions(tokens, match):
+    """{index of the first parameter token: index of its "=>"} for every arrow function"""
+    arrows = {}
+    for i in range(2, len(tokens)):
+        if tokens[i][1] == '>' and tokens[i - 1][1] == '=' and not tokens[i][2]:
+            before = tokens[i - 2]
+            if before[1] == ')':
+                arrows[match[i - 2]] = i
+            elif before[0] == 'name':
+                arrows[i - 2] = i
+    return arrows
+
+def arrow_body_end(tokens, match, start):
+    """Index just past an expression-bodied arrow function whose body starts at tokens[start]"""
+    i = start
+    while i < len(tokens):
+        kind, text, gap = tokens[i]
+        if kind == 'punct' and text in ',)]};':
+            return i
+        if i > start and gap == '\n' and kind in ('name', 'number', 'string') \
+                and (tokens[i - 1][0] in ('name', 'number', 'string') or tokens[i - 1][1] in ')]'):
+            return i
+        if opens_bracket(tokens[i]):
+            i = match[i]
+            while tokens[i][0] == 'string' and tokens[i][1].endswith('${'):
+                i = match[i]
+        i += 1
+    return i
+
+JS_METHOD_MODIFIERS = {'*', 'get', 'set', 'async'}
+
+def object_member_start(tokens, i):
+    """Whether tokens[i] begins an object member, past any get/set/async/* modifiers"""
+    k = i - 1
+    while k >= 0 and tokens[k][1] in JS_METHOD_MODIFIERS and k >= i - 2:
+        k -= 1
+    return k >= 0 and tokens[k][1] in ('{', ',')
+
+def short_names():
+    """a, b, ..., $, aa, ab, ... skipping reserved words"""
+    length = 1
+    while True:
+        for first in JS_NAME_START:
+            if length == 1:
+                yield first
+                continue
+            stack = [first]
+            while stack:
+                name = stack.pop()
+                if len(name) == length:
+                    if name not in JS_RESERVED:
+                        yield name
+                    continue
+                stack.extend(name + c for c in reversed(JS_NAME_PART))
+        length += 1
+
+def assign_names(scope):
+    """Give each scope's declarations the shortest names its inner code doesn't need"""
+    if scope.parent is not None:
+        taken = {owner.renames.get(name, name) if owner is not None else name
+                 for owner, name in scope.outer_refs}
+        names = short_names()
+        for name in sorted(scope.declared, key=lambda name: (-scope.uses.get(name, 0), name)):
+            if name in JS_RESERVED:
+                continue
+            new = next(names)
+            while new in taken:
+                new = next(names)
+            scope.renames[name] = new
+    for child in scope.children:
+        assign_names(child)
+
+def mangle_js(tokens):
+    """Rename function- and block-local identifiers to short names, in place
+
+    Top-level declarations and undeclared names keep their names since other scripts and
+    inline event handlers share them. Returns False and leaves the tokens untouched for
+    scripts using constructs the analysis doesn't model (eval/with, classes, modules, nested
+    destructuring patterns).
+    """
+    for i, (kind, text, _) in enumerate(tokens):
+        if kind != 'name' or (i and tokens[i - 1][1] == '.'):
+            continue
+        following = [token[1] for token in tokens[i + 1:i + 3]]
+        if text in JS_MANGLE_BLOCKERS \
+                or (text == 'catch' and following[:1] == ['('] and following[1:] in (['{'], ['['])):
+            return False
+    match = match_brackets(tokens)
+    if match is None:
+        return False
+    arrows = arrow_functions(tokens, match)
+
+    root = scope = JSScope(None, True)
+    closes = {}                 # token index -> scopes that end just before it
+    brackets = []               # kind of each enclosing bracket
+    ternaries = [0]             # open "?" per bracket level
+    param_scopes = {}           # "(" index -> function scope its parameters belong to
+    body_scopes = {}            # "{" index -> function scope whose body it opens
+    pending = {}                # "{" index -> catch parameter token indices
+    skip = set()                # name tokens already handled as declarations
+    refs, decls = [], []        # (token index, scope, shorthand)
+    decl = None                 # (target scope, bracket depth) inside a var/let/const list
+    pattern = None              # (target scope, "{" or "[") inside a destructuring pattern
+
+    def text_at(k):
+        return tokens[k][1] if k < len(tokens) else None
+
+    def declare(target, i, shorthand=False):
+        target.declared.add(tokens[i][1])
+        decls.append((i, target, shorthand))
+        skip.add(i)
+
+    for i, (kind, text, gap) in enumerate(tokens):
+        for ending in closes.pop(i, []):
+            if ending.encloses(scope):
+                scope = ending.parent
+        prev = tokens[i - 1][1] if i else None
+        following = tokens[i + 1][1] if i + 1 < len(tokens) else None
+        top = brackets[-1] if brackets else None
+
+        if i in arrows:
+            function = JSScope(scope, True)
+            body = arrows[i] + 1
+            if body < len(tokens) and tokens[body][1] == '{':
+                body_scopes[body] = function
+            else:
+                closes.setdefault(arrow_body_end(tokens, match, body), []).append(function)
+            if kind == 'name':
+                scope = function
+                declare(function, i)
+                continue
+            param_scopes[i] = function
+
+        if kind == 'punct' and text in '([{':
+            in_params = top == 'params' and prev in ('(', ',')
+            in_decl = decl and len(brackets) == decl[1] and prev in ('var', 'let', 'const', ',')
+            if top == 'pattern' and text != '(':
+                return False
+            if text != '(' and (in_params or in_decl):
+                brackets.append('pattern')
+                pattern = (scope if in_params else decl[0], text)
+            elif text == '(':
+                brackets.append('params' if i in param_scopes else 'paren')
+                scope = param_scopes.pop(i, scope)
+            elif text == '[':
+                brackets.append('bracket')
+            elif i in body_scopes:
+                brackets.append('body')
+                scope = body_scopes.pop(i)
+                closes.setdefault(match[i] + 1, []).append(scope)
+            elif prev is None or prev in JS_BLOCK_PRECEDERS \
+                    or (prev == ':' and top in ('block', 'body', None) and not ternaries[-1]):
+                brackets.append('block')
+                scope = JSScope(scope, False)
+                closes.setdefault(match[i] + 1, []).append(scope)
+                for j in pending.pop(i, []):
+                    declare(scope, j)
+            else:
+                brackets.append('object')
+            ternaries.append(0)
+            continue
+        if closes_bracket(tokens[i]) or (kind == 'string' and text.endswith('${')):
+            if closes_bracket(tokens[i]) and brackets:
+                brackets.pop()
+                ternaries.pop()
+            if kind == 'string' and text.endswith('${'):
+                brackets.append('template')
+                ternaries.append(0)
+            if decl and len(brackets) < decl[1]:
+                decl = None
+            continue
+        if kind == 'punct':
+            if text == '?' and following not in ('.', '?') and prev != '?':
+                ternaries[-1] += 1
+            elif text == ':' and ternaries[-1]:
+                ternaries[-1] -= 1
+            elif text == ';' and decl and len(brackets) == decl[1]:
+                decl = None
+            continue
+        if kind != 'name' or i in skip:
+            continue
+
+        # Property access, object keys and labels aren't variables
+        spread = prev == '.' and i >= 3 and tokens[i - 2][1] == tokens[i - 3][1] == '.'
+        if prev == '.' and not spread:
+            continue
+        if top == 'pattern':
+            target, opener = pattern
+            if opener == '{' and prev in ('{', ',') and following == ':':
+                continue
+            if prev in (opener, ',') or spread:
+                declare(target, i, shorthand=opener == '{' and not spread)
+            elif opener == '{' and prev == ':':
+                declare(target, i)
+            else:
+                refs.append((i, scope, False))
+            continue
+        if top == 'object' and prev in ('{', ','):
+            if following == ':' or tokens[i + 1][0] == 'name' or following == '*':
+                continue        # a key, or a get/set/async modifier before one
+            if following in (',', '}'):
+                refs.append((i, scope, True))
+                continue
+        if top == 'object' and following == '(' and object_member_start(tokens, i):
+            if text_at(match[i + 1] + 1) == '{':
+                function = JSScope(scope, True)
+                param_scopes[i + 1] = function
+                body_scopes[match[i + 1] + 1] = function
+                continue
+        if following == ':' and top in ('block', 'body', None) and not ternaries[-1] \
+                and prev in (None, ';', '{', '}'):
+            continue
+        if prev in ('break', 'continue') and not gap:
+            continue
+
+        if text == 'function':
+            j = i + 2 if following == '*' else i + 1
+            named = j < len(tokens) and tokens[j][0] == 'name'
+            params = j + 1 if named else j
+            if text_at(params) != '(' or text_at(match[params] + 1) != '{':
+                return False
+            if prev == 'async':
+                before = tokens[i - 2][1] if i >= 2 else None
+            else:
+                before = prev
+            statement = before in (None, ';', '{', '}', ')', 'else')
+            function = JSScope(scope, True)
+            if named:
+                declare(scope.var_scope() if statement else function, j)
+            param_scopes[params] = function
+            body_scopes[match[params] + 1] = function
+            continue
+        if text in ('var', 'let', 'const'):
+            target = scope.var_scope() if text == 'var' else scope
+            if prev == '(' and i >= 2 and tokens[i - 2][1] == 'for' and text != 'var':
+                # for (let ...) {...}: the loop variable gets a scope around the whole loop
+                body = match[i - 1] + 1
+                if text_at(body) == '{':
+                    target = scope = JSScope(scope, False)
+                    closes.setdefault(match[body] + 1, []).append(target)
+            decl = (target, len(brackets))
+            continue
+        if text == 'catch' and following == '(' and tokens[i + 2][0] == 'name' and text_at(i + 3) == ')':
+            pending.setdefault(i + 4, []).append(i + 2)
+            skip.add(i + 2)
+            continue
+        if text in JS_RESERVED:
+            continue
+
+        if top == 'params' and (prev in ('(', ',') or spread):
+            declare(scope, i)
+        elif decl and len(brackets) == decl[1] and prev in ('var', 'let', 'const', ','):
+            declare(decl[0], i)
+        else:
+            refs.append((i, scope, False))
+
+    # Resolve references; every scope between a reference and its binding must not reuse the
+    # binding's final name
+    owners = []
+    for i, ref_scope, shorthand in refs:
+        name = tokens[i][1]
+        owner = ref_scope.resolve(name)
+        inner = ref_scope
+        while inner is not owner:
+            inner.outer_refs.add((owner, name))
+            inner = inner.parent
+        owners.append((i, owner, shorthand))
+    owners += decls
+    for i, owner, _ in owners:
+        if owner is not None:
+            owner.uses[tokens[i][1]] = owner.uses.get(tokens[i][1], 0) + 1
+
+    assign_names(root)
+    for i, owner, shorthand in owners:
+        if owner is None or owner is root:
+            continue
+        name = tokens[i][1]
+        new = owner.renames.get(name, name)
+        tokens[i][1] = f'{name}:{new}' if shorthand and new != name else new
+    return True
+
+def minify_js(js, mangle=True):
+    """Remove comments and whitespace JavaScript doesn't need, keeping line breaks ASI relies on
+
+    With mangle, local identifiers are also renamed to short names (see mangle_js).
+    """
+    tokens = js_significant_tokens(js)
+    if mangle:
+        mangle_js(tokens)
+    out = []
+    last = None             # last emitted (kind, text)
+    for kind, text, gap in tokens:
+        if last is not None and gap:
+            if gap == '\n' and last[1][-1] not in '{;,([' and text[0] != '}':
+                out.append('\n')
+            elif js_needs_space(last, (kind, text)):
+                out.append(' ')
+        out.append(text)
+        last = (kind, text)
+    return ''.join(out)
+
+def minify_html(html, mangle=True):
+    """Stream minified HTML chunks for a document
+
+    Comments (except IE conditionals) are dropped, whitespace runs collapse to one space
+    and disappear next to block-level tags, inline CSS/JS is minified, and <pre>/<textarea>
+    text plus non-JS scripts pass through unchanged.
+    """
+    preformatted = 0
+    pending = None          # collapsed text waiting to see whether the next tag is inline
+    after_block = True      # previous token was a block-level tag (or start of document)
+    raw_owner = None        # (name, attrs) of the raw text element being read
+
+    def flush(next_inline):
+        text = pending
+        if not next_inline:
+            text = text.rstrip(' ')
+        return text
+
+    for kind, value in tokenize(html):
+        if kind == 'text':
+            if preformatted:
+                yield value
+                continue
+            text = WHITESPACE.sub(' ', value)
+            if after_block:
+                text = text.lstrip(' ')
+            pending = (pending or '') + text
+            if pending:
+                after_block = False
+            continue
+
+        if kind == 'comment':
+            if value.startswith('<!--[if'):
+                if pending:
+                    yield flush(False)
+                    pending = None
+                yield value
+            continue
+
+        if kind == 'raw':
+            name, attrs = raw_owner
+            if name == 'style':
+                yield minify_css(value)
+            elif name == 'script' and attribute_value(attrs, 'src') is None \
+                    and (attribute_value(attrs, 'type') or '').lower() in JS_TYPES:
+                yield minify_js(value, mangle)
+            else:
+                yield value
+            continue
+
+        name = value[0] if kind == 'start' else value if kind == 'end' else None
+        inline = name in INLINE_ELEMENTS
+        if pending:
+            yield flush(inline)
+        pending = None
+
+        if kind == 'start':
+            name, attrs, self_closing = value
+            yield render_tag(name, attrs, self_closing)
+            if name in RAW_TEXT_ELEMENTS:
+                raw_owner = (name, attrs)
+            if name in PREFORMATTED_ELEMENTS:
+                preformatted += 1
+        elif kind == 'end':
+            yield f'</{name}>'
+            if name in PREFORMATTED_ELEMENTS and preformatted:
+                preformatted -= 1
+        else:
+            yield value
+        after_block = not inline
+
+    if pending:
+        yield flush(False)
+
+# Critical CSS: rules for elements up to the end of the first FOLD_SELECTOR match are inlined
+FOLD_SELECTOR = '.product-hero'
+FOLD_ELEMENTS = 200          # elements into <body> treated as above the fold if the selector misses
+CSS_ASSET_DIR = 'css'
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr',
+}
+
+# Pseudo-classes that depend on interaction or state; the element they qualify is matched without them
+STATE_PSEUDO_CLASSES = {
+    'hover', 'focus', 'focus-within', 'focus-visible', 'active', 'visited', 'link', 'checked',
+    'disabled', 'enabled', 'target', 'invalid', 'valid', 'placeholder-shown', 'required', 'optional',
+}
+
+# Block at-rules whose contents are ordinary rules
+CONDITIONAL_AT_RULES = ('@media', '@supports', '@layer', '@container')
+
+class Element:
+    """Just enough of a DOM node to match selectors against"""
+
+    def __init__(self, name, attrs, parent, index):
+        self.name = name
+        self.attrs = {key.lower(): (value or '').strip('"\'') for key, value in attrs}
+        self.parent = parent
+        self.children = []
+        self.index = index
+        self.classes = set(self.attrs.get('class', '').split())
+        style = self.attrs.get('style', '').replace(' ', '').lower()
+        self.hidden = (parent is not None and parent.hidden) or 'hidden' in self.attrs \
+            or 'display:none' in style
+        self.end = index            # index of the last element inside this one
+
+    @property
+    def previous_siblings(self):
+        if self.parent is None:
+            return []
+        siblings = self.parent.children
+        return siblings[:siblings.index(self)][::-1]
+
+def build_dom(html):
+    """(elements in document order, style element spans) for a document"""
+    root = Element('#document', [], None, -1)
+    stack, elements, styles = [root], [], []
+    for kind, value, start, end in tokenize_spans(html):
+        if kind == 'start':
+            name, attrs, self_closing = value
+            element = Element(name, attrs, stack[-1], len(elements))
+            stack[-1].children.append(element)
+            elements.append(element)
+            if name == 'style' and not any(e.name in ('svg', 'noscript', 'template') for e in stack):
+                styles.append({'attrs': element.attrs, 'start': start, 'content': '', 'end': end})
+            if not self_closing and name not in VOID_ELEMENTS:
+                stack.append(element)
+        elif kind == 'raw' and styles and styles[-1]['end'] == start:
+            styles[-1]['content'] = value
+            styles[-1]['end'] = end
+        elif kind == 'end':
+            if name_in_stack(stack, value):
+                while stack[-1].name != value:
+                    stack.pop().end = len(elements) - 1
+                stack.pop().end = len(elements) - 1
+            if value == 'style' and styles and styles[-1]['end'] == start:
+                styles[-1]['end'] = end
+    while len(stack) > 1:
+        stack.pop().end = len(elements) - 1
+    return elements, styles
+
+def name_in_stack(stack, name):
+    return any(element.name == name for element in stack[1:])
+
+SELECTOR_PART = re.compile(r'''
+    \s*(?P<combinator>[>+~])\s*
+  | (?P<space>\s+)
+  | (?P<tag>\*|[a-zA-Z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?P<value>"[^"]*"|'[^']*'|[^\]\s]+)\s*(?:[iIsS]\s*)?)?\]
+  | ::?(?P<pseudo>[\w-]+)(?P<args>\((?:[^()]|\([^()]*\))*\))?
+''', re.VERBOSE)
+
+def parse_selector(selector):
+    """'ul > li.active' -> [compound, '>', compound], or None if the syntax isn't understood"""
+    parts, compound, pos = [], None, 0
+    selector = selector.strip()
+    while pos < len(selector):
+        match = SELECTOR_PART.match(selector, pos)
+        if not match:
+            return None
+        pos = match.end()
+        if match.group('combinator') or match.group('space'):
+            if compound is None:
+                return None
+            parts += [compound, match.group('combinator') or ' ']
+            compound = None
+            continue
+        compound = compound or {'tag': None, 'ids': [], 'classes': [], 'attrs': [], 'pseudo': []}
+        if match.group('tag'):
+            compound['tag'] = match.group('tag').lower()
+        elif match.group('id'):
+            compound['ids'].append(match.group('id'))
+        elif match.group('cls'):
+            compound['classes'].append(match.group('cls'))
+        elif match.group('attr'):
+            compound['attrs'].append((match.group('attr').lower(), match.group('op'),
+                                      (match.group('value') or '').strip('"\'')))
+        else:
+            compound['pseudo'].append(match.group('pseudo').lower())
+    if compound is None:
+        return None
+    return parts + [compound]
+
+def attribute_matches(element, name, op, expected):
+    if name not in element.attrs:
+        return False
+    actual = element.attrs[name]
+    if op is None:
+        return True
+    if op == '=':
+        return actual == expected
+    if op == '~=':
+        return expected in actual.split()
+    if op == '|=':
+        return actual == expected or actual.startswith(expected + '-')
+    if op == '^=':
+        return actual.startswith(expected)
+    if op == '$=':
+        return actual.endswith(expected)
+    return expected in actual
+
+def compound_matches(element, compound):
+    if compound['tag'] not in (None, '*') and element.name != compound['tag']:
+        return False
+    if any(element.attrs.get('id') != id_ for id_ in compound['ids']):
+        return False
+    if not element.classes.issuperset(compound['classes']):
+        return False
+    if not all(attribute_matches(element, *attr) for attr in compound['attrs']):
+        return False
+    # Structural pseudo-classes (:not, :nth-child, ...) are treated as matching: over-matching
+    # only keeps a rule, never drops one
+    return 'root' not in compound['pseudo'] or element.name == 'html'
+
+def selector_matches(element, parts, i=None):
+    """Right-to-left match of a parsed selector ending at parts[i]"""
+    i = len(parts) - 1 if i is None else i
+    if not compound_matches(element, parts[i]):
+        return False
+    if i == 0:
+        return True
+    combinator = parts[i - 1]
+    if combinator == '>':
+        return element.parent is not None and selector_matches(element.parent, parts, i - 2)
+    if combinator == ' ':
+        ancestor = element.parent
+        while ancestor is not None:
+            if selector_matches(ancestor, parts, i - 2):
+                return True
+            ancestor = ancestor.parent
+        return False
+    siblings = element.previous_siblings
+    if combinator == '+':
+        return bool(siblings) and selector_matches(siblings[0], parts, i - 2)
+    return any(selector_matches(sibling, parts, i - 2) for sibling in siblings)
+
+def selector_names(parts):
+    """Tag, id, class and attribute names a selector depends on"""
+    names = set()
+    for compound in parts[::2]:
+        if compound['tag'] not in (None, '*'):
+            names.add(compound['tag'])
+        names.update(compound['ids'], compound['classes'], (attr[0] for attr in compound['attrs']))
+    return names
+
+def split_top_level(text, separator=','):
+    """Split on a separator outside (), [] and strings"""
+    pieces, depth, quote, current = [], 0, None, []
+    for c in text:
+        if quote:
+            quote = None if c == quote else quote
+        elif c in '"\'':
+            quote = c
+        elif c in '([':
+            depth += 1
+        elif c in ')]':
+            depth -= 1
+        elif c == separator and depth == 0:
+            pieces.append(''.join(current))
+            current = []
+            continue
+        current.append(c)
+    pieces.append(''.join(current))
+    return pieces
+
+def parse_css(css):
+    """Minified CSS -> [('rule', selectors, body) | ('block', prelude, children) | ('at', text)]"""
+    nodes, pos, n = [], 0, len(css)
+    while pos < n:
+        i, quote = pos, None
+        while i < n:
+            c = css[i]
+            if quote:
+                quote = None if c == quote else quote
+            elif c in '"\'':
+                quote = c
+            elif c in '{;':
+                break
+            i += 1
+        prelude = css[pos:i].strip()
+        if i >= n or css[i] == ';':
+            if prelude:
+                nodes.append(('at', prelude + ';'))
+            pos = i + 1
+            continue
+        depth, j, quote = 1, i + 1, None
+        while j < n and depth:
+            c = css[j]
+            if quote:
+                quote = None if c == quote else quote
+            elif c in '"\'':
+                quote = c
+            elif c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+            j += 1
+        inner = css[i + 1:j - 1]
+        if prelude.lower().startswith(CONDITIONAL_AT_RULES):
+            nodes.append(('block', prelude, parse_css(inner)))
+        elif prelude.startswith('@'):
+            nodes.append(('at', f'{prelude}{{{inner}}}'))
+        elif prelude:
+            nodes.append(('rule', split_top_level(prelude), inner))
+        pos = j
+    return nodes
+
+def script_words(html, base_dir):
+    """Identifier-like words in script strings; classes and ids JS may add at runtime"""
+    words = set()
+    sources = []
+    owner = None
+    for kind, value in tokenize(html):
+        if kind == 'start':
+            owner = value
+            src = attribute_value(value[1], 'src') if value[0] == 'script' else None
+            if src and not re.match(r'^(https?:)?//', src):
+                path = Path(base_dir) / src.split('?')[0].lstrip('/')
+                if path.is_file():
+                    sources.append(path.read_text(encoding='utf-8', errors='replace'))
+        elif kind == 'raw' and owner[0] == 'script':
+            sources.append(value)
+    for source in sources:
+        for kind, text in js_tokens(source):
+            if kind == 'string':
+                words.update(re.findall(r'[A-Za-z_][\w-]*', text))
+    return words
+
+def fold_index(elements, fold):
+    """Index of the last element above the fold"""
+    parts = parse_selector(fold) if fold else None
+    if parts:
+        for element in elements:
+            if selector_matches(element, parts):
+                return element.end
+    body = next((element.index for element in elements if element.name == 'body'), 0)
+    return body + FOLD_ELEMENTS
+
+def classify_selectors(nodes, elements, above_fold, known_names, verdicts):
+    """Fill verdicts: selector -> 'critical' | 'deferred' | 'unused'"""
+    for node in nodes:
+        if node[0] == 'block':
+            classify_selectors(node[2], elements, above_fold, known_names, verdicts)
+        if node[0] != 'rule':
+            continue
+        for selector in node[1]:
+            if selector in verdicts:
+                continue
+            parts = parse_selector(selector)
+            if parts is None:
+                verdicts[selector] = 'critical'
+                continue
+            matched = [element for element in elements if selector_matches(element, parts)]
+            if any(element.index <= above_fold and not element.hidden for element in matched):
+                verdicts[selector] = 'critical'
+            elif matched or selector_names(parts) <= known_names:
+                verdicts[selector] = 'deferred'
+            else:
+                verdicts[selector] = 'unused'
+
+def serialize_css(nodes, verdicts, keep, keyframes_used):
+    """Rules whose selectors have a verdict in keep, dropping emptied blocks"""
+    out = []
+    for node in nodes:
+        if node[0] == 'rule':
+            selectors = [selector for selector in node[1] if verdicts[selector] in keep]
+            if selectors:
+                out.append(f"{','.join(selectors)}{{{node[2]}}}")
+        elif node[0] == 'block':
+            inner = serialize_css(node[2], verdicts, keep, keyframes_used)
+            if inner:
+                out.append(f'{node[1]}{{{inner}}}')
+        else:
+            name = re.match(r'@(?:-\w+-)?keyframes\s+([\w-]+)', node[1])
+            if name is None or name.group(1) in keyframes_used:
+                out.append(node[1])
+    return ''.join(out)
+
+def used_keyframes(nodes, verdicts, keep):
+    """Animation names referenced from rules that survive"""
+    names = set()
+    for node in nodes:
+        if node[0] == 'rule' and any(verdicts[selector] in keep for selector in node[1]):
+            names.update(re.findall(r'[\w-]+', node[2]))
+        elif node[0] == 'block':
+            names |= used_keyframes(node[2], verdicts, keep)
+    return names
+
+def rebase_css_urls(css, directory):
+    """Point page-relative url() references at the same files from a stylesheet in directory"""
+    def rebase(match):
+        quote_char, url = match.groups()
+        if re.match(r'^([a-z][a-z0-9+.-]*:|//|/|#)', url, re.I):
+            return match.group()
+        path_part = re.split(r'[?#]', url, 1)[0]
+        rebased = posixpath.relpath(posixpath.normpath(path_part), directory) + url[len(path_part):]
+        return f"url({quote_char}{rebased}{quote_char})"
+    return CSS_URL.sub(rebase, css)
+
+def extract_critical_css(html, output_dir, base_dir=BASE_DIR, fold=FOLD_SELECTOR):
+    """Inline only above-the-fold CSS and load the rest from a hashed, deferred stylesheet
+
+    Every <style> block is parsed and its selectors are matched against the document.
+    Selectors that match nothing, and name a class/id/tag neither the markup nor any script
+    string mentions, are dropped. The inline <style> keeps rules that hit an element above the
+    fold. The deferred stylesheet holds every used rule in source order, so the cascade once it
+    loads is the same as before; its relative url()s are rebased to css/. Returns (html, stats).
+    """
+    elements, styles = build_dom(html)
+    if not styles:
+        return html, None
+
+    css = ''
+    for style in styles:
+        content = minify_css(style['content'])
+        media = style['attrs'].get('media')
+        css += f'@media {media}{{{content}}}' if media and media != 'all' else content
+    nodes = parse_css(css)
+
+    known_names = script_words(html, base_dir)
+    for element in elements:
+        known_names.add(element.name)
+        known_names.update(element.classes, element.attrs)
+        if 'id' in element.attrs:
+            known_names.add(element.attrs['id'])
+
+    verdicts = {}
+    classify_selectors(nodes, elements, fold_index(elements, fold), known_names, verdicts)
+    critical_keep, deferred_keep = {'critical'}, {'critical', 'deferred'}
+    critical = serialize_css(nodes, verdicts, critical_keep,
+                             used_keyframes(nodes, verdicts, critical_keep))
+    deferred = serialize_css(nodes, verdicts, deferred_keep,
+                             used_keyframes(nodes, verdicts, deferred_keep))
+
+    # Nothing to defer when every used rule is above the fold
+    stylesheet = None
+    replacement = f'<style>{critical}</style>'
+    if deferred != critical:
+        # url()s were written relative to the page; the stylesheet sits one directory down
+        deferred = rebase_css_urls(deferred, CSS_ASSET_DIR)
+        digest = hashlib.sha256(deferred.encode()).hexdigest()[:10]
+        stylesheet = Path(output_dir) / CSS_ASSET_DIR / f'styles.{digest}.css'
+        stylesheet.parent.mkdir(parents=True, exist_ok=True)
+        stylesheet.write_text(deferred, encoding='utf-8')
+        href = f'{CSS_ASSET_DIR}/{stylesheet.name}'
+        replacement += (f'<link rel="stylesheet" href="{href}" media="print" onload="this.media=\'all\'">'
+                        f'<noscript><link rel="stylesheet" href="{href}"></noscript>')
+    pieces, pos = [], 0
+    for i, style in enumerate(styles):
+        pieces.append(html[pos:style['start']])
+        if i == 0:
+            pieces.append(replacement)
+        pos = style['end']
+    pieces.append(html[pos:])
+
+    stats = {
+        'inline_before': sum(len(style['content'].encode()) for style in styles),
+        'critical': len(critical.encode()),
+        'deferred': len(deferred.encode()),
+        'stylesheet': stylesheet,
+        'unused_selectors': sum(1 for verdict in verdicts.values() if verdict == 'unused'),
+    }
+    return ''.join(pieces), stats
+
+def report_critical_css(stats):
+    reduction = (1 - stats['critical']/stats['inline_before']) * 100
+    print(f"Render-blocking CSS: {stats['inline_before']:,} bytes")
+    print(f"Critical CSS (inline): {stats['critical']:,} bytes")
+    if stats['stylesheet']:
+        print(f"Deferred stylesheet: {stats['deferred']:,} bytes ({stats['stylesheet'].name})")
+    else:
+        print("Deferred stylesheet: none (all used CSS is above the fold)")
+    print(f"Unused selectors removed: {stats['unused_selectors']}")
+    print(f"Reduction: {reduction:.1f}%")
+
+# <picture> generation: responsive sources from the image manifest
+DEFAULT_SIZES = "(max-width: 480px) 100vw, (max-width: 768px) 50vw, 600px"
+FALLBACK_WIDTH = 800
+PICTURE_FORMATS = [('avif', 'image/avif'), ('webp', 'image/webp')]
+
+def load_image_manifest(source_dir):
+    """{category: {name: entry}} from the sharded manifest, else images/manifest.json"""
+    images_dir = Path(source_dir) / 'images'
+    if (images_dir / 'manifest' / INDEX_NAME).exists():
+        return ImageManifest(images_dir / 'manifest').to_legacy()['categories']
+    legacy = images_dir / 'manifest.json'
+    if legacy.exists():
+        with open(legacy, 'r') as f:
+            return json.load(f).get('categories', {})
+    return {}
+
+def manifest_lookup(categories):
+    """'images/<category>/<file>' for every variant and source -> manifest entry"""
+    lookup = {}
+    for category, entries in categories.items():
+        for name, entry in entries.items():
+            duplicate = entry.get('duplicate_of')
+            if duplicate:
+                entry = categories.get(duplicate['category'], {}).get(duplicate['name'], entry)
+            files = [name, entry.get('lqip')]
+            for fmt in ('webp', 'jpeg', 'avif'):
+                files += (entry.get(fmt) or {}).values()
+            for file in files:
+                if file:
+                    lookup[f"images/{category}/{file}"] = entry
+    return lookup
+
+def resolve_image(url, source_dir, lookup):
+    """Manifest entry for a local image URL, or None"""
+    if not url or url.startswith('data:') or re.match(r'^([a-z][a-z0-9+.-]*:|//)', url, re.I):
+        return None
+    path = unquote(re.split(r'[?#]', url, 1)[0])
+    resolved = (Path(source_dir) / path.lstrip('/')).resolve()
+    try:
+        key = resolved.relative_to(Path(source_dir).resolve()).as_posix()
+    except ValueError:
+        return None
+    return lookup.get(key)
+
+def variant_widths(entry, fmt):
+    variants = entry.get(fmt) or {}
+    widths = entry.get('widths') or [int(key) for key in variants if str(key).isdigit()]
+    return sorted(width for width in widths if str(width) in variants or width in variants)
+
+def variant_file(entry, fmt, width):
+    variants = entry.get(fmt) or {}
+    return variants.get(str(width), variants.get(width))
+
+def srcset(entry, fmt, base):
+    return ', '.join(f"{base}{quote(variant_file(entry, fmt, width))} {width}w"
+                     for width in variant_widths(entry, fmt))
+
+def fallback_src(entry, base):
+    """Mid-sized JPEG (closest to FALLBACK_WIDTH) for browsers without srcset"""
+    for fmt in ('jpeg', 'webp'):
+        widths = variant_widths(entry, fmt)
+        if widths:
+            width = min(widths, key=lambda width: abs(width - FALLBACK_WIDTH))
+            return f"{base}{quote(variant_file(entry, fmt, width))}"
+    return None
+
+def set_attribute(attrs, name, value):
+    """Replace or append an attribute; value None removes it"""
+    attrs = [(key, raw) for key, raw in attrs if key.lower() != name]
+    if value is not None:
+        attrs.append((name, f'"{value}"'))
+    return attrs
+
+def loading_hints(attrs, lcp, below_fold):
+    if lcp:
+        attrs = set_attribute(attrs, 'fetchpriority', 'high')
+        attrs = set_attribute(attrs, 'loading', 'eager')
+        attrs = set_attribute(attrs, 'decoding', None)
+    elif below_fold:
+        attrs = set_attribute(attrs, 'loading', 'lazy')
+        attrs = set_attribute(attrs, 'decoding', 'async')
+        attrs = set_attribute(attrs, 'fetchpriority', None)
+    return attrs
+
+def promote_lazy(attrs):
+    """data-src/data-srcset (script lazy loading) -> src/srcset so the browser fetches at once"""
+    for name in ('src', 'srcset'):
+        value = attribute_value(attrs, f'data-{name}')
+        if value is not None:
+            attrs = set_attribute(set_attribute(attrs, f'data-{name}', None), name, value)
+    return attrs
+
+def picture_markup(attrs, entry, base, sizes, self_closing):
+    """<picture> with AVIF/WebP sources around a JPEG <img> carrying the original attributes"""
+    sources = []
+    for fmt, mime in PICTURE_FORMATS:
+        if variant_widths(entry, fmt):
+            sources.append(f'<source type="{mime}" srcset="{srcset(entry, fmt, base)}" sizes="{sizes}">')
+    for name in ('src', 'srcset', 'data-src', 'data-srcset', 'sizes'):
+        attrs = set_attribute(attrs, name, None)
+    attrs = set_attribute(attrs, 'src', fallback_src(entry, base))
+    if variant_widths(entry, 'jpeg'):
+        attrs = set_attribute(attrs, 'srcset', srcset(entry, 'jpeg', base))
+        attrs = set_attribute(attrs, 'sizes', sizes)
+    return f"<picture>{''.join(sources)}{render_tag('img', attrs, self_closing)}</picture>"
+
+def add_dimensions(attrs, entry):
+    """width/height in the manifest's aspect ratio so the browser reserves the box before load
+
+    An authored width is kept and the height derived from it; otherwise the intrinsic size is used.
+    """
+    width, height = entry.get('dimensions') or (None, None)
+    if not (width and height):
+        return attrs
+    authored = attribute_value(attrs, 'width') or ''
+    if authored.isdigit() and int(authored) > 0:
+        width, height = int(authored), round(int(authored) * height / width)
+    return set_attribute(set_attribute(attrs, 'width', width), 'height', height)
+
+def build_pictures(html, source_dir, categories, fold=FOLD_SELECTOR):
+    """Rewrite manifest images into responsive <picture> markup with loading hints
+
+    A plain <img> whose src (or data-src) is a manifest image becomes a <picture> with AVIF and
+    WebP sources, a JPEG srcset/sizes and width/height from the manifest dimensions. An <img>
+    already inside a <picture> keeps its sources and gains width/height. The first visible
+    manifest image above the fold is the LCP candidate: fetchpriority="high", eager, and any
+    script-driven data-src/data-srcset is promoted to real attributes. Every <img> below the
+    fold (or hidden) gets loading="lazy" and decoding="async". Returns (html, stats).
+    """
+    lookup = manifest_lookup(categories)
+    elements, _ = build_dom(html)
+    above_fold = fold_index(elements, fold)
+
+    def entry_for(element):
+        src = element.attrs.get('src', '')
+        url = element.attrs.get('data-src') if src.startswith('data:') or not src else src
+        return resolve_image(url, source_dir, lookup)
+
+    images = [element for element in elements if element.name == 'img'
+              and not any(ancestor in ('svg', 'noscript', 'template') for ancestor in ancestors(element))]
+    lcp = next((element for element in images if element.index <= above_fold and not element.hidden
+                and entry_for(element)), None)
+    lcp_picture = lcp.parent if lcp is not None and lcp.parent.name == 'picture' else None
+
+    stats = {'pictures': 0, 'updated': 0, 'lazy': 0, 'lcp': None}
+    pieces, pos, index = [], 0, -1
+    for kind, value, start, end in tokenize_spans(html):
+        if kind != 'start':
+            continue
+        index += 1
+        element = elements[index]
+        name, attrs, self_closing = value
+        if name == 'source' and lcp_picture is not None and element.parent is lcp_picture:
+            new = render_tag(name, promote_lazy(attrs), self_closing)
+        elif name == 'img' and element in images:
+            entry = entry_for(element)
+            below_fold = element.index > above_fold or element.hidden
+            attrs = loading_hints(attrs, element is lcp, below_fold)
+            stats['lazy'] += below_fold
+            if entry is None:
+                new = render_tag(name, attrs, self_closing)
+            elif element.parent.name == 'picture':
+                attrs = add_dimensions(promote_lazy(attrs) if element is lcp else attrs, entry)
+                new = render_tag(name, attrs, self_closing)
+                stats['updated'] += 1
+            else:
+                url = element.attrs.get('data-src') or element.attrs.get('src')
+                base = url[:url.rfind('/') + 1]
+                sizes = element.attrs.get('sizes') or DEFAULT_SIZES
+                new = picture_markup(add_dimensions(attrs, entry), entry, base, sizes, self_closing)
+                stats['pictures'] += 1
+            if element is lcp:
+                stats['lcp'] = element.attrs.get('data-src') or element.attrs.get('src')
+        else:
+            continue
+        pieces.append(html[pos:start])
+        pieces.append(new)
+        pos = end
+    pieces.append(html[pos:])
+    return ''.join(pieces), stats
+
+def ancestors(element):
+    parent = element.parent
+    while parent is not None:
+        yield parent.name
+        parent = parent.parent
+
+def report_pictures(stats):
+    print(f"Pictures: {stats['pictures']} <img> -> <picture>, {stats['updated']} existing updated, "
+          f"{stats['lazy']} lazy below the fold")
+    print(f"LCP image: {stats['lcp'] or 'none found above the fold'}")
+
+# Data-URI inlining: assets small enough to cost more as a request than as bytes move into the HTML
+INLINE_LIMIT = 4096          # largest data URI inlined for one asset
+INLINE_BUDGET = 16384        # most bytes inlining may add to one document
+INLINE_ATTRIBUTES = {
+    ('img', 'src'), ('img', 'data-src'), ('source', 'src'), ('source', 'srcset'), ('source', 'data-srcset'),
+    ('img', 'srcset'), ('img', 'data-srcset'), ('input', 'src'), ('video', 'poster'), ('link', 'href'),
+}
+MIME_TYPES = {'.svg': 'image/svg+xml', '.webp': 'image/webp', '.avif': 'image/avif', '.ico': 'image/x-icon'}
+
+def svg_data_uri(svg):
+    """URL-encoded rather than base64: SVG markup stays readable and gzips far better"""
+    svg = re.sub(r'<\?xml.*?\?>|<!--.*?-->', '', svg, flags=re.DOTALL)
+    svg = re.sub(r'>\s+<', '><', WHITESPACE.sub(' ', svg.strip())).replace('"', "'")
+    return 'data:image/svg+xml,' + re.sub(r'[%#<>{}&"]', lambda m: f"%{ord(m.group(0)):02X}", svg)
+
+def data_uri(path):
+    suffix = path.suffix.lower()
+    if suffix == '.svg':
+        return svg_data_uri(path.read_text(encoding='utf-8'))
+    mime = MIME_TYPES.get(suffix) or mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+    return f"data:{mime};base64,{base64.b64encode(path.read_bytes()).decode('ascii')}"
+
+def local_asset(url, source_dir):
+    """Path of a local file a URL points at, or None"""
+    if not url or '${' in url or re.match(r'^([a-z][a-z0-9+.-]*:|//|#)', url, re.I):
+        return None
+    path = (Path(source_dir) / unquote(re.split(r'[?#]', url, 1)[0]).lstrip('/')).resolve()
+    return path if path.is_file() and path.suffix.lower() != '.html' else None
+
+def inlinable_references(html, replace):
+    """Pass every inlinable URL through replace(url) -> new URL or None; returns the new html
+
+    Covers image src attributes, single-candidate srcsets (a data URI per candidate would pay for
+    images the browser never picks), icon links and url() in inline CSS. Apple touch icons are
+    left alone: they are only fetched when the page is saved to a home screen.
+    """
+    def css_url(match):
+        new = replace(match.group(2))
+        return f'url("{new}")' if new else match.group(0)
+
+    def css(text):
+        return CSS_URL.sub(css_url, text)
+
+    pieces, pos = [], 0
+    owner = None
+    for kind, value, start, end in tokenize_spans(html):
+        if kind == 'start':
+            owner = value[0]
+            name, attrs, self_closing = value
+            rel = (attribute_value(attrs, 'rel') or '').lower().split()
+            changed = []
+            for key, raw in attrs:
+                url = attribute_value([(key, raw)], key.lower())
+                new = None
+                if raw is not None and (name, key.lower()) in INLINE_ATTRIBUTES:
+                    if name == 'link' and ('icon' not in rel or 'apple-touch-icon' in rel):
+                        pass
+                    elif key.lower() in SRCSET_ATTRIBUTES:
+                        candidates = url.split(',')
+                        parts = candidates[0].split()
+                        if len(candidates) == 1 and parts and replace(parts[0]):
+                            new = ' '.join([replace(parts[0])] + parts[1:])
+                    else:
+                        new = replace(url.strip())
+                elif raw is not None and key.lower() == 'style':
+                    new = css(url)
+                    new = new if new != url else None
+                changed.append((key, f'"{new}"' if new else raw))
+            if changed != attrs:
+                pieces.append(html[pos:start])
+                pieces.append(render_tag(name, changed, self_closing))
+                pos = end
+        elif kind == 'raw' and owner == 'style':
+            text = css(value)
+            if text != value:
+                pieces.append(html[pos:start])
+                pieces.append(text)
+                pos = end
+    pieces.append(html[pos:])
+    return ''.join(pieces)
+
+def inline_assets(html, source_dir, limit=INLINE_LIMIT, budget=INLINE_BUDGET):
+    """Replace references to small local assets with data URIs within a byte budget
+
+    An asset is inlined when its data URI is at most limit bytes; the smallest go first until the
+    bytes added to the document (counting every reference) would exceed budget. Everything else
+    stays external. Returns (html, stats).
+    """
+    references = {}
+    missing = set()
+
+    def collect(url):
+        path = local_asset(url, source_dir)
+        if path is not None:
+            references.setdefault(path, []).append(url)
+        elif url and not url.startswith('data:') and '${' not in url \
+                and not re.match(r'^([a-z][a-z0-9+.-]*:|//|#)', url, re.I):
+            missing.add(url)
+        return None
+
+    inlinable_references(html, collect)
+
+    chosen, added, over_limit, over_budget = {}, 0, 0, 0
+    uris = {path: data_uri(path) for path in references}
+    for path in sorted(references, key=lambda path: len(uris[path])):
+        cost = sum(len(uris[path]) - len(url) for url in references[path])
+        if len(uris[path]) > limit:
+            over_limit += 1
+        elif added + cost > budget:
+            over_budget += 1
+        else:
+            chosen.update((url, uris[path]) for url in references[path])
+            added += cost
+
+    inlined = inlinable_references(html, lambda url: chosen.get(url.strip()))
+    stats = {
+        'requests_saved': len(references) - over_limit - over_budget,
+        'bytes_added': len(inlined.encode('utf-8')) - len(html.encode('utf-8')),
+        'gzip_added': len(gzip.compress(inlined.encode('utf-8'), mtime=0))
+                      - len(gzip.compress(html.encode('utf-8'), mtime=0)),
+        'over_limit': over_limit,
+        'over_budget': over_budget,
+        'missing': sorted(missing),
+    }
+    return inlined, stats
+
+def report_inlining(stats, limit=INLINE_LIMIT, budget=INLINE_BUDGET):
+    print(f"Inlined assets: {stats['requests_saved']} request(s) saved for "
+          f"+{stats['bytes_added']:,} bytes of HTML (+{stats['gzip_added']:,} gzipped)")
+    if stats['over_limit'] or stats['over_budget']:
+        print(f"Kept external: {stats['over_limit']} over the {limit:,}-byte limit, "
+              f"{stats['over_budget']} past the {budget:,}-byte budget")
+    for url in stats['missing']:
+        print(f"  ⚠️  Referenced asset not found: {url}")
+
+# Fingerprinting: statically referenced assets are copied to ASSET_DIR under content-hashed names
+ASSET_DIR = 'assets'
+FINGERPRINT_LENGTH = 10
+
+# (tag, attribute) pairs whose value is an asset URL; srcset-style values hold several
+ASSET_ATTRIBUTES = {
+    ('img', 'src'), ('img', 'data-src'), ('source', 'src'), ('source', 'data-src'),
+    ('script', 'src'), ('link', 'href'), ('video', 'src'), ('video', 'poster'), ('audio', 'src'),
+    ('input', 'src'),
+}
+SRCSET_ATTRIBUTES = {'srcset', 'data-srcset', 'imagesrcset'}
+
+# Precompression: text assets get .gz/.br/.zst siblings at each encoder's maximum level
+PRECOMPRESS_EXTENSIONS = {'.html', '.css', '.js', '.mjs', '.svg', '.json', '.webmanifest', '.xml', '.txt', '.ico'}
+PRECOMPRESS_WORKERS = os.cpu_count() or 4
+
+def fingerprint_name(path):
+    """product-01.jpeg -> product-01.<hash>.jpeg"""
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:FINGERPRINT_LENGTH]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+def fingerprint_url(url, source_dir, output_dir, assets):
+    """Hashed URL for a local asset reference, or the URL unchanged if it isn't one
+
+    assets caches source path -> hashed name across documents.
+    """
+    if not url or '${' in url or re.match(r'^([a-z][a-z0-9+.-]*:|//|#)', url, re.I):
+        return url
+    path_part = re.split(r'[?#]', url, 1)[0]
+    suffix = url[len(path_part):]
+    root = path_part.startswith('/')
+    source = (Path(source_dir) / path_part.lstrip('/')).resolve() if root \
+        else (Path(source_dir) / path_part).resolve()
+    if source.suffix.lower() in ('.html', '') or not source.is_file():
+        return url
+    if source not in assets:
+        assets[source] = fingerprint_name(source)
+    target = Path(output_dir) / ASSET_DIR / assets[source]
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, target)
+    prefix = '/' if root else './' if path_part.startswith('./') else ''
+    return f"{prefix}{ASSET_DIR}/{assets[source]}{suffix}"
+
+def fingerprint_assets(html, source_dir, output_dir, assets=None):
+    """Copy every statically referenced local asset to a hashed name and point the HTML at it
+
+    Covers src/href/poster attributes, srcset lists and url() in inline styles. URLs built at
+    runtime by scripts are left alone, as are links to pages. Returns (html, hashed count).
+    """
+    assets = {} if assets is None else assets
+    rewritten = 0
+    pieces, pos = [], 0
+    owner = None
+    for kind, value, start, end in tokenize_spans(html):
+        if kind == 'start':
+            owner = value[0]
+            name, attrs, self_closing = value
+            changed = []
+            for key, raw in attrs:
+                if raw is None:
+                    changed.append((key, raw))
+                    continue
+                quote = raw[0] if raw[0] in '"\'' else ''
+                url = raw[1:-1] if quote else raw
+                new = url
+                if (name, key.lower()) in ASSET_ATTRIBUTES:
+                    new = fingerprint_url(url.strip(), source_dir, output_dir, assets)
+                elif key.lower() in SRCSET_ATTRIBUTES:
+                    candidates = []
+                    for candidate in url.split(','):
+                        parts = candidate.split()
+                        if parts:
+                            parts[0] = fingerprint_url(parts[0], source_dir, output_dir, assets)
+                        candidates.append(' '.join(parts))
+                    new = ', '.join(candidates)
+                elif key.lower() == 'style':
+                    new = CSS_URL.sub(lambda m: f"url({m.group(1)}"
+                                      f"{fingerprint_url(m.group(2), source_dir, output_dir, assets)}"
+                                      f"{m.group(1)})", url)
+                if new != url:
+                    rewritten += 1
+                changed.append((key, f'{quote}{new}{quote}'))
+            if changed != attrs:
+                pieces.append(html[pos:start])
+                pieces.append(render_tag(name, changed, self_closing))
+                pos = end
+        elif kind == 'raw' and owner == 'style':
+            css = CSS_URL.sub(lambda m: f"url({m.group(1)}"
+                              f"{fingerprint_url(m.group(2), source_dir, output_dir, assets)}"
+                              f"{m.group(1)})", value)
+            if css != value:
+                rewritten += 1
+                pieces.append(html[pos:start])
+                pieces.append(css)
+                pos = end
+    pieces.append(html[pos:])
+    return ''.join(pieces), rewritten
+
+def available_encoders():
+    """Suffix -> compress(bytes) for every encoder installed here"""
+    encoders = {'.gz': lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoders['.br'] = lambda data: brotli.compress(data, quality=11)
+    if zstandard is not None:
+        encoders['.zst'] = lambda data: zstandard.ZstdCompressor(level=22).compress(data)
+    return encoders
+
+def precompress_file(path):
+    """Write every smaller-than-original compressed sibling of one file; runs in a worker"""
+    data = Path(path).read_bytes()
+    sizes = {}
+    for suffix, compress in available_encoders().items():
+        compressed = compress(data)
+        sibling = Path(f"{path}{suffix}")
+        if len(compressed) < len(data):
+            sibling.write_bytes(compressed)
+            sizes[suffix] = len(compressed)
+        elif sibling.exists():
+            sibling.unlink()
+    return len(data), sizes
+
+def precompress(paths, workers=PRECOMPRESS_WORKERS):
+    """Precompress text files in parallel and print the totals per encoding"""
+    paths = sorted({Path(path) for path in paths if Path(path).suffix.lower() in PRECOMPRESS_EXTENSIONS})
+    if not paths:
+        return {}
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(precompress_file, paths))
+    else:
+        results = [precompress_file(path) for path in paths]
+
+    original = sum(size for size, _ in results)
+    totals = {}
+    for _, sizes in results:
+        for suffix, size in sizes.items():
+            totals[suffix] = totals.get(suffix, 0) + size
+    print(f"\nPrecompressed {len(paths)} file(s), {original:,} bytes:")
+    for suffix, size in sorted(totals.items()):
+        print(f"  {suffix}: {size:,} bytes ({(1 - size/original) * 100:.1f}% smaller)")
+    for suffix, module, loaded in (('.br', 'brotli', brotli), ('.zst', 'zstandard', zstandard)):
+        if loaded is None:
+            print(f"  ⚠️  {module} not found; skipped {suffix} (pip install {module})")
+    return totals
+
+def built_assets(output_dir):
+    """Files the critical CSS and fingerprint stages wrote under output_dir"""
+    for subdir in (CSS_ASSET_DIR, ASSET_DIR):
+        directory = Path(output_dir) / subdir
+        if directory.is_dir():
+            yield from (path for path in directory.iterdir() if path.is_file())
+
+# Precache manifest: revisioned list of what the service worker caches on install
+PRECACHE_FILE = 'precache-manifest.js'
+PRECACHE_BUDGET = 2 * 1024 * 1024        # bytes across all routes
+PRECACHE_ROUTE_BUDGET = 1024 * 1024      # bytes for one page and its assets
+PRECACHE_IMAGE_WIDTH = 400               # narrowest variant still sharp on a phone
+PRECACHE_FORMATS = ('webp', 'jpeg')      # what every browser decodes; AVIF stays runtime-cached
+IMAGE_FORMATS = ('webp', 'jpeg', 'avif')
+
+def file_revision(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:FINGERPRINT_LENGTH]
+
+def site_url(path, site_root, base_dir=BASE_DIR):
+    """Root-relative URL a file is served at; index.html is served as its directory"""
+    path = Path(path).resolve()
+    for root in (Path(site_root).resolve(), Path(base_dir).resolve()):
+        try:
+            relative = path.relative_to(root).as_posix()
+            break
+        except ValueError:
+            continue
+    else:
+        return None
+    url = '/' + quote(relative)
+    return url[:-len('index.html')] if url.endswith('/index.html') else url
+
+def variant_info(entry, filename):
+    """(format, width) of one of a manifest entry's files, or None for its source file"""
+    for fmt in IMAGE_FORMATS:
+        for size, file in (entry.get(fmt) or {}).items():
+            if file == filename:
+                return fmt, (entry.get('dimensions') or [0])[0] if str(size) == 'original' else int(size)
+    return None
+
+def smallest_viable(files):
+    """Smallest webp/jpeg at least PRECACHE_IMAGE_WIDTH wide among [(path, info)], else the smallest"""
+    viable = [path for path, info in files
+              if info and info[0] in PRECACHE_FORMATS and info[1] >= PRECACHE_IMAGE_WIDTH]
+    return min(viable or [path for path, _ in files], key=lambda path: (path.stat().st_size, str(path)))
+
+def page_assets(page, lookup, base_dir=BASE_DIR, sources=None):
+    """Local files a page needs, in precache priority order: page, styles/scripts/icons, images
+
+    Manifest images contribute one file each: the smallest viable variant among those the page
+    references. sources maps fingerprinted copies back to their source files.
+    """
+    sources = sources or {}
+    with open(page, 'r', encoding='utf-8') as f:
+        html = f.read()
+    urls, owner = [], None
+    for kind, value, _, _ in tokenize_spans(html):
+        if kind == 'start':
+            owner, attrs, _ = value
+            for key, raw in attrs:
+                url = attribute_value([(key, raw)], key.lower())
+                if (owner, key.lower()) in ASSET_ATTRIBUTES:
+                    urls.append(url.strip())
+                elif key.lower() in SRCSET_ATTRIBUTES:
+                    urls += [candidate.split()[0] for candidate in url.split(',') if candidate.split()]
+                elif key.lower() == 'style':
+                    urls += [m.group(2) for m in CSS_URL.finditer(url)]
+        elif kind == 'raw' and owner == 'style':
+            urls += [m.group(2) for m in CSS_URL.finditer(value)]
+
+    assets, images = [Path(page).resolve()], {}
+    for url in urls:
+        path = local_asset(url, Path(page).parent) or local_asset(url, base_dir)
+        if path is None:
+            continue
+        source = sources.get(path, path)
+        try:
+            entry = lookup.get(source.relative_to(Path(base_dir).resolve()).as_posix())
+        except ValueError:
+            entry = None
+        if entry is not None:
+            files = images.setdefault(id(entry), [])
+            if all(path != known for known, _ in files):
+                files.append((path, variant_info(entry, source.name)))
+        elif path not in assets:
+            assets.append(path)
+    chosen = [smallest_viable(files) for files in images.values()]
+    return assets + [path for path in chosen if path not in assets]
+
+def build_precache(pages, site_root, base_dir=BASE_DIR, budget=PRECACHE_BUDGET,
+                   route_budget=PRECACHE_ROUTE_BUDGET, sources=None):
+    """(entries, skipped) for the service worker; entries are {url, revision, size}
+
+    Each page adds its assets in priority order while both its own budget and the total
+    budget allow. An asset shared between pages is only paid for once in the total.
+    """
+    lookup = manifest_lookup(load_image_manifest(base_dir))
+    entries, skipped, total = {}, [], 0
+    for page in pages:
+        used = 0
+        for path in page_assets(page, lookup, base_dir, sources):
+            url = site_url(path, site_root, base_dir)
+            if url is None:
+                continue
+            size = path.stat().st_size
+            new = url not in entries
+            if used + size > route_budget or (new and total + size > budget):
+                skipped.append((url, size))
+                continue
+            used += size
+            if new:
+                entries[url] = {'url': url, 'revision': file_revision(path), 'size': size}
+                total += size
+    skipped = [(url, size) for url, size in dict(skipped).items() if url not in entries]
+    return list(entries.values()), skipped
+
+def write_precache(pages, site_root, base_dir=BASE_DIR, budget=PRECACHE_BUDGET,
+                   route_budget=PRECACHE_ROUTE_BUDGET, sources=None):
+    """Write PRECACHE_FILE into site_root for sw.js to import; returns its path"""
+    entries, skipped = build_precache(pages, site_root, base_dir, budget, route_budget, sources)
+    listing = json.dumps(entries, indent=2)
+    version = hashlib.sha256(listing.encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+    target = Path(site_root) / PRECACHE_FILE
+    with open(target, 'w', encoding='utf-8') as f:
+        f.write(f"// Generated by optimize.py --precache; do not edit\n"
+                f"self.__PRECACHE_VERSION = '{version}';\n"
+                f"self.__PRECACHE_MANIFEST = {listing};\n")
+
+    print(f"\nPrecache manifest: {len(entries)} entries, {sum(e['size'] for e in entries):,} bytes "
+          f"(budget {budget:,}, {route_budget:,} per route), version {version}")
+    for url, size in skipped:
+        print(f"  ⚠️  Over budget, left to runtime caching: {url} ({size:,} bytes)")
+    return target
+
+def optimize_html(input_file, output_file, critical_css=False, fold=FOLD_SELECTOR, mangle=True,
+                  fingerprint=False, assets=None, pictures=None, inline_limit=None, inline_budget=INLINE_BUDGET):
     with open(input_file, 'r', encoding='utf-8') as f:
         html = f.read()
 
-    # 1. Minify inline CSS - remove unnecessary whitespace but keep structure
-    def minify_css(match):
-        css = match.group(1)
-        # Remove comments
-        css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
-        # Remove unnecessary whitespace but keep spaces for safety
-        css = re.sub(r'\s*([{}:;,])\s*', r'\1', css)
-        css = re.sub(r';\s*}', '}', css)
-        css = re.sub(r'\s+', ' ', css)
-        return f'<style>{css}</style>'
-
-    html = re.sub(r'<style[^>]*>(.*?)</style>', minify_css, html, flags=re.DOTALL)
-
-    # 2. Minify inline JavaScript while preserving functionality
-    def minify_js_in_script(match):
-        js = match.group(1)
-        # Only minify non-essential whitespace
-        # Remove line comments (but be careful with URLs)
-        js = re.sub(r'(?<!")//[^\n]*(?!:)', '', js)
-        # Remove excessive whitespace around operators
-        js = re.sub(r'\s*([=+\-*/%<>!&|])\s*', r' \1 ', js)
-        # Remove whitespace around punctuation
-        js = re.sub(r'\s*([{}();,:])\s*', r'\1', js)
-        # Collapse multiple spaces
-        js = re.sub(r'\s+', ' ', js)
-        # Remove leading/trailing whitespace from lines
-        js = '\n'.join(line.strip() for line in js.split('\n') if line.strip())
-        return f'<script>{js}</script>'
-
-    html = re.sub(r'<script[^>]*>(.*?)</script>', minify_js_in_script, html, flags=re.DOTALL)
-
-    # 3. Remove HTML comments except IE conditionals
-    html = re.sub(r'<!--(?!\[if).*?-->', '', html, flags=re.DOTALL)
-
-    # 4. Remove unnecessary whitespace in HTML
-    # Remove whitespace between tags
-    html = re.sub(r'>\s+<', '><', html)
-    # Remove leading/trailing whitespace
-    html = re.sub(r'^\s+|\s+$', '', html, flags=re.MULTILINE)
-
-    # 5. Optimize data URIs - ensure they're compressed
-    # WebP images are already optimized
-
-    # 6. Combine consecutive spaces in text content
-    html = re.sub(r'([^<>])\s{2,}([^<>])', r'\1 \2', html)
-
-    # 7. Remove empty lines
-    html = re.sub(r'\n\s*\n', '\n', html)
-
-    # Write optimized version
+    # Responsive <picture> markup, dimensions and loading hints from the image manifest
+    if pictures is not None:
+        html, stats = build_pictures(html, Path(input_file).parent, pictures, fold)
+        report_pictures(stats)
+
+    # Small images and icons become data URIs while they fit the budget
+    if inline_limit:
+        html, stats = inline_assets(html, Path(input_file).parent, inline_limit, inline_budget)
+        report_inlining(stats, inline_limit, inline_budget)
+
+    # Point static asset references at content-hashed copies
+    if fingerprint:
+        html, rewritten = fingerprint_assets(html, Path(input_file).parent, Path(output_file).parent, assets)
+        print(f"Fingerprinted references: {rewritten}")
+
+    # Split inline CSS into critical (inline) and deferred (hashed stylesheet) rules
+    if critical_css:
+        html, stats = extract_critical_css(html, Path(output_file).parent, Path(input_file).parent, fold)
+        if stats:
+            report_critical_css(stats)
+
+    # Minify in one pass, writing each chunk as soon as it is produced
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+        for chunk in minify_html(html, mangle):
+            f.write(chunk)
 
     # Calculate savings
-    import os
     original_size = os.path.getsize(input_file)
     optimized_size = os.path.getsize(output_file)
     reduction = (1 - optimized_size/original_size) * 100
@@ -71,5 +1809,87 @@ def optimize_html(input_file, output_file):
 
     return optimized_size, original_size
 
+def output_path(input_file, out_dir=None):
+    """index.html -> index-optimized.html, or the same name inside out_dir"""
+    input_file = Path(input_file)
+    if out_dir:
+        return Path(out_dir) / input_file.name
+    return input_file.with_name(f"{input_file.stem}-optimized{input_file.suffix}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Minify HTML with inline CSS and JavaScript")
+    parser.add_argument('files', nargs='*', help="HTML files to minify (default: index.html)")
+    parser.add_argument('--all', action='store_true',
+                        help=f"minify every landing page variant ({', '.join(HTML_VARIANTS)})")
+    parser.add_argument('-o', '--out-dir', help="write minified files here under their own names")
+    parser.add_argument('--no-mangle', action='store_true',
+                        help="minify inline JavaScript without renaming local identifiers")
+    parser.add_argument('--fingerprint', action='store_true',
+                        help=f"copy referenced assets to {ASSET_DIR}/ under content-hashed names")
+    parser.add_argument('--precompress', action='store_true',
+                        help="write .gz/.br/.zst siblings of the HTML and built text assets")
+    parser.add_argument('--critical-css', action='store_true',
+                        help="inline only above-the-fold CSS, defer the rest and drop unused selectors")
+    parser.add_argument('--pictures', action='store_true',
+                        help="rewrite manifest images into <picture> with srcset, dimensions and loading hints")
+    parser.add_argument('--inline', nargs='?', type=int, const=INLINE_LIMIT, metavar='BYTES',
+                        help=f"inline images and icons whose data URI fits in BYTES (default: {INLINE_LIMIT})")
+    parser.add_argument('--inline-budget', type=int, default=INLINE_BUDGET, metavar='BYTES',
+                        help=f"most bytes --inline may add to each page (default: {INLINE_BUDGET})")
+    parser.add_argument('--precache', action='store_true',
+                        help=f"write {PRECACHE_FILE} (revisioned service worker precache list) for the outputs")
+    parser.add_argument('--precache-budget', type=int, default=PRECACHE_BUDGET, metavar='BYTES',
+                        help=f"total bytes --precache may list (default: {PRECACHE_BUDGET})")
+    parser.add_argument('--route-budget', type=int, default=PRECACHE_ROUTE_BUDGET, metavar='BYTES',
+                        help=f"bytes --precache may list for one page (default: {PRECACHE_ROUTE_BUDGET})")
+    parser.add_argument('--fold', default=FOLD_SELECTOR, metavar='SELECTOR',
+                        help=f"last element above the fold for --critical-css and --pictures "
+                             f"(default: {FOLD_SELECTOR})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = list(args.files)
+    if args.all:
+        files += [BASE_DIR / name for name in HTML_VARIANTS if (BASE_DIR / name).exists()]
+    if not files:
+        files = ['index.html']
+    if args.out_dir:
+        Path(args.out_dir).mkdir(parents=True, exist_ok=True)
+
+    total_original = total_optimized = 0
+    assets = {}
+    pictures = None
+    if args.pictures:
+        pictures = load_image_manifest(BASE_DIR)
+        if not pictures:
+            print("⚠️  No image manifest found; run convert_images_to_webp.py first")
+    outputs = []
+    for input_file in files:
+        print(f"\n{input_file}:")
+        output_file = output_path(input_file, args.out_dir)
+        optimized_size, original_size = optimize_html(input_file, output_file, args.critical_css, args.fold,
+                                                     not args.no_mangle, args.fingerprint, assets, pictures,
+                                                     args.inline, args.inline_budget)
+        total_original += original_size
+        total_optimized += optimized_size
+        outputs.append(output_file)
+
+    if len(files) > 1:
+        print(f"\nTotal: {total_original:,} -> {total_optimized:,} bytes "
+              f"({(1 - total_optimized/total_original) * 100:.1f}% reduction)")
+
+    if args.precache:
+        # fingerprinted copies -> their sources, so manifest images are still recognized
+        sources = {(Path(output).parent / ASSET_DIR / name).resolve(): source
+                   for output in outputs for source, name in assets.items()}
+        outputs.append(write_precache(outputs, args.out_dir or BASE_DIR, BASE_DIR,
+                                      args.precache_budget, args.route_budget, sources))
+
+    if args.precompress:
+        for output_dir in {Path(output).parent for output in outputs}:
+            outputs += built_assets(output_dir)
+        precompress(outputs)
+
 if __name__ == "__main__":
-    optimize_html('index.html', 'index-optimized.html')
\ No newline at end of file
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Render order-bump and bundle graphics from declarative card specs
+
+Each card is one JSON (or, on Python 3.11+, TOML) file in cards/ listing its
+canvas and the shapes and text drawn on it, in order:
+
+    {
+      "name": "seamless-thong", "category": "order-bump",
+      "size": [400, 400], "background": "#F8F8F8",
+      "elements": [
+        {"type": "ellipse", "box": [150, 185, 250, 240], "fill": "#F5F5F5", "outline": "#D0D0D0", "width": 2},
+        {"type": "text", "xy": [200, 260], "text": "Seamless Thong", "size": 28, "fill": "#2C2C2C"},
+        {"type": "badge", "box": [50, 320, 150, 345], "fill": "#B8B8E8", "text": "Invisible", "size": 14}
+      ]
+    }
+
+Element types: rectangle, ellipse, line, arc, gradient (vertical), text and
+badge (a rectangle with its text centred). Text uses the spec's font family
+(default "sans"), resolved once per process; a missing system font falls back
+to Pillow's bundled scalable font instead of the bitmap default. None of
+these fonts has emoji glyphs, so specs keep to plain text (emoji draw as boxes).
+
+A card is drawn in memory, kept as a lossless PNG master (the source the
+image pipeline and manifest track, replacing the old generators' JPEG masters;
+generate-picture-elements.js and verify-bundle-implementation.js accept either)
+and encoded straight to the final
+WebP/JPEG/AVIF variants with convert_images_to_webp.render_variants. The
+spec hash (spec, fonts and encoder settings) is kept in images/.card-cache.json,
+so an unchanged card is skipped; the build cache is updated too, so the next
+convert_images_to_webp.py run reuses these variants instead of re-encoding.
+
+Usage:
+    python render_cards.py                       # every spec in cards/
+    python render_cards.py cards/pilates-socks.json --force
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+import convert_images_to_webp as images
+
+BASE_DIR = Path(__file__).parent
+CARDS_DIR = BASE_DIR / 'cards'
+CARD_CACHE_PATH = BASE_DIR / 'images' / '.card-cache.json'
+RENDERER_VERSION = 1            # bump when drawing changes in a way specs can't see
+WORKERS = images.MAX_WORKERS
+STALE_MASTER_EXTENSIONS = ('.jpg', '.jpeg')     # lossy masters written by the old generator scripts
+
+# Font family -> candidate files, searched in FONT_DIRS (fonts/ first, so a project font wins)
+FONT_FAMILIES = {
+    'sans': ['Helvetica.ttc', 'Arial.ttf', 'DejaVuSans.ttf', 'LiberationSans-Regular.ttf'],
+}
+FONT_DIRS = [
+    BASE_DIR / 'fonts',
+    Path('/System/Library/Fonts'),
+    Path('/Library/Fonts'),
+    Path('/usr/share/fonts/truetype/dejavu'),
+    Path('/usr/share/fonts/truetype/liberation'),
+    Path('/usr/share/fonts/TTF'),
+    Path('C:/Windows/Fonts'),
+]
+DEFAULT_FONT = 'sans'
+
+@functools.lru_cache(maxsize=None)
+def font_file(family):
+    """Font file for a family name or a path (relative to the project); None means Pillow's bundled font"""
+    path = BASE_DIR / family
+    if path.suffix and path.is_file():
+        return str(path)
+    for name in FONT_FAMILIES.get(family, []):
+        for directory in FONT_DIRS:
+            if (directory / name).is_file():
+                return str(directory / name)
+    print(f"  ⚠️  No font found for '{family}'; using Pillow's bundled font")
+    return None
+
+@functools.lru_cache(maxsize=None)
+def load_font(family, size):
+    """Process-wide cache: each family and size is loaded once"""
+    path = font_file(family)
+    if path is None:
+        return ImageFont.load_default(size)
+    return ImageFont.truetype(path, size)
+
+def element_font(spec, element):
+    return load_font(element.get('font', spec.get('font', DEFAULT_FONT)), element.get('size', 11))
+
+def draw_gradient(draw, box, start, end):
+    """Vertical linear gradient from start (top row) to end (bottom row)"""
+    x0, y0, x1, y1 = box
+    top, bottom = ImageColor.getrgb(start), ImageColor.getrgb(end)
+    rows = max(1, y1 - y0 - 1)
+    for y in range(y0, y1):
+        t = (y - y0) / rows
+        draw.line([x0, y, x1, y], fill=tuple(round(a + (b - a) * t) for a, b in zip(top, bottom)))
+
+def draw_element(draw, spec, element):
+    kind = element['type']
+    shape = {key: element[key] for key in ('fill', 'outline', 'width') if key in element}
+    if kind == 'rectangle':
+        draw.rectangle(element['box'], **shape)
+    elif kind == 'ellipse':
+        draw.ellipse(element['box'], **shape)
+    elif kind == 'line':
+        draw.line(element['points'], fill=element.get('fill'), width=element.get('width', 1))
+    elif kind == 'arc':
+        draw.arc(element['box'], element['start'], element['end'], fill=element.get('fill'),
+                 width=element.get('width', 1))
+    elif kind == 'gradient':
+        draw_gradient(draw, element['box'], element['from'], element['to'])
+    elif kind == 'text':
+        draw.text(element['xy'], element['text'], fill=element.get('fill', 'black'),
+                  anchor=element.get('anchor', 'mm'), font=element_font(spec, element), align='center')
+    elif kind == 'badge':
+        draw.rectangle(element['box'], **shape)
+        x0, y0, x1, y1 = element['box']
+        draw.text(((x0 + x1) / 2, (y0 + y1) / 2), element['text'], fill=element.get('color', 'white'),
+                  anchor='mm', font=element_font(spec, element))
+    else:
+        raise ValueError(f"Unknown element type: {kind}")
+
+def draw_card(spec):
+    """The card as an in-memory RGB image"""
+    card = Image.new('RGB', tuple(spec['size']), color=spec.get('background', 'white'))
+    draw = ImageDraw.Draw(card)
+    for element in spec['elements']:
+        draw_element(draw, spec, element)
+    return card
+
+def load_spec(path):
+    path = Path(path)
+    if path.suffix == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            sys.exit(f"❌ {path}: TOML specs need Python 3.11+ (tomllib); use JSON instead")
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def card_paths(spec):
+    """(output directory, PNG master) for a spec"""
+    output_dir = images.DIRECTORIES.get(spec.get('category'), BASE_DIR / 'images' / spec.get('category', ''))
+    return output_dir, output_dir / f"{spec['name']}.png"
+
+def spec_hash(spec, settings):
+    """Everything that changes the rendered bytes: the spec, the fonts it resolves to and the encoders"""
+    families = {element.get('font', spec.get('font', DEFAULT_FONT))
+                for element in spec['elements'] if element['type'] in ('text', 'badge')}
+    fonts = {family: font_file(family) for family in sorted(families)}
+    payload = json.dumps({'spec': spec, 'fonts': fonts, 'renderer': RENDERER_VERSION,
+                          'encoders': images.settings_fingerprint(settings)}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_card_cache(path=CARD_CACHE_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_card_cache(cache, path=CARD_CACHE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(cache, f, indent=2)
+
+def render_card(job):
+    """Draw one card, write its lossless master and encode its variants; runs in a worker process"""
+    spec_path, spec, settings = job
+    output_dir, master = card_paths(spec)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    card = draw_card(spec)
+    card.save(master, 'PNG', optimize=True)
+    results = images.render_variants(card, card.size, output_dir, spec['name'], images.cache_key(master),
+                                     settings=settings)
+    return spec_path, results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render order-bump and bundle graphics from card specs")
+    parser.add_argument('specs', nargs='*', help="card specs to render (default: every spec in cards/)")
+    parser.add_argument('--force', action='store_true', help="render even when a spec's hash is unchanged")
+    parser.add_argument('--workers', type=int, default=WORKERS, help=f"parallel renders (default: {WORKERS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    spec_paths = [Path(path) for path in args.specs] or sorted(
+        path for path in CARDS_DIR.iterdir() if path.suffix in ('.json', '.toml'))
+    if not images.has_module('numpy'):
+        print("⚠️  numpy not found; skipping BlurHash placeholders (pip install numpy)")
+        images.PLACEHOLDERS_ENABLED = False
+
+    card_cache = load_card_cache()
+    build_cache = images.load_build_cache()
+    jobs, skipped = [], 0
+    for spec_path in spec_paths:
+        spec = load_spec(spec_path)
+        settings = images.encoder_settings(spec.get('category'))
+        output_dir, master = card_paths(spec)
+        key = images.cache_key(spec_path.resolve())
+        digest = spec_hash(spec, settings)
+        cached = card_cache.get(key)
+        if not args.force and cached and cached['hash'] == digest and master.exists() and \
+                images.cached_results(build_cache, master, output_dir, images.hash_file(master), settings):
+            print(f"Unchanged: {spec_path.name} (cached)")
+            skipped += 1
+            continue
+        jobs.append((str(spec_path), spec, settings))
+
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as executor:
+            rendered = list(executor.map(render_card, jobs))
+    else:
+        rendered = [render_card(job) for job in jobs]
+
+    for (spec_path, spec, settings), (_, results) in zip(jobs, rendered):
+        output_dir, master = card_paths(spec)
+        record = results.pop('metrics', None)
+        failed = 'error' in results
+        images.report_image(master, results, record)
+        if failed:
+            continue
+        images.store_results(build_cache, master, output_dir, images.hash_file(master), results, settings)
+        card_cache[images.cache_key(Path(spec_path).resolve())] = {
+            'hash': spec_hash(spec, settings),
+            'master': images.cache_key(master),
+        }
+        # The old generators' JPEG masters would now be duplicate sources with the same variant names;
+        # forget them without deleting the variants they shared with the new master
+        for extension in STALE_MASTER_EXTENSIONS:
+            stale = output_dir / f"{spec['name']}{extension}"
+            if stale.exists():
+                build_cache['entries'].pop(images.cache_key(stale), None)
+                stale.unlink()
+                print(f"  ✗ Removed lossy master: {stale.name}")
+
+    images.save_build_cache(build_cache)
+    save_card_cache(card_cache)
+    print(f"\n✅ Rendered {len(jobs)} card(s), {skipped} unchanged")
+    if jobs:
+        print("   Run convert_images_to_webp.py to refresh the manifest (these variants are reused, not re-encoded)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Render product landing pages from one template page and N product configs
+
+The template (index.html) is compiled once: every value of the source config
+(products/pink-pilates-set.json, which describes what index.html currently
+shows) is located in a single pass and becomes a slot. Rendering a product
+config is then a join over the compiled chunks, so each page costs one pass
+instead of one full rescan per sed substitution.
+
+Configs follow the TEMPLATE_CONFIG.json schema. Copy may use {brand},
+{price}, {preorder_price}, {count} and any other product_config field.
+Product images are also resolved through the shared image manifest, so the
+template's responsive variants (product-01-400.webp, ...) map to the matching
+variants of the new product's images.
+
+Usage:
+    python render_landers.py TEMPLATE_CONFIG.json         # -> netlify-beige-suede-wedge-sneakers.html
+    python render_landers.py products/*.json -o landers   # -> landers/<slug>/index.html
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from optimize import load_image_manifest, manifest_lookup
+
+BASE_DIR = Path(__file__).parent
+TEMPLATE = BASE_DIR / 'index.html'
+SOURCE_CONFIG = BASE_DIR / 'products' / 'pink-pilates-set.json'
+WORKERS = 8
+PLACEHOLDER = re.compile(r'\{(\w+)\}')
+IMAGE_FORMATS = ('webp', 'jpeg', 'avif')
+
+# Bare numbers (stock, review counts, ratings) are not bound: "23" or "4.9" would match
+# unrelated CSS and copy. Prices are bound with their currency sign.
+PRODUCT_TEXT = ['name', 'brand', 'color_name', 'product_type', 'main_color_hex']
+PRODUCT_PRICES = ['price_current', 'price_original', 'price_preorder']
+PRICE_SLOTS = {f"product.{field}" for field in PRODUCT_PRICES}
+PRICE_BOUNDARY = r'(?!\.?\d)'      # "$19" must not match inside "$199" or "$19.99"
+
+# Page-relative URLs ("./x", "images/x") in attributes, CSS and script strings
+RELATIVE_URL = re.compile(r'''(?<=[\s"'(,=])(?:\./|(?=images/))''')
+
+class CompiledTemplate:
+    """Literal chunks with slots between them; chunks[i] precedes slots[i]"""
+
+    def __init__(self, html, bindings):
+        self.chunks, self.slots = [], []
+        literals = sorted(bindings, key=len, reverse=True)      # longest first: names before brands
+        pattern = re.compile('|'.join(
+            re.escape(literal) + (PRICE_BOUNDARY if bindings[literal] in PRICE_SLOTS else '')
+            for literal in literals)) if literals else None
+        pos = 0
+        found = set()
+        for match in (pattern.finditer(html) if pattern else ()):
+            self.chunks.append(html[pos:match.start()])
+            self.slots.append((bindings[match.group(0)], match.group(0)))
+            found.add(match.group(0))
+            pos = match.end()
+        self.chunks.append(html[pos:])
+        # variants the page doesn't reference are expected; a missing base value is worth a warning
+        self.unbound = sorted(literal for literal in set(bindings) - found if '@' not in bindings[literal])
+
+    def render(self, values):
+        """Template text with every slot filled; slots without a value keep the template's text"""
+        pieces = []
+        for chunk, (slot, literal) in zip(self.chunks, self.slots):
+            pieces.append(chunk)
+            value = slot_value(values, slot)
+            pieces.append(literal if value is None else value)
+        pieces.append(self.chunks[-1])
+        return ''.join(pieces)
+
+def slot_value(values, slot):
+    """A slot's value; an image variant the new image lacks falls back to the image itself"""
+    if slot in values:
+        return values[slot]
+    if '@' in slot:
+        return values.get(slot.split('@', 1)[0])
+    return None
+
+def format_copy(text, product):
+    """Expand {brand}/{price}/... placeholders from product_config; unknown ones are left as-is"""
+    values = dict(product)
+    values.setdefault('price', product.get('price_current'))
+    values.setdefault('preorder_price', product.get('price_preorder', product.get('price_current')))
+    values.setdefault('count', product.get('stock_count'))
+    return PLACEHOLDER.sub(lambda m: str(values[m.group(1)]) if values.get(m.group(1)) not in (None, '')
+                           else m.group(0), text)
+
+def hex_to_rgb(color):
+    """'#E8B4B8' -> '232,180,184', the form rgba() accents use"""
+    digits = color.lstrip('#')
+    if len(digits) == 3:
+        digits = ''.join(c * 2 for c in digits)
+    if not re.fullmatch(r'[0-9a-fA-F]{6}', digits):
+        return None
+    return ','.join(str(int(digits[i:i + 2], 16)) for i in (0, 2, 4))
+
+def image_key(path):
+    """'./images/product/a.webp' and '/images/product/a.webp' -> 'images/product/a.webp'"""
+    return re.sub(r'^\.?/', '', path)
+
+def image_values(slot, path, lookup):
+    """slot -> project-relative path for an image and each of its manifest variants"""
+    key = image_key(path)
+    values = {slot: key}
+    entry = lookup.get(key)
+    if entry is None:
+        return values
+    folder = key.rsplit('/', 1)[0]
+    for fmt in IMAGE_FORMATS:
+        for size, file in (entry.get(fmt) or {}).items():
+            values[f"{slot}@{fmt}:{size}"] = f"{folder}/{file}"
+    if entry.get('lqip'):
+        values[f"{slot}@lqip"] = f"{folder}/{entry['lqip']}"
+    return values
+
+def lander_values(config, lookup):
+    """slot -> text for one config"""
+    product = config.get('product_config', {})
+    values = {}
+    for field in PRODUCT_TEXT:
+        if product.get(field):
+            values[f"product.{field}"] = str(product[field])
+    rgb = hex_to_rgb(product.get('main_color_hex') or '')
+    if rgb:
+        values['product.main_color_rgb'] = rgb
+    for field in PRODUCT_PRICES:
+        if product.get(field) is not None:
+            values[f"product.{field}"] = f"${product[field]}"
+
+    images = config.get('images', {})
+    if images.get('main_product'):
+        values.update(image_values('images.main_product', images['main_product'], lookup))
+    for i, path in enumerate(images.get('thumbnails', [])):
+        values.update(image_values(f"images.thumbnails.{i}", path, lookup))
+    for i, influencer in enumerate(images.get('influencers', [])):
+        if influencer.get('image'):
+            values.update(image_values(f"images.influencers.{i}.image", influencer['image'], lookup))
+        for field in ('name', 'quote'):
+            if influencer.get(field):
+                values[f"images.influencers.{i}.{field}"] = format_copy(influencer[field], product)
+
+    for field, text in config.get('copy_elements', {}).items():
+        if text:
+            values[f"copy.{field}"] = format_copy(text, product)
+    return values
+
+def compile_template(template_path, source_config, lookup):
+    """Compile the template against the config describing what it currently shows"""
+    with open(template_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    bindings = {}
+    for slot, literal in lander_values(source_config, lookup).items():
+        bindings.setdefault(literal, slot)
+    return CompiledTemplate(html, bindings)
+
+def load_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def slug(config):
+    name = config.get('product_config', {}).get('name') or 'lander'
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+def rebase_relative_urls(html, prefix):
+    """Point the template's page-relative URLs at the same files from a page in another directory"""
+    return RELATIVE_URL.sub(prefix, html)
+
+def output_path(config, template_path, out_dir=None):
+    """<slug>.html next to the template, or out_dir/<slug>/index.html (relative URLs are rebased)"""
+    if out_dir:
+        return Path(out_dir) / slug(config) / 'index.html'
+    return Path(template_path).with_name(f"{slug(config)}.html")
+
+# Worker state: the compiled template and manifest lookup are sent once per process
+_template = None
+_lookup = None
+
+def init_worker(template, lookup):
+    global _template, _lookup
+    _template, _lookup = template, lookup
+
+def render_config(job):
+    """Render one config to its output file; returns (output, bytes, slots left at template values)"""
+    config_path, output, prefix = job
+    values = lander_values(load_config(config_path), _lookup)
+    html = _template.render(values)
+    if prefix:
+        html = rebase_relative_urls(html, prefix)
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(html)
+    unfilled = sorted({slot for slot, _ in _template.slots if slot_value(values, slot) is None})
+    return str(output), len(html.encode('utf-8')), unfilled
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render product landing pages from a template and configs")
+    parser.add_argument('configs', nargs='*', help="product configs to render (default: TEMPLATE_CONFIG.json)")
+    parser.add_argument('--template', default=TEMPLATE, help="template page (default: index.html)")
+    parser.add_argument('--source', default=SOURCE_CONFIG,
+                        help="config describing what the template currently shows "
+                             "(default: products/pink-pilates-set.json)")
+    parser.add_argument('-o', '--out-dir', help="write <out-dir>/<slug>/index.html instead of <slug>.html")
+    parser.add_argument('--workers', type=int, default=WORKERS, help=f"parallel renders (default: {WORKERS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configs = args.configs or [BASE_DIR / 'TEMPLATE_CONFIG.json']
+    lookup = manifest_lookup(load_image_manifest(Path(args.template).parent))
+    template = compile_template(args.template, load_config(args.source), lookup)
+    print(f"Compiled {args.template}: {len(template.slots)} slot(s), "
+          f"{len({slot for slot, _ in template.slots})} distinct")
+    for literal in template.unbound:
+        print(f"  ⚠️  Source value not found in template: {literal[:60]}")
+
+    jobs = []
+    template_dir = Path(args.template).resolve().parent
+    for path in configs:
+        output = output_path(load_config(path), args.template, args.out_dir)
+        # landers in -o directories reach the template's images and scripts through a relative prefix
+        prefix = Path(os.path.relpath(template_dir, output.resolve().parent)).as_posix() + '/'
+        jobs.append((path, output, None if prefix == './' else prefix))
+    if len({output for _, output, _ in jobs}) < len(jobs):
+        sys.exit("❌ Two configs share a product name and would overwrite each other")
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                 initargs=(template, lookup)) as executor:
+            results = list(executor.map(render_config, jobs))
+    else:
+        init_worker(template, lookup)
+        results = [render_config(job) for job in jobs]
+
+    for output, size, unfilled in results:
+        print(f"✅ {output} ({size:,} bytes)")
+        if unfilled:
+            print(f"   Kept template values for: {', '.join(unfilled)}")
+    print(f"\n✅ Rendered {len(results)} lander(s)")
+
+if __name__ == "__main__":
+    main()
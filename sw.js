@@ -1,12 +1,25 @@
 // PWA Service Worker for Pink Pilates Set
 // Progressive Web App with offline functionality and smart caching
 
+// Revisioned precache list generated by `python optimize.py --precache`
+try {
+  importScripts('/precache-manifest.js');
+} catch (err) {
+  console.warn('Service Worker: No precache manifest, runtime caching only', err);
+}
+const PRECACHE_MANIFEST = self.__PRECACHE_MANIFEST || [];
+
+// Bump by hand only when the runtime caches' layout changes; renaming them drops every
+// lazily cached image and page. Deploys invalidate assets through the revisioned PRECACHE.
 const CACHE_VERSION = '2.0.0';
+const PRECACHE_VERSION = self.__PRECACHE_VERSION || 'none';
 const CACHE_NAME = `pink-pilates-v${CACHE_VERSION}`;
 const STATIC_CACHE = `pink-pilates-static-v${CACHE_VERSION}`;
 const DYNAMIC_CACHE = `pink-pilates-dynamic-v${CACHE_VERSION}`;
 const IMAGE_CACHE = `pink-pilates-images-v${CACHE_VERSION}`;
 const RUNTIME_CACHE = `pink-pilates-runtime-v${CACHE_VERSION}`;
+// Not versioned: entries are keyed by revision, so a deploy only refetches what changed
+const PRECACHE = 'pink-pilates-precache';
 
 // Critical assets to cache immediately
 const CRITICAL_ASSETS = [
@@ -16,24 +29,18 @@ const CRITICAL_ASSETS = [
   '/sw.js'
 ];
 
-// Static assets to cache
-const STATIC_ASSETS = [
-  // Add CSS and JS files when they exist
-  '/styles.css',
-  '/app.js',
-  // Add images from manifest
-  '/images/icons/icon-192x192.png',
-  '/images/icons/icon-512x512.png',
-  // Add product images
-  '/images/product/product-01.jpeg'
-];
+// Request URL -> cache key carrying the entry's content revision
+const PRECACHE_KEYS = new Map(PRECACHE_MANIFEST.map(entry => [
+  new URL(entry.url, self.location).href,
+  new URL(`${entry.url}${entry.url.includes('?') ? '&' : '?'}__rev=${entry.revision}`, self.location).href
+]));
 
 // Images to cache with stale-while-revalidate
 const IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp', '.avif', '.svg'];
 
 // Install event - Cache critical assets for PWA
 self.addEventListener('install', event => {
-  console.log(`Service Worker: Installing v${CACHE_VERSION}...`);
+  console.log(`Service Worker: Installing v${CACHE_VERSION} (precache ${PRECACHE_VERSION})...`);
 
   event.waitUntil(
     caches.open(STATIC_CACHE)
@@ -49,6 +56,7 @@ self.addEventListener('install', event => {
           )
         );
       })
+      .then(() => precacheAssets())
       .then(() => {
         console.log('Service Worker: Critical assets cached successfully');
         return self.skipWaiting();
@@ -66,7 +74,7 @@ self.addEventListener('activate', event => {
   event.waitUntil(
     caches.keys()
       .then(cacheNames => {
-        const currentCaches = [STATIC_CACHE, DYNAMIC_CACHE, IMAGE_CACHE, RUNTIME_CACHE];
+        const currentCaches = [STATIC_CACHE, DYNAMIC_CACHE, IMAGE_CACHE, RUNTIME_CACHE, PRECACHE];
 
         return Promise.all(
           cacheNames.map(cacheName => {
@@ -77,6 +85,7 @@ self.addEventListener('activate', event => {
           })
         );
       })
+      .then(() => cleanPrecache())
       .then(() => {
         console.log('Service Worker: Old caches cleaned up');
         return self.clients.claim();
@@ -106,6 +115,15 @@ self.addEventListener('fetch', event => {
   // Skip external requests
   if (url.origin !== location.origin) return;
 
+  // Precached assets: cache first, then the normal strategy on a miss (HTML stays network first)
+  if (precacheKeyFor(request.url) && !isHTMLRequest(request)) {
+    event.respondWith(
+      matchPrecache(request)
+        .then(cached => cached || (isImageRequest(request) ? handleImageRequest(request) : handleStaticAssetRequest(request)))
+    );
+    return;
+  }
+
   // Determine caching strategy based on request type
   if (isImageRequest(request)) {
     event.respondWith(handleImageRequest(request));
@@ -118,6 +136,41 @@ self.addEventListener('fetch', event => {
   }
 });
 
+// Precache: fetch only entries whose revision isn't cached yet
+async function precacheAssets() {
+  const cache = await caches.open(PRECACHE);
+  const results = await Promise.allSettled([...PRECACHE_KEYS].map(async ([url, key]) => {
+    if (await cache.match(key)) return false;
+    const response = await fetch(url, { cache: 'no-cache' });
+    if (!response.ok) throw new Error(`${response.status} ${url}`);
+    await cache.put(key, response);
+    return true;
+  }));
+  const fetched = results.filter(result => result.status === 'fulfilled' && result.value).length;
+  results.filter(result => result.status === 'rejected')
+    .forEach(result => console.warn('Service Worker: Precache failed:', result.reason));
+  console.log(`Service Worker: Precached ${fetched} changed of ${PRECACHE_KEYS.size} assets`);
+}
+
+function precacheKeyFor(url) {
+  return PRECACHE_KEYS.get(url.replace(/\/index\.html(?=$|\?)/, '/'));
+}
+
+async function matchPrecache(request) {
+  const key = precacheKeyFor(request.url);
+  if (!key) return undefined;
+  const cache = await caches.open(PRECACHE);
+  return cache.match(key);
+}
+
+// Drop precache entries whose revision is no longer in the manifest
+async function cleanPrecache() {
+  const cache = await caches.open(PRECACHE);
+  const current = new Set(PRECACHE_KEYS.values());
+  const keys = await cache.keys();
+  return Promise.all(keys.filter(request => !current.has(request.url)).map(request => cache.delete(request)));
+}
+
 // Image caching strategy: Stale-while-revalidate with size limits
 async function handleImageRequest(request) {
   const cache = await caches.open(IMAGE_CACHE);
@@ -171,7 +224,7 @@ async function handleHTMLRequest(request) {
   } catch (error) {
     // Fallback to cache
     const cache = await caches.open(DYNAMIC_CACHE);
-    const cachedResponse = await cache.match(request);
+    const cachedResponse = await cache.match(request) || await matchPrecache(request);
 
     if (cachedResponse) {
       return cachedResponse;
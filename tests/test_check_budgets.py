@@ -0,0 +1,78 @@
+"""Responsive image selection in check_budgets.py"""
+
+import pytest
+
+from check_budgets import VIEWPORTS, choose_candidate, image_request, media_matches, slot_width, srcset_candidates
+from optimize import build_dom
+
+MOBILE, DESKTOP = VIEWPORTS['mobile'], VIEWPORTS['desktop']
+SIZES = '(max-width: 480px) 100vw, (max-width: 768px) 50vw, 600px'
+SRCSET = 'a-400.webp 400w, a-600.webp 600w, a-800.webp 800w, a-1200.webp 1200w'
+
+@pytest.mark.parametrize('value, expected', [
+    ('a.webp 400w, b.webp 800w', [('a.webp', '400w'), ('b.webp', '800w')]),
+    ('  a.webp  1x ,b.webp 2x', [('a.webp', '1x'), ('b.webp', '2x')]),
+    ('a.webp', [('a.webp', '')]),
+    ('a.webp, b.webp 2x', [('a.webp', ''), ('b.webp', '2x')]),
+    ('img,v=1.webp 400w, b.webp 800w', [('img,v=1.webp', '400w'), ('b.webp', '800w')]),
+    ('', []),
+])
+def test_srcset_candidates(value, expected):
+    assert srcset_candidates(value) == expected
+
+@pytest.mark.parametrize('query, width, expected', [
+    (None, 375, True),
+    ('(max-width: 480px)', 375, True),
+    ('(max-width: 480px)', 1920, False),
+    ('(min-width: 30em)', 480, True),
+    ('(min-width: 30em)', 479, False),
+    ('print', 375, False),
+    ('print, (min-width: 100px)', 375, True),
+])
+def test_media_matches(query, width, expected):
+    assert media_matches(query, width) == expected
+
+@pytest.mark.parametrize('sizes, width, expected', [
+    (SIZES, 375, 375),
+    (SIZES, 700, 350),
+    (SIZES, 1920, 600),
+    (None, 1024, 1024),
+    ('calc(100vw - 2rem)', 400, 368),
+])
+def test_slot_width(sizes, width, expected):
+    assert slot_width(sizes, width) == expected
+
+@pytest.mark.parametrize('viewport, expected', [
+    (MOBILE, 'a-800.webp'),         # 375px slot at 2x needs 750 device px
+    (DESKTOP, 'a-600.webp'),        # 600px slot at 1x
+])
+def test_choose_width_candidate(viewport, expected):
+    assert choose_candidate(SRCSET, SIZES, 'a.jpg', viewport) == expected
+
+def test_choose_densest_when_none_is_enough():
+    assert choose_candidate('a-400.webp 400w, a-600.webp 600w', None, None, DESKTOP) == 'a-600.webp'
+
+def test_choose_density_candidate_with_src_as_1x():
+    assert choose_candidate('a@2x.png 2x', None, 'a.png', DESKTOP) == 'a.png'
+    assert choose_candidate('a@2x.png 2x', None, 'a.png', MOBILE) == 'a@2x.png'
+
+def test_choose_without_srcset():
+    assert choose_candidate(None, None, 'a.png', MOBILE) == 'a.png'
+    assert choose_candidate(None, None, None, MOBILE) is None
+
+def img_in(html):
+    elements, _ = build_dom(html)
+    return next(element for element in elements if element.name == 'img')
+
+def test_picture_source_by_type_and_media():
+    img = img_in('<picture>'
+                 '<source type="image/jxl" srcset="a.jxl 800w">'
+                 '<source media="(min-width: 1000px)" type="image/webp" srcset="wide-800.webp 800w">'
+                 '<source type="image/webp" srcset="a-400.webp 400w, a-800.webp 800w">'
+                 '<img src="a.jpg" alt=""></picture>')
+    assert image_request(img, DESKTOP) == 'wide-800.webp'
+    assert image_request(img, MOBILE) == 'a-800.webp'
+
+def test_lazy_attributes_are_promoted():
+    img = img_in('<img src="placeholder.svg" data-src="a.jpg" data-srcset="a-400.jpg 400w, a-800.jpg 800w">')
+    assert image_request(img, DESKTOP) == 'a-800.jpg'
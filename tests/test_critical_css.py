@@ -0,0 +1,19 @@
+"""Critical CSS extraction in optimize.py"""
+
+from optimize import extract_critical_css, rebase_css_urls
+
+def test_rebase_relative_urls():
+    css = "a{background:url(assets/x.png)}b{background:url('./img/a.jpg?v=1')}c{background:url(../up.png)}"
+    assert rebase_css_urls(css, 'css') == \
+        "a{background:url(../assets/x.png)}b{background:url('../img/a.jpg?v=1')}c{background:url(../../up.png)}"
+
+def test_rebase_keeps_absolute_urls():
+    css = 'a{src:url(/f.woff) url(data:image/png;base64,AA) url(#m) url(https://cdn.example/x.png)}'
+    assert rebase_css_urls(css, 'css') == css
+
+def test_deferred_stylesheet_urls_resolve_from_css_dir(tmp_path):
+    html = ('<html><head><style>.hero{color:red}.below{background:url(images/b.png)}</style></head>'
+            '<body><div class="product-hero hero">a</div><div class="below">b</div></body></html>')
+    out, stats = extract_critical_css(html, tmp_path, tmp_path, fold='.product-hero')
+    assert '.below' not in out
+    assert stats['stylesheet'].read_text() == '.hero{color:red}.below{background:url(../images/b.png)}'
@@ -0,0 +1,50 @@
+"""Perceptual hashing and BK-tree near-duplicate lookups in convert_images_to_webp.py"""
+
+import random
+
+from PIL import Image, ImageDraw
+
+from convert_images_to_webp import BKTree, find_duplicates, hamming, perceptual_hash
+
+def test_hamming():
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(2**64 - 1, 0) == 64
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    values += [value ^ (1 << rng.randrange(64)) for value in values[:50]]      # near copies
+    tree = BKTree()
+    for i, value in enumerate(values):
+        tree.add(value, i)
+    for _ in range(200):
+        query = rng.choice(values) ^ rng.getrandbits(64) & rng.getrandbits(64) & rng.getrandbits(64)
+        for max_distance in (0, 4, 10):
+            expected = min(hamming(query, value) for value in values)
+            found = tree.nearest(query, max_distance)
+            if expected > max_distance:
+                assert found is None
+            else:
+                assert found[0] == expected and hamming(query, values[found[1]]) == expected
+
+def test_empty_tree():
+    assert BKTree().nearest(0, 10) is None
+
+def scene(path, size, shift=0):
+    img = Image.new('RGB', (400, 300), '#F8F8F8')
+    draw = ImageDraw.Draw(img)
+    draw.ellipse([60 + shift, 40, 260 + shift, 240], fill='#E8B4B8')
+    draw.rectangle([280, 120 + shift, 380, 280], fill='#2C2C2C')
+    img.resize(size, Image.Resampling.LANCZOS).save(path)
+
+def test_find_duplicates(tmp_path):
+    product, bump = tmp_path / 'product', tmp_path / 'order-bump'
+    product.mkdir()
+    bump.mkdir()
+    scene(product / 'a.png', (400, 300))
+    scene(bump / 'a-copy.jpg', (200, 150))                # same picture, smaller and recompressed
+    scene(bump / 'b.png', (400, 300), shift=-60)         # a different layout
+    Image.new('RGB', (400, 300), '#101010').save(bump / 'c.png')
+    assert hamming(perceptual_hash(product / 'a.png'), perceptual_hash(bump / 'a-copy.jpg')) <= 2
+    duplicates = find_duplicates({'product': product, 'order-bump': bump})
+    assert duplicates == {bump / 'a-copy.jpg': ('product', product / 'a.png')}
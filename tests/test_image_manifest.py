@@ -0,0 +1,67 @@
+"""Compact, sharded image manifest in image_manifest.py"""
+
+import pytest
+
+from image_manifest import ImageManifest, SizeTable, compact_entry, expand_entry, write_manifest, write_shard
+
+def entry(stem, original=None, sizes=(400, 600, 800)):
+    return {
+        'original': original or f"images/product/{stem}.jpeg",
+        'webp': {**{size: f"{stem}-{size}.webp" for size in sizes}, 'original': f"{stem}.webp"},
+        'jpeg': {size: f"{stem}-{size}.jpg" for size in sizes},
+        'avif': {size: f"{stem}-{size}.avif" for size in sizes},
+        'avif_quality': 50,
+        'lqip': f"{stem}-lqip.jpg",
+        'dimensions': [1200, 1600],
+        'widths': list(sizes),
+        'placeholder': {'blurhash': 'LEHV6nWB2yk8', 'color': '#e8b4b8', 'aspect_ratio': 0.75},
+    }
+
+def test_entry_compacts_and_expands():
+    sizes = SizeTable()
+    compact = compact_entry('product-01.jpeg', entry('product-01'), sizes)
+    assert 'raw' not in compact
+    assert expand_entry('product-01.jpeg', compact, sizes) == entry('product-01')
+
+def test_sizes_are_interned():
+    sizes = SizeTable()
+    first = compact_entry('a.jpeg', entry('a'), sizes)
+    second = compact_entry('b.jpeg', entry('b'), sizes)
+    assert first['v'] == second['v']
+    assert sizes.rows == [[400, 600, 800, 0], [400, 600, 800]]     # jpeg, avif and widths share a row
+
+def test_duplicate_entry_round_trips():
+    duplicate = entry('product-01', original='images/product/product-01-copy.jpeg')
+    duplicate['duplicate_of'] = {'category': 'product', 'name': 'product-01.jpeg'}
+    sizes = SizeTable()
+    compact = compact_entry('product-01-copy.jpeg', duplicate, sizes)
+    assert 'raw' not in compact
+    assert expand_entry('product-01-copy.jpeg', compact, sizes) == duplicate
+
+def test_unknown_keys_fall_back_to_raw():
+    extra = dict(entry('a'), metrics={'stages': []})
+    sizes = SizeTable()
+    compact = compact_entry('a.jpeg', extra, sizes)
+    assert compact == {'raw': extra}
+    assert expand_entry('a.jpeg', compact, sizes) == extra
+
+@pytest.mark.parametrize('encoding', ['json', 'msgpack'])
+def test_manifest_round_trip(tmp_path, encoding):
+    if encoding == 'msgpack':
+        pytest.importorskip('msgpack')
+    results = {
+        'product': {'product-01.jpeg': entry('product-01'), 'product-02.png': entry('product-02')},
+        'testimonials': {'testimonial-01.jpeg': entry('testimonial-01', sizes=(400,))},
+    }
+    write_manifest(results, {'webp_quality': 85}, root=tmp_path, encoding=encoding)
+    manifest = ImageManifest(tmp_path)
+    assert manifest.settings == {'webp_quality': 85}
+    assert sorted(manifest.categories()) == ['product', 'testimonials']
+    assert manifest.to_legacy()['categories'] == results
+
+def test_write_shard_patches_one_category(tmp_path):
+    write_manifest({'product': {'a.jpeg': entry('a')}, 'order-bump': {'b.png': entry('b')}}, {}, root=tmp_path)
+    write_shard('order-bump', {'c.png': entry('c')}, root=tmp_path)
+    manifest = ImageManifest(tmp_path)
+    assert manifest.get('product', 'a.jpeg') == entry('a')
+    assert list(manifest.category('order-bump')) == ['c.png']
@@ -0,0 +1,118 @@
+"""Content negotiation and variant rendering in image_server.py"""
+
+import io
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from PIL import Image
+
+from image_server import (
+    HTTPError, SourceIndex, VariantCache, VariantServer, accepted_types, negotiate_format, variant_width,
+)
+
+def test_accepted_types_drop_q_zero():
+    accept = 'image/avif;q=0, image/webp;q=0.8, image/*;q=0.5, */*'
+    assert accepted_types(accept) == {'image/webp', 'image/*', '*/*'}
+
+def test_accepted_types_of_missing_header():
+    assert accepted_types(None) == set()
+
+@pytest.mark.parametrize('accept, formats, expected', [
+    ('image/avif,image/webp,image/apng,image/*,*/*;q=0.8', ['avif', 'webp', 'jpeg'], 'avif'),
+    ('image/avif,image/webp,*/*', ['webp', 'jpeg'], 'webp'),
+    ('image/webp,*/*', ['avif', 'webp', 'jpeg'], 'webp'),
+    ('IMAGE/WEBP; q=1', ['avif', 'webp', 'jpeg'], 'webp'),
+    ('image/avif;q=0,image/webp;q=0', ['avif', 'webp', 'jpeg'], 'jpeg'),
+    ('*/*', ['avif', 'webp', 'jpeg'], 'jpeg'),
+    (None, ['avif', 'webp', 'jpeg'], 'jpeg'),
+])
+def test_negotiate_format(accept, formats, expected):
+    assert negotiate_format(accept, formats) == expected
+
+@pytest.mark.parametrize('value, expected', [(None, None), ('1', 50), ('400', 400), ('401', 450), ('99999', 2400)])
+def test_variant_width(value, expected):
+    assert variant_width(value) == expected
+
+@pytest.mark.parametrize('value', ['0', '-5', 'abc', '12.5'])
+def test_variant_width_rejects(value):
+    with pytest.raises(HTTPError):
+        variant_width(value)
+
+@pytest.fixture
+def server(tmp_path):
+    sources = tmp_path / 'product'
+    sources.mkdir()
+    Image.new('RGB', (600, 400), '#E8B4B8').save(sources / 'card.png')
+    Image.effect_noise((600, 400), 64).save(sources / 'broken.png')
+    data = (sources / 'broken.png').read_bytes()
+    (sources / 'broken.png').write_bytes(data[:len(data) // 2])       # header intact, pixels truncated
+    server = VariantServer(('127.0.0.1', 0), VariantCache(tmp_path / 'cache'), SourceIndex({'product': sources}),
+                           avif=False, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def fetch(url, **headers):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def test_miss_then_hit_then_not_modified(server):
+    _, url = server
+    status, headers, data = fetch(f"{url}/images/product/card?w=300&fmt=webp")
+    assert (status, headers['X-Cache'], headers['Content-Type']) == (200, 'MISS', 'image/webp')
+    assert Image.open(io.BytesIO(data)).size == (300, 200)
+    status, again, _ = fetch(f"{url}/images/product/card?w=300&fmt=webp")
+    assert (status, again['X-Cache'], again['ETag']) == (200, 'HIT', headers['ETag'])
+    assert fetch(f"{url}/images/product/card?w=300&fmt=webp", **{'If-None-Match': headers['ETag']})[0] == 304
+
+def test_negotiated_response_varies_on_accept(server):
+    _, url = server
+    status, headers, _ = fetch(f"{url}/images/product/card.png?w=300", Accept='image/webp,*/*')
+    assert (status, headers['Content-Type'], headers['Vary']) == (200, 'image/webp', 'Accept')
+
+def test_widths_past_the_source_share_one_variant(server):
+    _, url = server
+    etags = {fetch(f"{url}/images/product/card?w={width}&fmt=jpeg")[1]['ETag'] for width in (600, 800, 2400)}
+    assert etags == {fetch(f"{url}/images/product/card?fmt=jpeg")[1]['ETag']}
+
+def test_rendered_variant_releases_its_lock(server):
+    variant_server, url = server
+    assert fetch(f"{url}/images/product/card?w=200&fmt=webp")[0] == 200
+    assert variant_server.render_locks == {}
+
+def test_concurrent_misses_render_once(server):
+    _, url = server
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch(f"{url}/images/product/card?w=250&fmt=webp")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(headers['X-Cache'] for _, headers, _ in results) == ['HIT'] * 7 + ['MISS']
+
+def test_failed_render_keeps_its_lock_for_retries(server):
+    variant_server, url = server
+    assert fetch(f"{url}/images/product/broken?w=100&fmt=webp")[0] == 500
+    [lock] = variant_server.render_locks.values()
+    assert not lock.locked()
+    assert fetch(f"{url}/images/product/broken?w=100&fmt=webp")[0] == 500
+    assert list(variant_server.render_locks.values()) == [lock]
+
+def test_decompression_bomb_is_rejected(server, monkeypatch):
+    _, url = server
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    assert fetch(f"{url}/images/product/card?w=100&fmt=webp")[0] == 413
+
+def test_errors(server):
+    _, url = server
+    assert fetch(f"{url}/images/product/missing?w=100")[0] == 404
+    assert fetch(f"{url}/images/nope/card")[0] == 404
+    assert fetch(f"{url}/images/product/card?w=abc")[0] == 400
+    assert fetch(f"{url}/images/product/card?fmt=gif")[0] == 400
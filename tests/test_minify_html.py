@@ -0,0 +1,52 @@
+"""HTML tokenizer and minifier in optimize.py"""
+
+from optimize import minify_html, tokenize, tokenize_spans
+
+def test_tokens():
+    html = '<!DOCTYPE html><p class="a" hidden>Hi <b>x</b></p><!-- c --><br/>'
+    assert list(tokenize(html)) == [
+        ('markup', '<!DOCTYPE html>'),
+        ('start', ('p', [('class', '"a"'), ('hidden', None)], False)),
+        ('text', 'Hi '),
+        ('start', ('b', [], False)), ('text', 'x'), ('end', 'b'),
+        ('end', 'p'),
+        ('comment', '<!-- c -->'),
+        ('start', ('br', [], True)),
+    ]
+
+def test_raw_text_ends_at_its_closing_tag():
+    tokens = list(tokenize('<script>if (a<b) { s = "</div>"; }</SCRIPT><p>'))
+    assert tokens[1] == ('raw', 'if (a<b) { s = "</div>"; }')
+    assert tokens[2:] == [('end', 'script'), ('start', ('p', [], False))]
+
+def test_stray_less_than_is_text():
+    assert ''.join(value for kind, value in tokenize('a < b') if kind == 'text') == 'a < b'
+
+def minified(html):
+    return ''.join(minify_html(html))
+
+def test_whitespace_collapses_and_drops_next_to_blocks():
+    assert minified('<div>\n  <p>Hello   <b>world</b> !</p>\n</div>') == '<div><p>Hello <b>world</b> !</p></div>'
+
+def test_preformatted_text_kept():
+    html = '<pre>  keep\n  this </pre><textarea> t  </textarea>'
+    assert minified(html) == html
+
+def test_comments_dropped_except_conditionals():
+    assert minified('<p>a</p><!-- gone --><!--[if IE]>x<![endif]-->') == '<p>a</p><!--[if IE]>x<![endif]-->'
+
+def test_non_js_scripts_pass_through():
+    html = '<script type="application/ld+json">{ "a" : 1 }</script>'
+    assert minified(html) == html
+
+def test_inline_js_mangled_unless_disabled():
+    assert ''.join(minify_html('<script>function f(value) { return value; }</script>')) == \
+        '<script>function f(a){return a;}</script>'
+    assert ''.join(minify_html('<script>function f(value) { return value; }</script>', mangle=False)) == \
+        '<script>function f(value){return value;}</script>'
+
+def test_spans_cover_the_document():
+    html = '<div id=x>a<!-- c --><style>p{}</style><img src="y.png"></div>tail'
+    spans = [(start, end) for _, _, start, end in tokenize_spans(html)]
+    assert spans[0][0] == 0 and spans[-1][1] == len(html)
+    assert all(a[1] == b[0] for a, b in zip(spans, spans[1:]))
@@ -0,0 +1,52 @@
+"""JavaScript tokenizer and identifier mangler in optimize.py"""
+
+import pytest
+
+from optimize import js_tokens, minify_js
+
+def significant(js):
+    return [(kind, text) for kind, text in js_tokens(js) if kind not in ('space', 'comment')]
+
+def test_regex_after_keyword():
+    assert ('string', '/a+/g') in significant('return /a+/g.test(s)')
+
+def test_division_after_keyword_property():
+    assert significant('o.in / 2 / 3')[-4:] == [('punct', '/'), ('number', '2'), ('punct', '/'), ('number', '3')]
+
+def test_template_substitution():
+    assert significant('`a${b}c`') == [('string', '`a${'), ('name', 'b'), ('string', '}c`')]
+
+@pytest.mark.parametrize('source, expected', [
+    # multiplication inside an object literal is not a shorthand property
+    ('function f(item){return { item, sq: item * item };}',
+     'function f(a){return{item:a,sq:a*a};}'),
+    ('function f(a, b){return {x: a * b, y: b};}',
+     'function f(b,a){return{x:b*a,y:a};}'),
+    # generator, accessor and async methods get their own scopes
+    ('function f(a){return {*gen(){yield a}, get x(){return a}, set x(v){a=v}, async m(b){return b}};}',
+     'function f(a){return{*gen(){yield a},get x(){return a},set x(b){a=b},async m(a){return a}};}'),
+    ('function f(c){return {async *each(d){yield c + d}};}',
+     'function f(a){return{async*each(b){yield a+b}};}'),
+    # keywords as property names
+    ('function f(o){var n = o.return / 2; return o.delete(n) + o.typeof / 4 / o.new;}',
+     'function f(a){var b=a.return/2;return a.delete(b)+a.typeof/4/a.new;}'),
+    ('function f(x){return {default: x, if: x, new: x}.default;}',
+     'function f(a){return{default:a,if:a,new:a}.default;}'),
+    # modifiers used as shorthand properties and plain names
+    ('function f(get, set){return {get, set, y: get * set};}',
+     'function f(get,set){return{get,set,y:get*set};}'),
+])
+def test_mangle(source, expected):
+    assert minify_js(source) == expected
+
+def test_shorthand_keeps_property_name():
+    assert minify_js('function f(value){return {value};}') == 'function f(a){return{value:a};}'
+
+def test_top_level_names_kept():
+    assert minify_js('var total = 1; function add(n){ total += n; }') == 'var total=1;function add(a){total+=a;}'
+
+def test_leading_async_function_is_top_level():
+    assert minify_js('async function f(x){ return x; } f();') == 'async function f(a){return a;}f();'
+
+def test_unsupported_constructs_left_unmangled():
+    assert minify_js('function f(x){ return eval(x); }') == 'function f(x){return eval(x);}'
@@ -0,0 +1,18 @@
+"""Compiled lander templates in render_landers.py"""
+
+from render_landers import CompiledTemplate, rebase_relative_urls
+
+def test_price_literal_stops_at_digits():
+    template = CompiledTemplate('now $19, was $199, or $19.99. Only $19.', {'$19': 'product.price_current'})
+    assert template.render({'product.price_current': '$29'}) == 'now $29, was $199, or $19.99. Only $29.'
+
+def test_text_literal_longest_first():
+    template = CompiledTemplate('Pink Pilates Set by Pink', {'Pink Pilates Set': 'product.name', 'Pink': 'product.brand'})
+    assert template.render({'product.name': 'Beige Wedge', 'product.brand': 'Auralo'}) == 'Beige Wedge by Auralo'
+
+def test_rebase_relative_urls():
+    html = ('<img src="./images/a.webp" srcset="./images/a-400.webp 400w, images/b.webp 800w">'
+            '<script src="./lazy.js"></script><a href="/images/x">x</a><div style="background:url(images/c.png)">')
+    assert rebase_relative_urls(html, '../../') == (
+        '<img src="../../images/a.webp" srcset="../../images/a-400.webp 400w, ../../images/b.webp 800w">'
+        '<script src="../../lazy.js"></script><a href="/images/x">x</a><div style="background:url(../../images/c.png)">')
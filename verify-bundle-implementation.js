@@ -62,9 +62,9 @@ function verifyBundleImplementation() {
     },
     {
       name: 'Professional Product Images',
-      test: html.includes('adhesive-bra-cups.jpg') &&
-            html.includes('seamless-thong.jpg') &&
-            html.includes('pilates-socks.jpg'),
+      test: html.includes('order-bump/adhesive-bra-cups') &&
+            html.includes('order-bump/seamless-thong') &&
+            html.includes('order-bump/pilates-socks'),
       required: true
     },
     {
@@ -153,16 +153,18 @@ function verifyBundleImplementation() {
 
   // Check image files exist
   console.log('\n🖼️  Product Images Check:');
+  // Masters are the PNGs render_cards.py writes, or the JPEGs it replaces until it has run
   const images = [
-    'images/order-bump/adhesive-bra-cups.jpg',
-    'images/order-bump/seamless-thong.jpg',
-    'images/order-bump/pilates-socks.jpg',
-    'images/order-bump/bundle-banner.jpg'
+    'images/order-bump/adhesive-bra-cups.png',
+    'images/order-bump/seamless-thong.png',
+    'images/order-bump/pilates-socks.png',
+    'images/order-bump/bundle-banner.png'
   ];
 
   let imagesExist = 0;
   images.forEach(img => {
-    const exists = fs.existsSync(path.join(__dirname, img));
+    const exists = fs.existsSync(path.join(__dirname, img)) ||
+                   fs.existsSync(path.join(__dirname, img.replace(/\.png$/, '.jpg')));
     console.log(`  ${exists ? '✅' : '❌'} ${img}`);
     if (exists) imagesExist++;
   });
@@ -1,118 +1,427 @@
 #!/usr/bin/env python3
 """
 Verify all fixes on local server before deploying
+
+Checks run as one asyncio suite: a single browser, a pool of reusable
+contexts per viewport, and every page/viewport pair in flight at once.
+Clicks wait for the transition they trigger and image checks for the
+image loads they depend on, rather than fixed sleeps.
+
+With --benchmark, serve the site from a local static server and load each
+HTML variant N times per throttled CPU/network profile, collecting LCP, CLS,
+TBT, transferred bytes and request counts into a summarized JSON report.
+
+Usage:
+    python verify-fixes.py                              # functional checks
+    python verify-fixes.py --all                        # every variant, all viewports at once
+    python verify-fixes.py --benchmark --runs 10        # every variant, all profiles
+    python verify-fixes.py --benchmark index.html ultra-fast.html --profile mobile
 """
 
+import argparse
 import asyncio
-from playwright.async_api import async_playwright
+import functools
 import json
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+from optimize import HTML_VARIANTS
+
+BASE_DIR = Path(__file__).parent
+BENCHMARK_PAGES = ['index.html', 'index-optimized.html'] + [name for name in HTML_VARIANTS if name != 'index.html']
+BENCHMARK_RUNS = 5
+BENCHMARK_REPORT = BASE_DIR / 'benchmark-report.json'
+
+# Lighthouse's simulated mobile (slow 4G, 4x CPU) and desktop settings
+PROFILES = {
+    'mobile': {
+        'context': {'viewport': {'width': 412, 'height': 823}, 'device_scale_factor': 2.625,
+                    'is_mobile': True, 'has_touch': True},
+        'cpu_slowdown': 4, 'latency_ms': 150, 'download_kbps': 1638.4, 'upload_kbps': 675,
+    },
+    'desktop': {
+        'context': {'viewport': {'width': 1350, 'height': 940}},
+        'cpu_slowdown': 1, 'latency_ms': 40, 'download_kbps': 10240, 'upload_kbps': 10240,
+    },
+}
+METRICS = ['lcp', 'cls', 'tbt', 'fcp', 'bytes', 'requests']
+
+# Buffered observers installed before any page script runs; CLS uses the session-window
+# definition (gaps under 1s, windows under 5s) and TBT counts long-task time past 50ms after FCP
+VITALS_SCRIPT = """
+(() => {
+  const vitals = window.__vitals = {lcp: 0, fcp: 0, cls: 0, longTasks: []};
+  let session = 0, first = 0, last = 0;
+  const observe = (type, callback) => {
+    try { new PerformanceObserver(list => list.getEntries().forEach(callback)).observe({type, buffered: true}); }
+    catch (e) {}
+  };
+  observe('largest-contentful-paint', entry => { vitals.lcp = entry.startTime; });
+  observe('paint', entry => { if (entry.name === 'first-contentful-paint') vitals.fcp = entry.startTime; });
+  observe('longtask', entry => { vitals.longTasks.push([entry.startTime, entry.duration]); });
+  observe('layout-shift', entry => {
+    if (entry.hadRecentInput) return;
+    if (session && entry.startTime - last < 1000 && entry.startTime - first < 5000) {
+      session += entry.value;
+    } else {
+      session = entry.value;
+      first = entry.startTime;
+    }
+    last = entry.startTime;
+    vitals.cls = Math.max(vitals.cls, session);
+  });
+})();
+"""
+
+COLLECT_SCRIPT = """
+() => new Promise(resolve => requestAnimationFrame(() => setTimeout(() => {
+  const vitals = window.__vitals || {lcp: 0, fcp: 0, cls: 0, longTasks: []};
+  const tbt = vitals.longTasks
+    .filter(([start]) => start >= vitals.fcp)
+    .reduce((total, [, duration]) => total + Math.max(0, duration - 50), 0);
+  resolve({lcp: vitals.lcp, fcp: vitals.fcp, cls: vitals.cls, tbt});
+}, 0)))
+"""
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass        # browsers routinely abort requests mid-transfer
+
+def start_server(root=BASE_DIR, port=0):
+    """Serve root on localhost in a background thread; returns (server, base URL)"""
+    server = QuietServer(('127.0.0.1', port), functools.partial(QuietHandler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+VIEWPORTS = {
+    'desktop': {'viewport': {'width': 1920, 'height': 1080}},
+    'mobile': {'viewport': {'width': 375, 'height': 812}, 'is_mobile': True, 'has_touch': True},
+}
+CONTEXTS_PER_VIEWPORT = 4
+CHECK_TIMEOUT = 5000            # ms any single wait may take before the check fails
+ACCORDION_INIT_TIMEOUT = 2000   # ms; index.html opens the shipping tab 500 ms after DOMContentLoaded
+
+# Resolves once el's CSS transition ends, at once if it has none; set up before the click
+TRANSITION_SCRIPT = """
+el => {
+  const style = getComputedStyle(el);
+  const delays = style.transitionDelay.split(',').map(parseFloat);
+  const longest = Math.max(...style.transitionDuration.split(',').map((d, i) => parseFloat(d) + (delays[i] || 0)));
+  el.__transition = longest > 0
+    ? new Promise(resolve => {
+        el.addEventListener('transitionend', () => resolve(true), {once: true});
+        setTimeout(() => resolve(false), longest * 1000 + 100);
+      })
+    : Promise.resolve(true);
+}
+"""
+
+class ContextPool:
+    """Reusable browser contexts per viewport; pages are opened and closed, contexts stay"""
+
+    def __init__(self, browser, size=CONTEXTS_PER_VIEWPORT):
+        self.browser = browser
+        self.size = size
+        self.queues = {}
+        self.contexts = []
 
-async def verify_fixes():
+    async def acquire(self, viewport):
+        queue = self.queues.get(viewport)
+        if queue is None:
+            queue = self.queues[viewport] = asyncio.Queue()
+            for _ in range(self.size):
+                context = await self.browser.new_context(**VIEWPORTS[viewport])
+                self.contexts.append(context)
+                queue.put_nowait(context)
+        return await queue.get()
+
+    def release(self, viewport, context):
+        self.queues[viewport].put_nowait(context)
+
+    async def close(self):
+        await asyncio.gather(*(context.close() for context in self.contexts))
+
+async def wait_transition(element, action):
+    """Run action (a click) and wait for element's transition to finish"""
+    await element.evaluate(TRANSITION_SCRIPT)
+    await action()
+    await element.evaluate('el => el.__transition')
+
+async def check_accordion(page):
+    accordion = await page.query_selector('.product-accordion-section')
+    if not accordion:
+        return [(False, "Product accordion not found")]
+    results = [(True, "Product accordion section found")]
+    tabs = await accordion.query_selector_all('.accordion-item')
+    results.append((True, f"Found {len(tabs)} accordion items"))
+    # Let the page's own timer open its default tab first, so it can't toggle a tab mid-check
+    try:
+        await page.wait_for_function("() => document.querySelector('.accordion-item.open')",
+                                     timeout=ACCORDION_INIT_TIMEOUT)
+    except Exception:
+        pass                        # no tab opens by default on this page
+    for tab in tabs:
+        tab_name = await tab.get_attribute('data-tab')
+        trigger = await tab.query_selector('.accordion-trigger')
+        content = await tab.query_selector('.accordion-content')
+        if tab_name and trigger and content:
+            if await tab.evaluate("el => el.classList.contains('open')"):
+                await wait_transition(content, trigger.click)       # close it, so the next click opens it
+            await wait_transition(content, trigger.click)
+            is_open = await content.evaluate('el => el.style.maxHeight !== "0" && el.style.maxHeight !== ""')
+            results.append((is_open, f"Tab '{tab_name}' clickable and opens: {is_open}"))
+    return results
+
+async def check_celebrity_images(page):
+    selector = '.celebrity-card img, .worn-by-favorites img'
+    images = await page.query_selector_all(selector)
+    if images:
+        # lazy images only request once visible; wait for exactly those responses to settle
+        await images[0].scroll_into_view_if_needed()
+        await page.wait_for_function(
+            """sel => [...document.querySelectorAll(sel)]
+                       .filter(img => img.loading !== 'lazy' || img.getBoundingClientRect().top < innerHeight)
+                       .every(img => img.complete)""",
+            arg=selector, timeout=CHECK_TIMEOUT)
+    loaded = [await img.get_attribute('src') for img in images]
+    count = sum(1 for src in loaded if src and 'worn-by-favorites' in src)
+    return [(count > 0 or None, f"Found {count} celebrity images from worn-by-favorites directory")]
+
+async def check_mobile_menu(page):
+    toggle = await page.query_selector('.mobile-menu-toggle')
+    if not toggle:
+        return [(None, "Mobile menu not found")]
+    await toggle.click()
+    try:
+        await page.wait_for_selector('nav.active', timeout=CHECK_TIMEOUT)
+        return [(True, "Mobile menu toggle found"), (True, "Mobile menu opens correctly")]
+    except Exception:
+        return [(True, "Mobile menu toggle found"), (False, "Mobile menu did not open")]
+
+async def check_size_selector(page):
+    selector = await page.query_selector('#size-selector')
+    if not selector:
+        return [(False, "Size selector not found")]
+    buttons = await selector.query_selector_all('.size-btn')
+    return [(bool(buttons), f"Size selector with {len(buttons)} sizes found")]
+
+async def check_fashion_elements(page):
+    elements = {
+        'size_selector': '#size-selector',
+        'add_to_cart': 'button[onclick*="addToCart"]',
+        'buy_now': 'button[onclick*="buyNow"]',
+        'price': '.price, [data-price]',
+    }
+    results = []
+    for name, selector in elements.items():
+        found = await page.query_selector(selector) is not None
+        results.append((found, f"{name.replace('_', ' ').title()} {'found' if found else 'not found'}"))
+    return results
+
+# check name -> (function, viewports it runs in); checks on one page run in order, as they click
+CHECKS = {
+    'accordion': (check_accordion, ['desktop']),
+    'celebrity-images': (check_celebrity_images, ['desktop']),
+    'fashion-elements': (check_fashion_elements, ['desktop']),
+    'mobile-menu': (check_mobile_menu, ['mobile']),
+    'size-selector': (check_size_selector, ['mobile']),
+}
+
+async def verify_page(pool, base_url, name, viewport):
+    """Every check for one page in one viewport; returns [(check, ok, message)]"""
+    context = await pool.acquire(viewport)
+    page = await context.new_page()
+    try:
+        await page.goto(f"{base_url}/{name}", wait_until='domcontentloaded')
+    except Exception as e:
+        await page.close()
+        pool.release(viewport, context)
+        return [('load', False, f"Failed to load: {e}")]
+    results = []
+    try:
+        for check, (function, viewports) in CHECKS.items():
+            if viewport not in viewports:
+                continue
+            try:
+                results += [(check, ok, message) for ok, message in await function(page)]
+            except Exception as e:
+                results.append((check, False, f"{type(e).__name__}: {e}"))
+    finally:
+        await page.close()
+        pool.release(viewport, context)
+    return results
+
+async def verify_fixes(base_url, pages=('index.html',), viewports=tuple(VIEWPORTS), headless=True,
+                       contexts=CONTEXTS_PER_VIEWPORT):
+    """Run every check on every page and viewport concurrently; returns the number of failures"""
+    print("🔍 Verifying fixes on local server...")
+    print(f"📍 URL: {base_url}")
+    started = time.perf_counter()
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)
-        context = await browser.new_context(
-            viewport={'width': 1920, 'height': 1080}
-        )
+        browser = await p.chromium.launch(headless=headless)
+        pool = ContextPool(browser, contexts)
+        jobs = [(name, viewport) for name in pages for viewport in viewports]
+        try:
+            results = await asyncio.gather(*(verify_page(pool, base_url, name, viewport)
+                                             for name, viewport in jobs))
+        finally:
+            await pool.close()
+            await browser.close()
+
+    failures = 0
+    for (name, viewport), checks in zip(jobs, results):
+        print(f"\n{name} ({viewport}):")
+        for check, ok, message in checks:
+            icon = '✅' if ok else '⚠️ ' if ok is None else '❌'
+            print(f"   {icon} [{check}] {message}")
+            failures += ok is False
+    elapsed = time.perf_counter() - started
+    print(f"\n{'✅' if not failures else '❌'} Verification complete: {len(jobs)} page/viewport run(s), "
+          f"{failures} failure(s) in {elapsed:.1f}s")
+    return failures
 
+async def measure(browser, url, profile):
+    """One cold-cache load of url under a throttling profile; returns the metrics dict"""
+    settings = PROFILES[profile]
+    context = await browser.new_context(**settings['context'])
+    try:
         page = await context.new_page()
+        await page.add_init_script(VITALS_SCRIPT)
+        cdp = await context.new_cdp_session(page)
+        await cdp.send('Network.enable')
+        await cdp.send('Network.setCacheDisabled', {'cacheDisabled': True})
+        await cdp.send('Network.emulateNetworkConditions', {
+            'offline': False,
+            'latency': settings['latency_ms'],
+            'downloadThroughput': settings['download_kbps'] * 1024 / 8,
+            'uploadThroughput': settings['upload_kbps'] * 1024 / 8,
+        })
+        await cdp.send('Emulation.setCPUThrottlingRate', {'rate': settings['cpu_slowdown']})
+
+        transfer = {'bytes': 0, 'requests': 0}
+
+        def finished(event):
+            transfer['bytes'] += event.get('encodedDataLength', 0)
+            transfer['requests'] += 1
+
+        def failed(event):
+            transfer['requests'] += 1
 
-        print("🔍 Verifying fixes on local server...")
-        print("📍 URL: http://localhost:8080")
+        cdp.on('Network.loadingFinished', finished)
+        cdp.on('Network.loadingFailed', failed)
 
-        # Test local server
+        await page.goto(url, wait_until='load')
+        await page.wait_for_load_state('networkidle')
+        metrics = await page.evaluate(COLLECT_SCRIPT)
+        metrics.update(transfer)
+        return metrics
+    finally:
+        await context.close()
+
+def summarize(samples):
+    """Distribution of one metric over the runs"""
+    summary = {
+        'n': len(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+    # p75 is what Core Web Vitals assessments use
+    summary['p75'] = statistics.quantiles(samples, n=4, method='inclusive')[2] if len(samples) > 1 else samples[0]
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in summary.items()}
+
+async def benchmark(pages, runs=BENCHMARK_RUNS, profiles=tuple(PROFILES), headless=True):
+    """Load every page runs times per profile; returns the report dict"""
+    server, base_url = start_server()
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'runs': runs,
+        'profiles': {name: {key: value for key, value in PROFILES[name].items() if key != 'context'}
+                     for name in profiles},
+        'pages': {},
+    }
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless)
+            for name in pages:
+                report['pages'][name] = {}
+                for profile in profiles:
+                    samples = {metric: [] for metric in METRICS}
+                    failures = 0
+                    for _ in range(runs):
+                        try:
+                            metrics = await measure(browser, f"{base_url}/{name}", profile)
+                        except Exception as e:
+                            failures += 1
+                            print(f"   ❌ {name} ({profile}): {e}")
+                            continue
+                        for metric in METRICS:
+                            samples[metric].append(metrics[metric])
+                    result = {metric: summarize(values) for metric, values in samples.items() if values}
+                    result['failures'] = failures
+                    result['samples'] = samples
+                    report['pages'][name][profile] = result
+                    if samples['lcp']:
+                        print(f"📊 {name:<32} {profile:<8} LCP {result['lcp']['median']:7.0f}ms  "
+                              f"CLS {result['cls']['median']:.3f}  TBT {result['tbt']['median']:6.0f}ms  "
+                              f"{result['bytes']['median'] / 1024:8.1f} KB  {result['requests']['median']:4.0f} req")
+            await browser.close()
+    finally:
+        server.shutdown()
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verify fixes, or benchmark the landing page variants")
+    parser.add_argument('pages', nargs='*',
+                        help="pages to check (default: index.html) or benchmark (default: every variant present)")
+    parser.add_argument('--all', action='store_true', help="check every HTML variant present")
+    parser.add_argument('--viewport', action='append', choices=list(VIEWPORTS),
+                        help="viewport to check, repeatable (default: all)")
+    parser.add_argument('--contexts', type=int, default=CONTEXTS_PER_VIEWPORT,
+                        help=f"browser contexts per viewport (default: {CONTEXTS_PER_VIEWPORT})")
+    parser.add_argument('--benchmark', action='store_true', help="collect LCP/CLS/TBT/bytes/requests per page")
+    parser.add_argument('--runs', type=int, default=BENCHMARK_RUNS,
+                        help=f"loads per page and profile (default: {BENCHMARK_RUNS})")
+    parser.add_argument('--profile', action='append', choices=list(PROFILES),
+                        help="throttling profile, repeatable (default: all)")
+    parser.add_argument('--output', default=BENCHMARK_REPORT,
+                        help=f"benchmark report path (default: {BENCHMARK_REPORT.name})")
+    parser.add_argument('--headed', action='store_true', help="show the browser window")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    every_page = [name for name in BENCHMARK_PAGES if (BASE_DIR / name).exists()]
+    if not args.benchmark:
+        pages = args.pages or (every_page if args.all else ['index.html'])
+        server, base_url = start_server()
         try:
-            await page.goto("http://localhost:8080", wait_until='networkidle')
-            await page.wait_for_timeout(3000)
-            print("✅ Local server loaded successfully")
-        except Exception as e:
-            print(f"❌ Failed to load local server: {e}")
-            # Try loading file directly
-            await page.goto("file:///Users/nelsonchan/Downloads/pink ballet wrap/index.html", wait_until='networkidle')
-            await page.wait_for_timeout(3000)
-
-        # 1. Verify Accordion
-        print("\n1️⃣ Checking Accordion...")
-        accordion = await page.query_selector('.product-accordion-section')
-        if accordion:
-            print("   ✅ Product accordion section found")
-
-            # Check for tabs
-            tabs = await accordion.query_selector_all('.accordion-item')
-            print(f"   ✅ Found {len(tabs)} accordion items")
-
-            # Test clicking on tabs
-            for i, tab in enumerate(tabs):
-                tab_name = await tab.get_attribute('data-tab')
-                if tab_name:
-                    trigger = await tab.query_selector('.accordion-trigger')
-                    if trigger:
-                        await trigger.click()
-                        await page.wait_for_timeout(300)
-                        content = await tab.query_selector('.accordion-content')
-                        if content:
-                            is_open = await content.evaluate('el => el.style.maxHeight !== "0" && el.style.maxHeight !== ""')
-                            print(f"   ✅ Tab '{tab_name}' clickable and opens: {is_open}")
-        else:
-            print("   ❌ Product accordion not found")
-
-        # 2. Verify Celebrity Images
-        print("\n2️⃣ Checking Celebrity Images...")
-        worn_images = await page.query_selector_all('.celebrity-card img, .worn-by-favorites img')
-        loaded_count = 0
-        for img in worn_images:
-            src = await img.get_attribute('src')
-            if src and 'worn-by-favorites' in src:
-                loaded_count += 1
-        print(f"   ✅ Found {loaded_count} celebrity images from worn-by-favorites directory")
-
-        # 3. Verify Mobile
-        print("\n3️⃣ Checking Mobile...")
-        mobile_context = await browser.new_context(
-            viewport={'width': 375, 'height': 812},
-            is_mobile=True
-        )
-        mobile_page = await mobile_context.new_page()
-        await mobile_page.goto("file:///Users/nelsonchan/Downloads/pink ballet wrap/index.html", wait_until='networkidle')
-
-        # Check mobile menu
-        mobile_menu = await mobile_page.query_selector('.mobile-menu-toggle')
-        if mobile_menu:
-            print("   ✅ Mobile menu toggle found")
-
-            # Test menu toggle
-            await mobile_menu.click()
-            await mobile_page.wait_for_timeout(300)
-            nav = await mobile_page.query_selector('nav.active')
-            if nav:
-                print("   ✅ Mobile menu opens correctly")
-        else:
-            print("   ⚠️  Mobile menu not found")
-
-        # Check size selector on mobile
-        size_selector = await mobile_page.query_selector('#size-selector')
-        if size_selector:
-            size_buttons = await size_selector.query_selector_all('.size-btn')
-            print(f"   ✅ Size selector with {len(size_buttons)} sizes found")
-
-        await mobile_context.close()
-
-        # 4. Verify Fashion Elements
-        print("\n4️⃣ Checking Fashion Elements...")
-        elements = {
-            'size_selector': await page.query_selector('#size-selector'),
-            'add_to_cart': await page.query_selector('button[onclick*="addToCart"]'),
-            'buy_now': await page.query_selector('button[onclick*="buyNow"]'),
-            'price': await page.query_selector('.price, [data-price]'),
-        }
-
-        for name, element in elements.items():
-            if element:
-                print(f"   ✅ {name.replace('_', ' ').title()} found")
-            else:
-                print(f"   ❌ {name.replace('_', ' ').title()} not found")
-
-        print("\n✅ Verification complete!")
-        await browser.close()
+            failures = asyncio.run(verify_fixes(base_url, pages, tuple(args.viewport or VIEWPORTS),
+                                                headless=not args.headed, contexts=args.contexts))
+        finally:
+            server.shutdown()
+        sys.exit(1 if failures else 0)
+
+    pages = args.pages or every_page
+    report = asyncio.run(benchmark(pages, args.runs, tuple(args.profile or PROFILES), headless=not args.headed))
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Benchmark report written to {args.output}")
 
 if __name__ == "__main__":
-    asyncio.run(verify_fixes())
\ No newline at end of file
+    main()
\ No newline at end of file